@@ -0,0 +1,67 @@
+import argparse
+import os
+
+from src.batch import BatchRunner, load_manifest
+from src.cache import DEFAULT_MAX_BYTES, cache_subdir
+from src.instrument import configure_logging
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run a manifest of hub placement scenarios on a persistent worker pool")
+    parser.add_argument('manifest', help="scenario manifest (.yaml, .yml, .json or .csv)")
+    parser.add_argument('--output', default=None,
+                        help="result file, .csv or .parquet (default: output/batch_results.csv)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="rerun every scenario instead of skipping those already in --output")
+    parser.add_argument('--cache-dir', default=None,
+                        help="root of the on-disk caches, shared by the workers and with main.py "
+                             "(distance matrices are only cached when given)")
+    parser.add_argument('--cache-max-gb', type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3,
+                        help="size limit of the distance matrix cache")
+    parser.add_argument('--no-geometry-cache', action='store_true',
+                        help="parse the GeoJSON in every worker instead of using the binary cache")
+    parser.add_argument('--quiet', action='store_true',
+                        help="only print warnings, errors and the final summary")
+    parser.add_argument('--log-json', default=None, metavar='PATH',
+                        help="write every telemetry event as JSON lines")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(quiet=args.quiet, json_path=args.log_json)
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    geojson_path = os.path.join(current_dir, 'data', 'b.geojson')
+    output_path = os.path.join(current_dir, 'output')
+    cache_root = args.cache_dir or os.path.join(output_path, 'cache')
+
+    scenarios = load_manifest(args.manifest)
+    runner = BatchRunner(
+        geojson_path, workers=args.workers,
+        geometry_cache_dir=None if args.no_geometry_cache else cache_subdir(cache_root, 'geometry'),
+        cache_dir=cache_subdir(cache_root, 'matrices') if args.cache_dir else None,
+        cache_max_bytes=int(args.cache_max_gb * 1024 ** 3))
+    results_path = args.output or os.path.join(output_path, 'batch_results.csv')
+
+    def print_row(row, done, total):
+        if args.quiet:
+            return
+        if row['status'] == 'ok':
+            cover = "" if row['feasible'] else " (infeasible)"
+            print(f"[{done}/{total}] {row['scenario_id']}: {row['num_hubs']} hubs{cover}, "
+                  f"max {row['max_distance']:.2f} km, {row['seconds']:.1f}s")
+        else:
+            print(f"[{done}/{total}] {row['scenario_id']}: {row['error']}")
+
+    summary = runner.run(scenarios, results_path, resume=not args.no_resume, progress=print_row)
+    print(f"{summary['ok']} scenarios solved ({summary['infeasible']} infeasible), "
+          f"{summary['failed']} failed, "
+          f"{summary['skipped']} already done, on {summary['workers']} workers "
+          f"in {summary['seconds']:.1f}s")
+    print(f"Saved results to: {results_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_capacity.py
+"""
+Capacitated assignment benchmark.
+
+Run from the drone_delivery directory:
+    python -m benchmarks.bench_capacity --points 100000 --hubs 100 300 500 --range 5
+
+Hubs are random demand points and every hub can serve the total demand
+divided by the hub count, times --slack. Each run reports the time to
+build the point-hub pairs and assign under capacity, the greedy-regret
+rounds, unassigned points and peak hub utilization.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_distances import random_points
+from src.pCenter import PCenter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=100000)
+    parser.add_argument('--hubs', type=int, nargs='+', default=[100, 300, 500])
+    parser.add_argument('--range', type=float, default=5.0, help='drone range in km')
+    parser.add_argument('--slack', type=float, default=1.2,
+                        help='total hub capacity as a multiple of the total demand')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    points = random_points(args.points, args.seed)
+    weights = rng.uniform(1.0, 3.0, args.points)
+    print(f"{args.points} points, range {args.range} km, capacity slack {args.slack}")
+    print(f"{'hubs':>6} {'seconds':>8} {'rounds':>7} {'unassigned':>11} {'peak util':>10}")
+
+    for num_hubs in args.hubs:
+        hubs = rng.choice(args.points, size=num_hubs, replace=False)
+        solver = PCenter.from_arrays(points, weights, candidates=points[hubs])
+        capacity = weights.sum() * args.slack / num_hubs
+        start = time.perf_counter()
+        result = solver.assign_capacitated(np.arange(num_hubs), capacity, drone_range=args.range)
+        elapsed = time.perf_counter() - start
+        print(f"{num_hubs:>6} {elapsed:>8.2f} {result['rounds']:>7} "
+              f"{len(result['unassigned_indices']):>11} {result['utilization'].max():>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_distances.py
+"""
+Before/after benchmark for the distance matrix build.
+
+Run from the drone_delivery directory:
+    python -m benchmarks.bench_distances --sizes 1000 5000 10000
+
+The legacy build (one geopy geodesic call per pair) is timed on a small
+sample and extrapolated quadratically, since running it at 10k points
+takes hours.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.distance import distance_matrix
+
+# Rough bounding box of the five boroughs
+NYC_BOUNDS = (40.49, -74.26, 40.92, -73.70)
+
+
+def random_points(num_points, seed=0):
+    rng = np.random.default_rng(seed)
+    min_lat, min_lon, max_lat, max_lon = NYC_BOUNDS
+    lats = rng.uniform(min_lat, max_lat, num_points)
+    lons = rng.uniform(min_lon, max_lon, num_points)
+    return np.column_stack([lats, lons])
+
+
+def legacy_distance_matrix(points):
+    """The original per-pair geopy double loop"""
+    from geopy.distance import geodesic
+    points = [tuple(p) for p in points]
+    num_points = len(points)
+    matrix = np.zeros((num_points, num_points))
+    for i in range(num_points):
+        for j in range(i + 1, num_points):
+            dist = geodesic(points[i], points[j]).kilometers
+            matrix[i][j] = dist
+            matrix[j][i] = dist
+    return matrix
+
+
+def time_call(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 10000])
+    parser.add_argument('--legacy-sample', type=int, default=300,
+                        help='number of points used to time the legacy loop')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sample = random_points(args.legacy_sample, args.seed)
+    legacy_time, legacy = time_call(legacy_distance_matrix, sample)
+    legacy_per_pair = legacy_time / (len(sample) * (len(sample) - 1) / 2)
+    for method in ('geodesic', 'haversine'):
+        err = np.abs(distance_matrix(sample, method=method) - legacy).max()
+        print(f"max |{method} - geopy| on {len(sample)} points: {err * 1e6:.3f} mm")
+    print()
+
+    print(f"{'points':>8} {'legacy (est.)':>15} {'geodesic':>10} {'haversine':>10} {'speedup':>9}")
+    for num_points in args.sizes:
+        points = random_points(num_points, args.seed)
+        pairs = num_points * (num_points - 1) / 2
+        legacy_est = legacy_per_pair * pairs
+        geodesic_time, _ = time_call(distance_matrix, points, method='geodesic')
+        haversine_time, _ = time_call(distance_matrix, points, method='haversine')
+        print(f"{num_points:>8} {legacy_est:>14.1f}s {geodesic_time:>9.2f}s "
+              f"{haversine_time:>9.2f}s {legacy_est / geodesic_time:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
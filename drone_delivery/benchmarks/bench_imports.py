@@ -0,0 +1,90 @@
+# benchmarks/bench_imports.py
+"""
+Import-time guard for the headless fast path.
+
+Run from the drone_delivery directory:
+    python -m benchmarks.bench_imports [--repeats 5] [--max-seconds 0.5]
+
+Each target is imported in a fresh interpreter, --repeats times, and the
+median wall-clock time of the interpreter run is reported together with
+python -X importtime's cumulative time of the target module. The fast-path
+targets must not load any of the heavy packages (geopandas, shapely,
+folium, geopy, pandas, scipy) and must stay under --max-seconds; otherwise
+the offenders are listed and the exit status is 1. A small greedy solve
+on plain arrays is also checked to run without the heavy packages.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Packages the fast path must not import
+HEAVY_MODULES = ('geopandas', 'shapely', 'folium', 'geopy', 'pandas', 'scipy')
+
+# (label, statement, guard) run in a fresh interpreter; guard is None,
+# 'modules' (no heavy packages) or 'all' (also within the time budget)
+TARGETS = [
+    ('baseline', 'import numpy', None),
+    ('src.pCenter', 'import src.pCenter', 'all'),
+    ('solve on arrays', 'from src.pCenter import PCenter; '
+                        'import numpy as np; '
+                        'solver = PCenter.from_arrays(np.random.default_rng(0).uniform('
+                        '[40.5, -74.2], [40.9, -73.7], (200, 2))); '
+                        'solver.binary_search_min_center_indices(3.0, 50)', 'modules'),
+    ('main', 'import main', 'all'),
+    ('src.data', 'import src.data', None),
+    ('src.vis', 'import src.vis', None),
+]
+
+# Appended to every statement: report the heavy packages that were loaded
+REPORT = ('; import sys; print("LOADED=" + ",".join(m for m in {heavy!r} if m in sys.modules))')
+
+
+def run_target(statement, repeats):
+    """Median interpreter seconds, importtime of the last run, and the heavy packages loaded"""
+    code = statement + REPORT.format(heavy=HEAVY_MODULES)
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=cwd,
+                              capture_output=True, text=True, check=True)
+        seconds.append(time.perf_counter() - start)
+    loaded = proc.stdout.rsplit('LOADED=', 1)[1].strip()
+    # Cumulative microseconds of the top-level imports in the statement
+    cumulative = sum(int(match.group(1)) for match in
+                     re.finditer(r'^import time:\s+\d+ \|\s+(\d+) \| (\S+)$', proc.stderr, re.M))
+    return float(np.median(seconds)), cumulative / 1e6, [m for m in loaded.split(',') if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=0.5,
+                        help='interpreter wall-clock budget of the guarded targets')
+    args = parser.parse_args()
+
+    print(f"{'target':<16} {'seconds':>8} {'imports':>8}  heavy packages")
+    failures = []
+    for label, statement, guard in TARGETS:
+        seconds, imports, loaded = run_target(statement, args.repeats)
+        print(f"{label:<16} {seconds:>8.3f} {imports:>8.3f}  {', '.join(loaded) or '-'}")
+        if guard is not None and loaded:
+            failures.append(f"{label} imports {', '.join(loaded)}")
+        if guard == 'all' and seconds > args.max_seconds:
+            failures.append(f"{label} takes {seconds:.3f}s (budget {args.max_seconds:.3f}s)")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("Fast path OK")
+
+
+if __name__ == '__main__':
+    main()
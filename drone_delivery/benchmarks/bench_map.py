@@ -0,0 +1,68 @@
+# benchmarks/bench_map.py
+"""
+Output size and save time of NYCVisualizer.create_map per point mode.
+
+Run from the drone_delivery directory:
+    python -m benchmarks.bench_map --sizes 1000 10000 100000 500000
+
+Demand points are drawn uniformly inside each borough's bounding box;
+the per-point 'markers' mode is only run up to --marker-max points.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from src.data import NYCDataProcessor
+from src.vis import NYCVisualizer
+
+MODES = ('markers', 'geojson', 'cluster', 'heatmap')
+
+
+def synthetic_datasets(visualizer, total_points, seed=0):
+    rng = np.random.default_rng(seed)
+    names = list(visualizer.borough_bounds)
+    datasets = {}
+    for code, name in enumerate(names, 1):
+        (min_lat, min_lon), (max_lat, max_lon) = visualizer.borough_bounds[name]
+        count = total_points // len(names)
+        points = np.column_stack([rng.uniform(min_lat, max_lat, count),
+                                  rng.uniform(min_lon, max_lon, count)])
+        datasets[str(code)] = {'borough': name, 'points': list(map(tuple, points.tolist()))}
+    return datasets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 500000])
+    parser.add_argument('--marker-max', type=int, default=10000)
+    parser.add_argument('--geojson', default=os.path.join('data', 'b.geojson'))
+    args = parser.parse_args()
+
+    visualizer = NYCVisualizer()
+    geojson_data = NYCDataProcessor().load_geojson(args.geojson)
+    hubs = [(40.75, -73.98), (40.68, -73.95), (40.84, -73.87)]
+
+    print(f"{'points':>8} {'mode':>8} {'build':>8} {'save':>8} {'size':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for total_points in args.sizes:
+            datasets = synthetic_datasets(visualizer, total_points)
+            for mode in MODES:
+                if mode == 'markers' and total_points > args.marker_max:
+                    continue
+                start = time.perf_counter()
+                m = visualizer.create_map(geojson_data, datasets, hubs, point_mode=mode)
+                built = time.perf_counter()
+                path = os.path.join(tmp_dir, f'{mode}.html')
+                m.save(path)
+                saved = time.perf_counter()
+                size_mb = os.path.getsize(path) / 1024 ** 2
+                print(f"{total_points:>8} {mode:>8} {built - start:>7.2f}s "
+                      f"{saved - built:>7.2f}s {size_mb:>8.2f}MB")
+
+
+if __name__ == '__main__':
+    main()
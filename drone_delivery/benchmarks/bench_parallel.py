@@ -0,0 +1,66 @@
+# benchmarks/bench_parallel.py
+"""
+Scaling benchmark for the parallel distance matrix build.
+
+Run from the drone_delivery directory:
+    python -m benchmarks.bench_parallel --points 20000 --workers 1 2 4 8
+
+Each run builds the float32 matrix into shared memory (or into a .npy
+memmap with --memmap DIR) and reports wall-clock time, throughput and
+parallel efficiency relative to the single-worker build.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks.bench_distances import random_points
+from src.distance import distance_matrix, parallel_distance_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--method', default='geodesic')
+    parser.add_argument('--memmap', default=None,
+                        help='directory for a .npy memmap output instead of shared memory')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    points = random_points(args.points, args.seed)
+    pairs = args.points * (args.points - 1) / 2
+    print(f"{args.points} points, {args.method}, {os.cpu_count()} CPUs available")
+    print(f"{'workers':>8} {'seconds':>9} {'Mpairs/s':>9} {'speedup':>8} {'efficiency':>11}")
+
+    baseline = None
+    for workers in args.workers:
+        if args.memmap:
+            os.makedirs(args.memmap, exist_ok=True)
+            path = os.path.join(args.memmap, f'bench_{workers}.npy')
+            out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32,
+                                            shape=(args.points, args.points))
+        else:
+            path = None
+            out = np.empty((args.points, args.points), dtype=np.float32)
+
+        start = time.perf_counter()
+        if workers == 1:
+            distance_matrix(points, method=args.method, out=out)
+        else:
+            parallel_distance_matrix(points, method=args.method, workers=workers, out=out)
+        elapsed = time.perf_counter() - start
+
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        print(f"{workers:>8} {elapsed:>9.2f} {pairs / elapsed / 1e6:>9.2f} "
+              f"{speedup:>7.2f}x {speedup / workers:>10.0%}")
+        del out
+        if path:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
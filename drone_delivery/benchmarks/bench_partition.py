@@ -0,0 +1,54 @@
+# benchmarks/bench_partition.py
+"""
+Partitioned versus global solve.
+
+Run from the drone_delivery directory:
+    python -m benchmarks.bench_partition --points 20000 --range 2 --tile-points 2500 5000
+
+Uniform random points over the NYC bounding box are solved once per
+--tile-points value with k-d tiles, and once globally with the greedy
+binary search (skipped with --no-global). Each run reports hubs, seconds,
+the boundary repair and the packing lower bound on the global optimum.
+"""
+import argparse
+import time
+
+from benchmarks.bench_distances import random_points
+from src.pCenter import PCenter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=20000)
+    parser.add_argument('--range', type=float, default=2.0, help='drone range in km')
+    parser.add_argument('--tile-points', type=int, nargs='+', default=[2500, 5000])
+    parser.add_argument('--max-centers', type=int, default=500,
+                        help='greedy binary search limit, per tile and globally')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-global', action='store_true', help='skip the global solve')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    solver = PCenter.from_arrays(random_points(args.points, args.seed))
+    solver.build_coverage_index()
+    print(f"{args.points} points, range {args.range} km")
+    print(f"{'mode':<14} {'hubs':>6} {'seconds':>8} {'added':>6} {'dropped':>8} {'merged':>7} "
+          f"{'bound':>6} {'ratio':>6}")
+
+    for tile_points in args.tile_points:
+        result = solver.solve_partitioned(args.range, partition='tiles', max_points=tile_points,
+                                          max_centers=args.max_centers, workers=args.workers)
+        repair = result['repair']
+        print(f"{f'tiles {tile_points}':<14} {result['num_hubs']:>6} {result['seconds']:>8.2f} "
+              f"{repair['added']:>6} {repair['dropped']:>8} {repair['merged']:>7} "
+              f"{result['hub_lower_bound']:>6} {result['optimality_ratio']:>6.2f}")
+
+    if not args.no_global:
+        start = time.perf_counter()
+        num_hubs, _ = solver.binary_search_min_center_indices(args.range, args.max_centers)
+        print(f"{'global':<14} {num_hubs:>6} {time.perf_counter() - start:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+# benchmarks/bench_pipeline.py
+"""
+Per-stage time and peak memory of the full pipeline.
+
+Run from the drone_delivery directory:
+    python -m benchmarks.bench_pipeline --sizes 200 2000 20000 200000 \
+        --output pipeline.json [--baseline baseline.json] [--track-memory]
+
+Scenarios:
+    nyc        load the borough GeoJSON and sample points inside the boroughs
+    synthetic  uniform points in the NYC bounding box, no geometry stages
+
+Every scenario runs GeoJSON load, sampling, distance build (dense matrix up
+to --dense-limit points, sparse coverage index above), the greedy binary
+search, evaluation and map build/write, timed through the StageTimer hooks
+of NYCDataProcessor, PCenter and NYCVisualizer. Results are written as JSON;
+with --baseline, stages slower than the baseline by more than --tolerance
+(and by at least --min-seconds) are reported and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_distances import random_points
+from src.demand import DemandSet
+from src.data import NYCDataProcessor
+from src.instrument import StageTimer
+from src.pCenter import PCenter
+from src.vis import NYCVisualizer
+
+SCENARIOS = ('nyc', 'synthetic')
+
+
+def synthetic_datasets(total_points, seed=0):
+    """One DemandSet of uniform points over the NYC bounding box"""
+    return DemandSet(random_points(total_points, seed),
+                     borough_info={'0': {'borough': 'Synthetic', 'density': 1,
+                                         'population': total_points}})
+
+
+def max_rss_mb():
+    """Peak resident set size of this process so far"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+def run_scenario(scenario, total_points, args):
+    timer = StageTimer(track_memory=args.track_memory)
+    processor = NYCDataProcessor(seed=args.seed, timer=timer)
+    visualizer = NYCVisualizer(timer=timer)
+    start = time.perf_counter()
+
+    geojson_data = processor.load_geojson(args.geojson)
+    if scenario == 'nyc':
+        datasets = processor.process_all_boroughs(geojson_data, total_points=total_points,
+                                                  workers=args.workers)
+    else:
+        with timer.stage('sampling'):
+            datasets = synthetic_datasets(total_points, args.seed or 0)
+
+    solver = PCenter(datasets, timer=timer)
+    if len(solver.points) <= args.dense_limit:
+        solver.precalculate_distances(workers=args.workers)
+    solver.build_coverage_index()
+    _, centers = solver.binary_search_min_centers(args.drone_range, args.max_centers)
+    solver.evaluate_solution(centers, args.drone_range)
+
+    map_obj = visualizer.create_map(geojson_data, datasets, centers)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        visualizer.save_map(map_obj, os.path.join(tmp_dir, 'map.html'))
+
+    return {
+        'scenario': scenario,
+        'points': len(solver.points),
+        'total_seconds': time.perf_counter() - start,
+        'max_rss_mb': max_rss_mb(),
+        'stages': timer.summary(),
+    }
+
+
+def compare(results, baseline, tolerance, min_seconds):
+    """Stages slower than the baseline run of the same scenario and size"""
+    previous = {(run['scenario'], run['points']): run for run in baseline['runs']}
+    regressions = []
+    for run in results['runs']:
+        base = previous.get((run['scenario'], run['points']))
+        if base is None:
+            continue
+        for stage, entry in run['stages'].items():
+            if stage not in base['stages']:
+                continue
+            before, after = base['stages'][stage]['seconds'], entry['seconds']
+            if after > before * (1 + tolerance) and after - before >= min_seconds:
+                regressions.append({'scenario': run['scenario'], 'points': run['points'],
+                                    'stage': stage, 'baseline': before, 'current': after,
+                                    'ratio': after / before if before else float('inf')})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 2000, 20000, 200000])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--output', default='pipeline_benchmark.json')
+    parser.add_argument('--baseline', default=None, help='results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown per stage before flagging')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='ignore slowdowns smaller than this many seconds')
+    parser.add_argument('--track-memory', action='store_true',
+                        help='record per-stage peak allocations with tracemalloc')
+    parser.add_argument('--dense-limit', type=int, default=5000)
+    parser.add_argument('--drone-range', type=float, default=3.0)
+    parser.add_argument('--max-centers', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--geojson', default=os.path.join('data', 'b.geojson'))
+    args = parser.parse_args()
+
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'runs': [],
+    }
+    for scenario in args.scenarios:
+        for total_points in args.sizes:
+            run = run_scenario(scenario, total_points, args)
+            results['runs'].append(run)
+            print(f"\n{scenario} {run['points']} points: {run['total_seconds']:.2f}s, "
+                  f"max RSS {run['max_rss_mb']:.0f} MB")
+            for stage, entry in run['stages'].items():
+                peak = f"{entry['peak_mb']:>9.1f} MB" if entry['peak_mb'] is not None else ''
+                print(f"  {stage:<16} {entry['seconds']:>9.3f}s x{entry['calls']:<3} {peak}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved results to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+        for r in regressions:
+            print(f"REGRESSION {r['scenario']} {r['points']} {r['stage']}: "
+                  f"{r['baseline']:.3f}s -> {r['current']:.3f}s ({r['ratio']:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_population.py
+"""
+Population grid benchmark.
+
+Run from the drone_delivery directory:
+    python -m benchmarks.bench_population --cells 2000 --points 1000000
+
+Writes a synthetic --cells x --cells ESRI ASCII raster over the NYC
+bounding box, then reports the time to precompute the grid, to reopen it
+memory-mapped from the cache, and to weight --points random points with the
+grid lookup versus the borough density model.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_distances import random_points
+from src.data import NYCDataProcessor
+from src.population import PopulationGrid
+
+# NYC bounding box of the synthetic raster
+MIN_LAT, MIN_LON, MAX_LAT, MAX_LON = 40.49, -74.26, 40.92, -73.69
+
+
+def write_raster(path, cells, seed):
+    rng = np.random.default_rng(seed)
+    cell = max(MAX_LAT - MIN_LAT, MAX_LON - MIN_LON) / cells
+    values = rng.gamma(2.0, 5000.0, (cells, cells)).astype(np.float32)
+    with open(path, 'w') as f:
+        f.write(f"ncols {cells}\nnrows {cells}\nxllcorner {MIN_LON}\nyllcorner {MIN_LAT}\n"
+                f"cellsize {cell}\nNODATA_value -9999\n")
+        np.savetxt(f, values, fmt='%.1f')
+
+
+def timed_call(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cells', type=int, default=2000, help='raster rows and columns')
+    parser.add_argument('--points', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    points = random_points(args.points, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        raster_path = os.path.join(tmp, 'population.asc')
+        write_raster(raster_path, args.cells, args.seed)
+        cache_dir = os.path.join(tmp, 'cache')
+
+        _, build = timed_call(lambda: PopulationGrid.from_file(raster_path, cache_dir=cache_dir))
+        grid, load = timed_call(lambda: PopulationGrid.from_file(raster_path, cache_dir=cache_dir))
+        _, lookup = timed_call(lambda: grid.lookup(points[:, 0], points[:, 1]))
+        processor = NYCDataProcessor()
+        _, model = timed_call(lambda: processor.get_density_weights(points[:, 0], points[:, 1], '1'))
+
+        print(f"{args.cells} x {args.cells} raster, {args.points} points")
+        print(f"  precompute grid    {build:>8.3f}s")
+        print(f"  cached load (mmap) {load:>8.3f}s")
+        print(f"  grid lookup        {lookup:>8.3f}s ({lookup / args.points * 1e9:.0f} ns/point)")
+        print(f"  density model      {model:>8.3f}s ({model / args.points * 1e9:.0f} ns/point)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,95 +1,377 @@
+import argparse
 import os 
-import pandas as pd
-from src.vis import NYCVisualizer
-from src.data import NYCDataProcessor
+import numpy as np
 from src.pCenter import PCenter
+from src.cache import DistanceCache, DEFAULT_MAX_BYTES, cache_subdir
+from src.aggregation import CELL_SHAPES, DemandAggregator
+from src.demand import has_pyarrow
+from src.population import DEFAULT_CELL_KM as POPULATION_CELL_KM, PopulationGrid
+from src.local_search import DEFAULT_TIME_BUDGET
+from src.partition import DEFAULT_TILE_POINTS, PARTITION_MODES
+import logging
+from src.instrument import StageTimer, TELEMETRY, configure_logging
+from src.candidates import (CANDIDATE_SOURCES, GRID_SPACING_KM, cluster_candidates,
+                            grid_candidates, load_candidates_csv)
+# Geometry (geopandas, shapely), pandas, folium and the sweep (scipy) are
+# imported in main() when used, so importing this module and --help stay fast
 
-def main():
+# The full demand x candidate distance matrix is only built up to the size
+# of an N x N matrix over this many points
+DENSE_MATRIX_LIMIT = 5000
+
+# Uncovered points listed on the console; the rest only go to the event stream
+MAX_LISTED_UNCOVERED = 20
+
+# Hub search methods selectable with --solver
+SOLVER_MODES = ('greedy', 'exact')
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="NYC drone delivery hub placement")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="random seed for demand point generation")
+    parser.add_argument('--cache-dir', default=None,
+                        help="root of the on-disk caches (distance matrices, geometry, "
+                             "population grids), shared with batch.py")
+    parser.add_argument('--cache-max-gb', type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3,
+                        help="size limit of the cache directory in GB")
+    parser.add_argument('--warm-cache', action='store_true',
+                        help="build the distance matrix into the cache and exit")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="remove every cached distance matrix and exit")
+    parser.add_argument('--no-geometry-cache', action='store_true',
+                        help="parse the borough GeoJSON on every run instead of caching it")
+    parser.add_argument('--sweep', default=None, metavar='START:STOP:STEP',
+                        help="sweep drone ranges in km (e.g. 1:10:0.25) and write the "
+                             "hubs-needed table instead of solving a single range")
+    parser.add_argument('--sweep-output', default=None,
+                        help="CSV or .parquet path of the sweep table")
+    parser.add_argument('--candidates', default='points', metavar='SOURCE',
+                        help="candidate hub sites: 'points' (demand points), 'grid', "
+                             "'cluster' or the path of a CSV with latitude/longitude columns")
+    parser.add_argument('--candidate-spacing', type=float, default=GRID_SPACING_KM,
+                        help="spacing in km of the 'grid' candidates")
+    parser.add_argument('--num-candidates', type=int, default=300,
+                        help="number of 'cluster' candidates")
+    parser.add_argument('--aggregate', type=float, default=None, metavar='CELL_KM',
+                        help="bin demand points into cells of this size (km) before solving; "
+                             "solutions are evaluated on the raw points")
+    parser.add_argument('--cell-shape', choices=CELL_SHAPES, default='hex',
+                        help="cell shape used by --aggregate")
+    parser.add_argument('--solver', choices=SOLVER_MODES, default='greedy',
+                        help="greedy binary search, or the exact branch-and-bound solver "
+                             "(builds the full distance matrix; for small problems)")
+    parser.add_argument('--local-search', type=float, default=DEFAULT_TIME_BUDGET, metavar='SECONDS',
+                        help="time budget of the local search refining the greedy solution "
+                             "(0 disables it)")
+    parser.add_argument('--multistart', type=int, default=0, metavar='RUNS',
+                        help="replace the single local search by this many randomized greedy + "
+                             "local-search runs across --workers processes, keeping the best")
+    parser.add_argument('--partition', choices=PARTITION_MODES, default=None,
+                        help="solve boroughs or k-d tiles independently across --workers "
+                             "processes, then repair coverage along their boundaries")
+    parser.add_argument('--tile-points', type=int, default=DEFAULT_TILE_POINTS,
+                        help="largest number of demand points in one tile (--partition tiles)")
+    parser.add_argument('--capacity', type=float, default=None, metavar='WEIGHT',
+                        help="maximum demand weight a hub can serve (in point weights: borough "
+                             "density per point, summed per cell with --aggregate); adds hubs "
+                             "until every point fits")
+    parser.add_argument('--no-map', action='store_true',
+                        help="headless run: skip the HTML map and the display geometry")
+    parser.add_argument('--timings', action='store_true',
+                        help="print the time spent in each pipeline stage")
+    parser.add_argument('--quiet', action='store_true',
+                        help="only print warnings and errors while solving")
+    parser.add_argument('--log-json', default=None, metavar='PATH',
+                        help="write every telemetry event and the final counters as JSON lines")
+    parser.add_argument('--population', default=None, metavar='PATH',
+                        help="population raster (.asc, or .tif with rasterio) or census-tract "
+                             "layer weighting the demand; precomputed once into a cached grid")
+    parser.add_argument('--population-column', default='population',
+                        help="population count column of a tract layer")
+    parser.add_argument('--population-cell-km', type=float, default=POPULATION_CELL_KM,
+                        help="grid cell size in km a tract layer is rasterized at")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="processes used for point generation and the distance matrix build")
+    args = parser.parse_args(argv)
+    if args.solver == 'exact' and args.partition:
+        parser.error("--partition only works with the greedy solver")
+    if args.warm_cache and args.seed is None:
+        # Unseeded runs sample new points, so the warmed matrix would never be reused
+        parser.error("--warm-cache needs --seed")
+    return args
+
+def build_candidates(args, geojson_data, borough_datasets):
+    """Candidate hub sites selected by --candidates, None to place hubs on demand points"""
+    if args.candidates == 'points':
+        return None
+    if args.candidates == 'grid':
+        return grid_candidates(geojson_data, spacing_km=args.candidate_spacing)
+    if args.candidates == 'cluster':
+        return cluster_candidates(borough_datasets.coords,
+                                  borough_datasets.weights.astype(np.float64),
+                                  num_candidates=args.num_candidates, seed=args.seed)
+    if not os.path.exists(args.candidates):
+        raise SystemExit(f"Unknown candidate source '{args.candidates}'. Choose one of: "
+                         f"{', '.join(CANDIDATE_SOURCES)} or a CSV path")
+    return load_candidates_csv(args.candidates)
+
+def print_timings(timer):
+    print("\nStage timings:")
+    for stage, entry in timer.summary().items():
+        print(f"  {stage:<16} {entry['seconds']:>8.3f}s x{entry['calls']}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(quiet=args.quiet, json_path=args.log_json)
+    
     # Initialize paths
     current_dir = os.path.dirname(os.path.abspath(__file__))
     geojson_path = os.path.join(current_dir, 'data', 'b.geojson')
     output_path = os.path.join(current_dir, 'output')
     os.makedirs(output_path, exist_ok=True)
     
-    # Initialize processors
-    data_processor = NYCDataProcessor()
-    visualizer = NYCVisualizer()
+    # Matrices are keyed by the demand points, which only repeat with --seed
+    cache_root = args.cache_dir or os.path.join(output_path, 'cache')
+    cache = None
+    if args.clear_cache or args.warm_cache or (args.cache_dir and args.seed is not None):
+        cache = DistanceCache(cache_subdir(cache_root, 'matrices'),
+                              max_bytes=int(args.cache_max_gb * 1024 ** 3))
+    elif args.cache_dir:
+        TELEMETRY.event('matrix_cache_skipped', logging.WARNING,
+                        message="--cache-dir without --seed: demand points differ on every run, "
+                                "so the distance matrix is not cached",
+                        cache_dir=args.cache_dir)
+    if args.clear_cache:
+        print(f"Removed {cache.clear()} cached matrices from: {cache.cache_dir}")
+        return
+    
+    import pandas as pd
+    from src.data import NYCDataProcessor
     
-    # Load GeoJSON data
-    geojson_data = data_processor.load_geojson(geojson_path)
+    # Initialize processors; they share one stage timer
+    timer = StageTimer()
+    population = None
+    if args.population:
+        with timer.stage('population'):
+            population = PopulationGrid.from_file(
+                args.population,
+                cache_dir=cache_subdir(cache_root, 'population'),
+                column=args.population_column, cell_km=args.population_cell_km)
+        print(f"Population grid: {population.shape[0]} x {population.shape[1]} cells "
+              f"from {args.population}")
+    data_processor = NYCDataProcessor(seed=args.seed, timer=timer, population=population)
+    
+    # Load GeoJSON data; unless disabled, boundaries are parsed once into a
+    # binary cache holding simplified variants for sampling and display
+    geometry_cache_dir = None
+    if not args.no_geometry_cache:
+        geometry_cache_dir = cache_subdir(cache_root, 'geometry')
+    geojson_data = data_processor.load_geojson(
+        geojson_path, cache_dir=geometry_cache_dir, variant='sampling')
     
     if geojson_data.empty:
         print(f"Failed to load GeoJSON file from: {geojson_path}")
         return
     
     # Process all boroughs with demand points
-    borough_datasets = data_processor.process_all_boroughs(geojson_data, total_points=200)
+    borough_datasets = data_processor.process_all_boroughs(
+        geojson_data, total_points=200, workers=args.workers)
     
     if not borough_datasets:
         print("No data was generated.")
         return
 
-    # Save demand points for each borough
-    for boro_code, data in borough_datasets.items():
-        df = pd.DataFrame(data['points'], columns=['latitude', 'longitude'])
-        csv_path = os.path.join(output_path, f"{data['borough'].lower()}_points.csv")
-        df.to_csv(csv_path, index=False)
-        print(f"Saved points to: {csv_path}")
-    
-    # Initialize P-Center solver
-    solver = PCenter(borough_datasets=borough_datasets)
-    solver.precalculate_distances()
+    # Save the demand points of all boroughs in one columnar file
+    if has_pyarrow():
+        points_path = os.path.join(output_path, 'demand_points.parquet')
+        borough_datasets.write_parquet(points_path)
+    else:
+        points_path = os.path.join(output_path, 'demand_points.csv')
+        borough_datasets.write_csv(points_path)
+    print(f"Saved {borough_datasets.num_points} points to: {points_path}")
     
     # Find minimum number of centers needed for coverage
     drone_range = 3.0  # km
     max_centers = 50
-    min_centers, centers = solver.binary_search_min_centers(
-        drone_range=drone_range, 
-        max_centers=max_centers
-    )
+    
+    # Optionally coarsen the demand into weighted cell representatives
+    aggregator = None
+    solve_datasets = borough_datasets
+    if args.aggregate:
+        aggregator = DemandAggregator(args.aggregate, shape=args.cell_shape)
+        solve_datasets = aggregator.aggregate(borough_datasets)
+        report = aggregator.report()
+        print(f"Aggregated {report['raw_points']} points into {report['nodes']} "
+              f"{report['shape']} cells of {report['cell_km']} km "
+              f"(max added error {report['max_error_km']:.3f} km, "
+              f"bound {report['error_bound_km']:.3f} km)")
+    
+    # Initialize P-Center solver; the dense matrix is only kept for small
+    # problems, coverage questions go through the sparse index
+    candidates = build_candidates(args, geojson_data, solve_datasets)
+    solver = PCenter(borough_datasets=solve_datasets, candidates=candidates, timer=timer)
+    print(f"Candidate hub sites: {len(solver.candidates)} ({args.candidates})")
+    dense_ok = len(solver.points) * len(solver.candidates) <= DENSE_MATRIX_LIMIT ** 2
+    # Partitioned solves build their own per-part structures instead
+    if args.warm_cache or args.solver == 'exact' or (dense_ok and not args.partition):
+        solver.precalculate_distances(cache=cache, workers=args.workers)
+    if args.warm_cache:
+        print(f"Cached distance matrix for {len(solver.points)} points in: {cache.cache_dir}")
+        return
+    solver.build_coverage_index()
+    
+    if args.sweep:
+        from src.sweep import RadiusSweep, parse_radii, write_sweep
+        sweep_path = args.sweep_output or os.path.join(output_path, 'radius_sweep.csv')
+        print(f"{'range km':>9} {'hubs':>5} {'lower':>6} {'max km':>7} {'seconds':>8}")
+        def print_row(row):
+            if row['num_hubs'] is None:
+                print(f"{row['radius_km']:>9.2f} {'-':>5} {'-':>6} {'-':>7} {row['seconds']:>8.3f}")
+                return
+            print(f"{row['radius_km']:>9.2f} {row['num_hubs']:>5} {row['lower_bound']:>6} "
+                  f"{row['max_distance_km']:>7.2f} {row['seconds']:>8.3f}")
+        rows = RadiusSweep(solver).run(parse_radii(args.sweep), progress=print_row)
+        write_sweep(rows, sweep_path)
+        print(f"\nSaved radius sweep to: {sweep_path}")
+        return
+    
+    if args.solver == 'exact':
+        result = solver.min_centers_exact(drone_range=drone_range)
+        min_centers, centers = result['num_centers'], result['centers']
+        for probe in result['probes']:
+            print(f"Probe k={probe['num_centers']}: feasible={probe['feasible']} "
+                  f"({probe['seconds']:.3f}s, {probe['nodes']} nodes)")
+        if min_centers is None:
+            uncoverable = result['uncoverable_indices']
+            print(f"Exact solver: infeasible, {len(uncoverable)} points are farther than "
+                  f"{drone_range} km from every candidate site")
+            for idx in uncoverable[:MAX_LISTED_UNCOVERED]:
+                print(f"Uncoverable point {idx}: ({solver.coords[idx, 0]:.4f}, "
+                      f"{solver.coords[idx, 1]:.4f})")
+            if len(uncoverable) > MAX_LISTED_UNCOVERED:
+                print(f"... {len(uncoverable) - MAX_LISTED_UNCOVERED} more "
+                      f"(all uncoverable points are in the --log-json event stream)")
+            for idx in uncoverable:
+                TELEMETRY.event('uncoverable_point', logging.DEBUG, index=int(idx),
+                                lat=float(solver.coords[idx, 0]), lon=float(solver.coords[idx, 1]))
+        else:
+            status = "optimal" if result['optimal'] else f"lower bound {result['lower_bound']}"
+            print(f"Exact solver: {min_centers} hubs ({status})")
+    elif args.partition:
+        partitioned = solver.solve_partitioned(
+            drone_range, partition=args.partition, max_points=args.tile_points,
+            max_centers=max_centers, workers=args.workers)
+        repair = partitioned['repair']
+        print(f"Partitioned: {len(partitioned['parts'])} {args.partition} parts, "
+              f"{sum(part['num_hubs'] for part in partitioned['parts'])} hubs before repair, "
+              f"{partitioned['num_hubs']} after (+{repair['added']}, -{repair['dropped']}, "
+              f"{repair['merged']} merged) on {partitioned['workers']} workers "
+              f"in {partitioned['seconds']:.1f}s")
+        print(f"  global optimum needs at least {partitioned['hub_lower_bound']} hubs: "
+              f"within {partitioned['optimality_ratio']:.2f}x of it")
+        min_centers, centers = partitioned['num_hubs'], partitioned['centers']
+    else:
+        min_centers, centers = solver.binary_search_min_centers(
+            drone_range=drone_range, 
+            max_centers=max_centers
+        )
+        if args.multistart > 0:
+            multi = solver.solve_multistart(
+                min_centers, drone_range=drone_range, runs=args.multistart,
+                workers=args.workers, time_budget=args.local_search or DEFAULT_TIME_BUDGET, seed=args.seed)
+            spread = multi['spread']
+            print(f"Multi-start: best of {len(multi['runs'])} runs (run {multi['run']}) on "
+                  f"{multi['workers']} workers in {multi['seconds']:.1f}s: {multi['num_hubs']} hubs, "
+                  f"radius {multi['radius']:.2f} km")
+            print(f"  hubs {spread['num_hubs']['min']:.0f}-{spread['num_hubs']['max']:.0f}, "
+                  f"radius {spread['radius']['min']:.2f}-{spread['radius']['max']:.2f} km, "
+                  f"{spread['seconds']['median']:.1f}s median per run")
+            min_centers, centers = multi['num_hubs'], multi['centers']
+        elif args.local_search > 0:
+            refined = solver.improve_solution(centers, drone_range=drone_range,
+                                              time_budget=args.local_search, seed=args.seed)
+            print(f"Local search: {refined['initial_hubs']} -> {refined['num_hubs']} hubs, "
+                  f"radius {refined['initial_radius']:.2f} -> {refined['radius']:.2f} km "
+                  f"({refined['moves']} swaps, {refined['restarts']} restarts, "
+                  f"{refined['seconds']:.1f}s)")
+            min_centers, centers = refined['num_hubs'], refined['centers']
     
     if centers is None:
         print("No solution found for the given parameters.")
         return
     
-    # Get solution metrics
-    metrics = solver.evaluate_solution(centers, drone_range)
+    capacitated = None
+    if args.capacity is not None:
+        capacitated = solver.min_centers_capacitated(
+            args.capacity, drone_range=drone_range, centers=centers)
+        unservable = len(capacitated['unservable_indices'])
+        print(f"Capacitated: {capacitated['initial_hubs']} -> {capacitated['num_hubs']} hubs "
+              f"(+{capacitated['added']}, -{capacitated['dropped']}) in {capacitated['seconds']:.1f}s, "
+              f"peak utilization {capacitated['utilization'].max():.0%}, "
+              f"{len(capacitated['unassigned_indices'])} points unassigned"
+              + (f" ({unservable} heavier than any hub in range can serve)" if unservable else ""))
+        min_centers, centers = capacitated['num_hubs'], capacitated['centers']
+    
+    # Get solution metrics, on the raw points when the demand was aggregated
+    if aggregator is not None:
+        metrics = aggregator.evaluate(borough_datasets, centers, drone_range)
+    else:
+        metrics = solver.evaluate_solution(centers, drone_range)
     
     # Print solution details
     print("\nP-Center Solution Results:")
     print(f"Minimum number of hubs needed: {min_centers}")
     print(f"Maximum service distance: {metrics['max_distance']:.2f} km")
     print(f"Average service distance: {metrics['avg_distance']:.2f} km")
-    print(f"Population coverage ({drone_range}km): {metrics['coverage_percentage']:.1f}%")
-    print(f"Points covered: {metrics['covered_points']} out of {metrics['total_points']}")
+    print(f"95th percentile service distance: {metrics['distance_percentiles'][95]:.2f} km")
+    print(f"Population coverage ({drone_range}km): {metrics['weighted_coverage_percentage']:.1f}%")
+    print(f"Points covered: {metrics['covered_points']} out of {metrics['total_points']} "
+          f"({metrics['coverage_percentage']:.1f}%)")
+    print(f"Points per hub: min {metrics['hub_loads'].min()}, max {metrics['hub_loads'].max()}")
     
     # Save hub locations
     hub_df = pd.DataFrame(centers, columns=['latitude', 'longitude'])
+    if capacitated is not None:
+        hub_df['assigned_points'] = capacitated['hub_loads']
+        hub_df['assigned_weight'] = capacitated['hub_weights']
+        hub_df['utilization'] = capacitated['utilization']
+    else:
+        hub_df['assigned_points'] = metrics['hub_loads']
     hub_path = os.path.join(output_path, 'optimal_hubs.csv')
     hub_df.to_csv(hub_path, index=False)
     print(f"\nSaved hub locations to: {hub_path}")
-    
-    # Create visualization
     print(f"Number of service hubs: {len(centers)}")
     
-    # Identify uncovered points
-    uncovered_points = []
-    for point_idx, point in enumerate(solver.points):
-        min_distance = min(solver._calculate_distance(point, center) for center in centers)
-        if min_distance > drone_range:
-            uncovered_points.append(point)
-    
     # Print information about uncovered points
+    uncovered_points = metrics['uncovered_points']
     print(f"\nUncovered points: {len(uncovered_points)} out of {metrics['total_points']}")
-    for point in uncovered_points:
+    for point in uncovered_points[:MAX_LISTED_UNCOVERED]:
         print(f"Uncovered point: ({point[0]:.4f}, {point[1]:.4f})")
+    if len(uncovered_points) > MAX_LISTED_UNCOVERED:
+        print(f"... {len(uncovered_points) - MAX_LISTED_UNCOVERED} more "
+              f"(all uncovered points are in the --log-json event stream)")
+    for point in uncovered_points:
+        TELEMETRY.event('uncovered_point', logging.DEBUG, lat=float(point[0]), lon=float(point[1]))
     
     # Create visualization
-    map_obj = visualizer.create_map(geojson_data, borough_datasets, centers)
-    map_path = os.path.join(output_path, 'nyc_boroughs_solution.html')
-    map_obj.save(map_path)
+    if not args.no_map:
+        from src.vis import NYCVisualizer
+        visualizer = NYCVisualizer(timer=timer)
+        if geometry_cache_dir is not None:
+            display_geojson = data_processor.load_geojson(
+                geojson_path, cache_dir=geometry_cache_dir, variant='display')
+        else:
+            display_geojson = geojson_data
+        map_obj = visualizer.create_map(display_geojson, borough_datasets, centers)
+        map_path = os.path.join(output_path, 'nyc_boroughs_solution.html')
+        visualizer.save_map(map_obj, map_path)
+        
+        print(f"\nVisualization saved to: {map_path}")
     
-    print(f"\nVisualization saved to: {map_path}")
+    if args.timings:
+        print_timings(timer)
+    TELEMETRY.event('run_finished', logging.DEBUG, counters=TELEMETRY.snapshot(),
+                    stages=timer.summary())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,167 @@
+# src/aggregation.py
+import numpy as np
+
+from src.demand import DemandSet
+from src.distance import get_engine, to_planar_km
+from src.pCenter import PCenter
+
+# Default cell size in km (hexagon edge length or square side)
+DEFAULT_CELL_KM = 0.25
+
+CELL_SHAPES = ('hex', 'square')
+
+SQRT3 = np.sqrt(3.0)
+
+
+def _hex_cells(xy, size):
+    """Axial (q, r) coordinates of the pointy-top hexagons of edge length size holding each point"""
+    q = (SQRT3 / 3 * xy[:, 0] - xy[:, 1] / 3) / size
+    r = (2 / 3 * xy[:, 1]) / size
+    # Cube rounding: round all three coordinates, then fix the one that moved most
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return np.column_stack([rq, rr]).astype(np.int64)
+
+
+def _square_cells(xy, size):
+    return np.floor(xy / size).astype(np.int64)
+
+
+class DemandAggregator:
+    def __init__(self, cell_km=DEFAULT_CELL_KM, shape='hex', distance_method='geodesic'):
+        """
+        Coarsen demand points into weighted representatives before solving.
+
+        Points of each borough are binned into hexagonal or square cells on
+        an equirectangular projection; every occupied cell becomes one demand
+        node at the weighted centroid of its points, carrying their summed
+        weight. By the triangle inequality a raw point's service distance
+        differs from its representative's by at most the distance between
+        the two, so the largest such distance bounds the error aggregation
+        adds to any solution.
+
+        Parameters:
+        - cell_km: hexagon edge length or square side in km
+        - shape: 'hex' or 'square'
+        - distance_method: distance engine used to measure the error
+        """
+        if shape not in CELL_SHAPES:
+            raise ValueError(f"Unknown cell shape '{shape}'. Choose one of: {', '.join(CELL_SHAPES)}")
+        get_engine(distance_method)
+        self.cell_km = cell_km
+        self.shape = shape
+        self.distance_method = distance_method
+        self.labels = None
+        self.counts = None
+        self.error_km = None
+
+    @property
+    def error_bound_km(self):
+        """Largest possible raw-to-representative distance: the cell diameter"""
+        return 2 * self.cell_km if self.shape == 'hex' else float(self.cell_km * np.sqrt(2))
+
+    def aggregate(self, borough_datasets):
+        """
+        Bin the demand points of every borough
+
+        Parameters:
+        - borough_datasets: DemandSet or dictionary of borough datasets from NYCDataProcessor
+
+        Returns:
+        - DemandSet of the cell representatives, weighted by their summed
+          demand; the raw points per representative are kept in self.counts
+        """
+        if not isinstance(borough_datasets, DemandSet):
+            borough_datasets = DemandSet.from_borough_datasets(borough_datasets)
+        binner = _hex_cells if self.shape == 'hex' else _square_cells
+        engine = get_engine(self.distance_method)
+        nodes, node_weights, node_boroughs, counts = [], [], [], []
+        labels, errors = [], []
+        offset = 0
+        # Boroughs are contiguous slices of the DemandSet, so labels follow its row order
+        for boro_code, data in borough_datasets.items():
+            coords = data['points']
+            weights = data['weights'].astype(np.float64)
+            if len(coords) == 0:
+                continue
+
+            cells = binner(to_planar_km(coords, coords[:, 0].mean()), self.cell_km)
+            _, first, label = np.unique(cells, axis=0, return_index=True, return_inverse=True)
+            label = label.ravel()
+            # Number representatives in order of first appearance so output is stable
+            order = np.argsort(first, kind='stable')
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            label = rank[label]
+
+            num_cells = len(first)
+            cell_weights = np.bincount(label, weights=weights, minlength=num_cells)
+            cell_counts = np.bincount(label, minlength=num_cells)
+            centroids = np.column_stack([
+                np.bincount(label, weights=weights * coords[:, axis], minlength=num_cells)
+                for axis in range(2)])
+            # Cells whose points all weigh 0 fall back to the unweighted mean
+            empty = cell_weights <= 0
+            if empty.any():
+                centroids[empty] = np.column_stack([
+                    np.bincount(label, weights=coords[:, axis], minlength=num_cells)[empty]
+                    for axis in range(2)])
+            centroids /= np.where(empty, cell_counts, cell_weights)[:, None]
+            errors.append(engine(coords[:, 0], coords[:, 1],
+                                 centroids[label, 0], centroids[label, 1]))
+
+            nodes.append(centroids)
+            node_weights.append(cell_weights)
+            node_boroughs.append(np.full(num_cells, int(boro_code), dtype=np.int8))
+            counts.append(cell_counts)
+            labels.append(label + offset)
+            offset += num_cells
+
+        self.labels = np.concatenate(labels) if labels else np.empty(0, dtype=np.intp)
+        self.counts = np.concatenate(counts) if counts else np.empty(0, dtype=np.intp)
+        self.error_km = float(np.concatenate(errors).max()) if errors else 0.0
+        if not nodes:
+            return DemandSet(np.empty((0, 2)), borough_info=borough_datasets.borough_info)
+        return DemandSet(np.concatenate(nodes), np.concatenate(node_weights),
+                         np.concatenate(node_boroughs), borough_datasets.borough_info)
+
+    def expand(self, values):
+        """Map per-representative values (e.g. an assignment) back to the raw points"""
+        return np.asarray(values)[self.labels]
+
+    def report(self):
+        """Size reduction and the service-distance error added by aggregation"""
+        raw_points = len(self.labels)
+        nodes = int(self.labels.max()) + 1 if raw_points else 0
+        return {
+            'raw_points': raw_points,
+            'nodes': nodes,
+            'reduction': raw_points / nodes if nodes else 1.0,
+            'cell_km': self.cell_km,
+            'shape': self.shape,
+            'max_error_km': self.error_km,
+            'error_bound_km': self.error_bound_km,
+        }
+
+    def evaluate(self, raw_datasets, centers, drone_range=3.0):
+        """
+        Evaluate hub locations found on the aggregated problem against the raw points
+
+        Parameters:
+        - raw_datasets: the borough datasets before aggregation
+        - centers: list of (lat, lon) hub locations
+        - drone_range: maximum coverage radius in km
+
+        Returns:
+        - PCenter.evaluate_solution dictionary over the raw points, where
+          'assignment' indexes into centers
+        """
+        raw_solver = PCenter(raw_datasets, distance_method=self.distance_method,
+                             candidates=np.asarray(centers, dtype=np.float64))
+        raw_solver.build_coverage_index()
+        return raw_solver.evaluate_solution(np.arange(len(centers)), drone_range)
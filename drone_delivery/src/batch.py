@@ -0,0 +1,441 @@
+# src/batch.py
+import csv
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.cache import DistanceCache
+from src.data import NYCDataProcessor
+from src.geometry import BoroughGeometryStore
+from src.instrument import TELEMETRY, logger
+from src.pCenter import PCenter
+
+# Scenario parameters and their defaults, matching main.py
+SCENARIO_DEFAULTS = {
+    'seed': None,
+    'points': 200,
+    'drone_range': 3.0,
+    'max_centers': 50,
+    'boroughs': None,
+    'local_search': 0.0,
+    'capacity': None,
+    'distance_method': 'geodesic',
+}
+
+MANIFEST_FORMATS = ('.yaml', '.yml', '.json', '.csv')
+
+RESULT_COLUMNS = (['scenario_id'] + list(SCENARIO_DEFAULTS)
+                  + ['status', 'error', 'feasible', 'num_hubs', 'max_distance', 'avg_distance',
+                     'weighted_coverage', 'covered_points', 'total_points', 'hubs',
+                     'seconds', 'worker'])
+
+# Scenarios with at most this many points use the shared distance cache
+# (when one is configured); larger ones only use the sparse coverage index
+DENSE_POINT_LIMIT = 5000
+
+# Per-process state of the batch workers, set by _init_batch_worker
+_worker_state = {}
+
+
+def _parse_value(key, value):
+    """Coerce one manifest value; empty CSV cells fall back to the default"""
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value == '':
+        return SCENARIO_DEFAULTS[key]
+    if key == 'boroughs':
+        if isinstance(value, str):
+            value = [part.strip() for part in value.split(';') if part.strip()]
+        elif not isinstance(value, (list, tuple)):
+            value = [value]
+        return value
+    if key in ('seed', 'points', 'max_centers'):
+        return int(value)
+    if key in ('drone_range', 'local_search', 'capacity'):
+        return float(value)
+    return str(value)
+
+
+def normalize_scenario(entry, defaults=None, borough_codes=None):
+    """
+    Complete a manifest entry with the defaults and give it a stable id
+
+    Parameters:
+    - entry: dictionary of scenario parameters, optionally with an 'id'
+    - defaults: manifest-level defaults applied before SCENARIO_DEFAULTS
+    - borough_codes: NYCDataProcessor.borough_codes, used to accept borough names
+
+    Returns:
+    - dictionary with 'scenario_id' and every key of SCENARIO_DEFAULTS;
+      'boroughs' is a sorted list of borough codes or None for all
+    """
+    merged = dict(defaults or {})
+    merged.update({key: value for key, value in entry.items()
+                   if not (isinstance(value, float) and np.isnan(value)) and value != ''})
+    scenario_id = merged.pop('id', None)
+    unknown = set(merged) - set(SCENARIO_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown scenario parameters: {', '.join(sorted(unknown))}")
+
+    scenario = {key: _parse_value(key, merged.get(key)) for key in SCENARIO_DEFAULTS}
+    if scenario['boroughs'] is not None:
+        codes = borough_codes or NYCDataProcessor().borough_codes
+        by_name = {data['name'].lower(): code for code, data in codes.items()}
+        resolved = []
+        for borough in scenario['boroughs']:
+            code = str(borough).strip()
+            if code.endswith('.0'):
+                code = code[:-2]
+            code = by_name.get(code.lower(), code)
+            if code not in codes:
+                raise ValueError(f"Unknown borough '{borough}'")
+            resolved.append(code)
+        scenario['boroughs'] = sorted(set(resolved))
+
+    if scenario_id is None or scenario_id == '':
+        # Same parameters, same id, so reruns of an unnamed manifest can resume
+        payload = json.dumps(scenario, sort_keys=True).encode()
+        scenario_id = hashlib.sha1(payload).hexdigest()[:12]
+    return dict(scenario_id=str(scenario_id), **scenario)
+
+
+def load_manifest(path):
+    """
+    Read a scenario manifest
+
+    YAML and JSON manifests hold either a list of scenarios or a mapping
+    with optional 'defaults', 'scenarios' and 'grid' (every combination of
+    the listed values, e.g. {'seed': [0, 1], 'drone_range': [2.5, 3.0]}).
+    CSV manifests have one scenario per row; boroughs are separated by ';'
+    and empty cells take the default.
+
+    Parameters:
+    - path: manifest file (.yaml, .yml, .json or .csv)
+
+    Returns:
+    - list of normalized scenarios (see normalize_scenario), in manifest order
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in MANIFEST_FORMATS:
+        raise ValueError(f"Unsupported manifest format '{extension}'. "
+                         f"Use one of: {', '.join(MANIFEST_FORMATS)}")
+    if extension == '.csv':
+        frame = pd.read_csv(path, dtype={'id': str, 'boroughs': str})
+        document = {'scenarios': frame.to_dict('records')}
+    else:
+        with open(path) as f:
+            if extension == '.json':
+                document = json.load(f)
+            else:
+                try:
+                    import yaml
+                except ImportError:
+                    raise ImportError("YAML manifests need PyYAML (pip install pyyaml)")
+                document = yaml.safe_load(f)
+    if isinstance(document, list):
+        document = {'scenarios': document}
+
+    defaults = document.get('defaults') or {}
+    entries = list(document.get('scenarios') or [])
+    grid = document.get('grid') or {}
+    if grid:
+        keys = list(grid)
+        for values in itertools.product(*(grid[key] for key in keys)):
+            entries.append(dict(zip(keys, values)))
+
+    borough_codes = NYCDataProcessor().borough_codes
+    scenarios = [normalize_scenario(entry, defaults, borough_codes) for entry in entries]
+    seen = set()
+    for scenario in scenarios:
+        if scenario['scenario_id'] in seen:
+            raise ValueError(f"Duplicate scenario id '{scenario['scenario_id']}'")
+        seen.add(scenario['scenario_id'])
+    return scenarios
+
+
+def run_scenario(scenario, geojson_data, cache=None):
+    """
+    Solve one scenario: sample points, greedy hub search, optional local
+    search and capacity, evaluate
+
+    Parameters:
+    - scenario: normalized scenario
+    - geojson_data: GeoDataFrame of borough boundaries
+    - cache: optional DistanceCache for seeded scenarios up to DENSE_POINT_LIMIT
+      points (unseeded ones sample new points every run, so would never hit)
+
+    Returns:
+    - result row with the RESULT_COLUMNS keys; 'feasible' tells whether the
+      hubs cover every point within range (and within capacity)
+    """
+    start = time.perf_counter()
+    row = dict.fromkeys(RESULT_COLUMNS)
+    row.update(scenario, worker=os.getpid())
+    try:
+        processor = NYCDataProcessor(seed=scenario['seed'])
+        datasets = processor.process_all_boroughs(geojson_data, total_points=scenario['points'],
+                                                  boroughs=scenario['boroughs'])
+        solver = PCenter(datasets, distance_method=scenario['distance_method'])
+        if len(solver.points) == 0:
+            raise ValueError("no demand points were generated")
+        if (cache is not None and scenario['seed'] is not None
+                and len(solver.points) <= DENSE_POINT_LIMIT):
+            solver.precalculate_distances(cache=cache)
+        solver.build_coverage_index()
+
+        drone_range = scenario['drone_range']
+        _, center_indices = solver.binary_search_min_center_indices(
+            drone_range, scenario['max_centers'])
+        if scenario['local_search'] > 0:
+            center_indices = solver.improve_solution(
+                center_indices, drone_range=drone_range, time_budget=scenario['local_search'],
+                seed=scenario['seed'])['center_indices']
+        feasible = solver.test_feasibility(center_indices, drone_range)
+        if scenario['capacity'] is not None:
+            capacitated = solver.min_centers_capacitated(
+                scenario['capacity'], drone_range=drone_range, centers=center_indices)
+            center_indices = capacitated['center_indices']
+            feasible = capacitated['feasible']
+        metrics = solver.evaluate_solution(center_indices, drone_range)
+
+        row.update(
+            status='ok',
+            feasible=bool(feasible),
+            num_hubs=len(center_indices),
+            max_distance=metrics['max_distance'],
+            avg_distance=metrics['avg_distance'],
+            weighted_coverage=metrics['weighted_coverage_percentage'],
+            covered_points=metrics['covered_points'],
+            total_points=metrics['total_points'],
+            hubs=json.dumps([list(center) for center in solver._to_points(center_indices)]))
+    except Exception as e:
+        row.update(status='error', error=f"{type(e).__name__}: {e}")
+    row['seconds'] = time.perf_counter() - start
+    return row
+
+
+def _init_batch_worker(geojson_path, geometry_cache_dir, cache_dir, cache_max_bytes):
+    """Load the shared boundaries and open the distance cache once per worker"""
+    # Per-scenario events, warnings included, would interleave on the
+    # console; results carry the outcome
+    TELEMETRY.enabled = False
+    logger.disabled = True
+    processor = NYCDataProcessor()
+    geojson_data = processor.load_geojson(geojson_path, cache_dir=geometry_cache_dir,
+                                          variant='sampling')
+    cache = None
+    if cache_dir is not None:
+        cache = DistanceCache(cache_dir, max_bytes=cache_max_bytes)
+    _worker_state.update(geojson_data=geojson_data, cache=cache)
+
+
+def _batch_run(scenario):
+    return run_scenario(scenario, _worker_state['geojson_data'], _worker_state['cache'])
+
+
+def _to_csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ';'.join(map(str, value))
+    return value
+
+
+class ResultWriter:
+    def __init__(self, path):
+        """
+        Streams result rows to disk as scenarios finish.
+
+        CSV output is appended to and flushed row by row, so an interrupted
+        batch loses at most the scenarios still running. Parquet cannot be
+        appended to, so rows go to a '<path>.partial.csv' journal that is
+        merged into the Parquet file by close().
+
+        Parameters:
+        - path: output file, .csv or .parquet
+        """
+        self.path = path
+        self.parquet = path.lower().endswith('.parquet')
+        self.journal_path = f"{path}.partial.csv" if self.parquet else path
+        self._file = None
+        self._writer = None
+
+    def read(self):
+        """Rows written so far, by this or an interrupted earlier run"""
+        frames = []
+        if self.parquet and os.path.exists(self.path):
+            frames.append(pd.read_parquet(self.path))
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > 0:
+            frames.append(pd.read_csv(self.journal_path, dtype={'scenario_id': str}))
+        if not frames:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def completed_ids(self):
+        """Ids of the scenarios that already finished with a feasible cover"""
+        rows = self.read()
+        # CSV round trips turn the flag into a string or an object column
+        feasible = rows['feasible'].astype(str) == 'True'
+        return set(rows.loc[(rows['status'] == 'ok') & feasible, 'scenario_id'].astype(str))
+
+    def write(self, row):
+        if self._file is None:
+            directory = os.path.dirname(os.path.abspath(self.journal_path))
+            os.makedirs(directory, exist_ok=True)
+            new_file = (not os.path.exists(self.journal_path)
+                        or os.path.getsize(self.journal_path) == 0)
+            self._file = open(self.journal_path, 'a', newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=RESULT_COLUMNS)
+            if new_file:
+                self._writer.writeheader()
+        self._writer.writerow({key: _to_csv_value(row.get(key)) for key in RESULT_COLUMNS})
+        self._file.flush()
+
+    def _drop_superseded_csv(self):
+        """Rewrite the CSV output keeping only the last row of each scenario"""
+        with open(self.path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        latest = {row['scenario_id']: index for index, row in enumerate(rows)}
+        if len(latest) == len(rows):
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(row for index, row in enumerate(rows)
+                             if latest[row['scenario_id']] == index)
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not os.path.exists(self.journal_path):
+            return
+        # A retried scenario supersedes its earlier row
+        if not self.parquet:
+            self._drop_superseded_csv()
+            return
+        rows = self.read().drop_duplicates('scenario_id', keep='last')
+        rows['scenario_id'] = rows['scenario_id'].astype(str)
+        rows['boroughs'] = rows['boroughs'].astype('string')
+        tmp_path = f"{self.path}.tmp"
+        rows.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+        os.remove(self.journal_path)
+
+
+class BatchRunner:
+    def __init__(self, geojson_path, workers=None, geometry_cache_dir=None, cache_dir=None,
+                 cache_max_bytes=None):
+        """
+        Runs many scenarios on one persistent process pool.
+
+        The interpreter, geopandas and the solver modules are imported once;
+        every worker loads the borough boundaries once in its initializer,
+        from the binary geometry cache that the parent builds up front, and
+        opens the shared on-disk distance cache, whose matrices are memory
+        mapped so all workers read the same pages. Results are streamed to
+        a ResultWriter as they finish, and scenarios already completed in
+        the output are skipped, so an interrupted batch resumes where it
+        stopped.
+
+        Parameters:
+        - geojson_path: path of the borough GeoJSON
+        - workers: worker processes, defaults to the CPU count; 1 runs in this process
+        - geometry_cache_dir: BoroughGeometryStore directory, None to parse
+          the GeoJSON in every worker
+        - cache_dir: optional DistanceCache directory shared by the workers
+        - cache_max_bytes: size limit of the distance cache
+        """
+        self.geojson_path = geojson_path
+        self.workers = workers or multiprocessing.cpu_count()
+        self.geometry_cache_dir = geometry_cache_dir
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+
+    def run(self, scenarios, output_path, resume=True, progress=None):
+        """
+        Run scenarios and stream their results to output_path
+
+        Parameters:
+        - scenarios: normalized scenarios, e.g. from load_manifest
+        - output_path: .csv or .parquet result file
+        - resume: skip scenarios that already finished with a feasible cover in
+          output_path; otherwise an existing output is replaced
+        - progress: optional callback progress(row, done, total) per finished scenario
+
+        Returns:
+        - dictionary with the number of 'scenarios', 'skipped', 'ok' and
+          'failed' runs, how many of the ok runs are 'infeasible', the
+          'workers' used and the wall-clock 'seconds'
+        """
+        start = time.perf_counter()
+        writer = ResultWriter(output_path)
+        if not resume:
+            for path in (writer.path, writer.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        done_ids = writer.completed_ids() if resume else set()
+        pending = [scenario for scenario in scenarios if scenario['scenario_id'] not in done_ids]
+
+        if self.geometry_cache_dir is not None:
+            # Parse the GeoJSON once here so every worker only reads the binary cache
+            store = BoroughGeometryStore(self.geojson_path, self.geometry_cache_dir)
+            if not store.is_fresh():
+                store.build()
+
+        init_args = (self.geojson_path, self.geometry_cache_dir, self.cache_dir,
+                     self.cache_max_bytes)
+        counts = {'ok': 0, 'failed': 0, 'infeasible': 0}
+        workers = min(self.workers, len(pending)) if pending else 0
+
+        def record(row):
+            writer.write(row)
+            counts['ok' if row['status'] == 'ok' else 'failed'] += 1
+            if row['status'] == 'ok' and not row['feasible']:
+                counts['infeasible'] += 1
+            done = counts['ok'] + counts['failed']
+            TELEMETRY.count('scenarios_done')
+            TELEMETRY.event('scenario_finished', logging.DEBUG, scenario_id=row['scenario_id'],
+                            status=row['status'], feasible=row['feasible'],
+                            seconds=row['seconds'])
+            TELEMETRY.progress('batch', done, len(pending))
+            if progress is not None:
+                progress(row, done, len(pending))
+
+        try:
+            if workers == 1:
+                enabled, disabled = TELEMETRY.enabled, logger.disabled
+                _init_batch_worker(*init_args)
+                try:
+                    for scenario in pending:
+                        TELEMETRY.enabled, logger.disabled = False, True
+                        row = _batch_run(scenario)
+                        TELEMETRY.enabled, logger.disabled = enabled, disabled
+                        record(row)
+                finally:
+                    TELEMETRY.enabled, logger.disabled = enabled, disabled
+                    _worker_state.clear()
+            elif workers > 1:
+                with multiprocessing.Pool(workers, initializer=_init_batch_worker,
+                                          initargs=init_args) as pool:
+                    for row in pool.imap_unordered(_batch_run, pending):
+                        record(row)
+        finally:
+            writer.close()
+
+        return {
+            'scenarios': len(scenarios),
+            'skipped': len(scenarios) - len(pending),
+            'ok': counts['ok'],
+            'failed': counts['failed'],
+            'infeasible': counts['infeasible'],
+            'workers': workers,
+            'seconds': time.perf_counter() - start,
+        }
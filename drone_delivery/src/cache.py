@@ -0,0 +1,169 @@
+# src/cache.py
+import hashlib
+import os
+
+import numpy as np
+
+from src.distance import distance_matrix, parallel_distance_matrix
+
+# Default upper bound on the total size of the cache directory
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+
+# Bumped whenever the on-disk layout changes, so stale files never match
+CACHE_VERSION = 1
+
+# Subdirectories of a cache root (--cache-dir), shared by main.py and batch.py
+CACHE_KINDS = ('matrices', 'geometry', 'population')
+
+
+def cache_subdir(cache_root, kind):
+    """Directory of one kind of cached data under a cache root"""
+    if kind not in CACHE_KINDS:
+        raise ValueError(f"Unknown cache kind '{kind}'. Choose one of: {', '.join(CACHE_KINDS)}")
+    return os.path.join(cache_root, kind)
+
+
+class DistanceCache:
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        On-disk cache of distance matrices stored as float32 .npy files.
+
+        Entries are keyed by a hash of the point coordinates, the candidate
+        sites (for demand x candidate matrices) and the distance engine, and
+        are opened as read-only memory maps so a solver only pages in the
+        rows it touches. The directory is kept under max_bytes by
+        evicting the least recently used entries.
+
+        Parameters:
+        - cache_dir: directory holding the cached matrices
+        - max_bytes: size limit of the cache directory in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, points, method, candidates=None):
+        """Hash identifying a point set, candidate set and distance engine"""
+        coords = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 2)
+        digest = hashlib.sha256()
+        digest.update(f"v{CACHE_VERSION}:{method}:{coords.shape[0]}:".encode())
+        digest.update(coords.tobytes())
+        if candidates is not None:
+            sites = np.ascontiguousarray(candidates, dtype=np.float64).reshape(-1, 2)
+            digest.update(f":candidates:{sites.shape[0]}:".encode())
+            digest.update(sites.tobytes())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def load(self, points, method, candidates=None):
+        """
+        Open a cached matrix as a read-only memory map
+
+        Returns:
+        - the memory-mapped matrix, or None when it is not cached
+        """
+        path = self.path(self.key(points, method, candidates))
+        if not os.path.exists(path):
+            return None
+        # Touch the entry so eviction sees it as recently used
+        os.utime(path)
+        return np.load(path, mmap_mode='r')
+
+    def get_or_build(self, points, method, block_size=None, workers=None, progress=None,
+                     candidates=None):
+        """
+        Load the matrix for points from the cache, building and storing it first if needed
+
+        Parameters:
+        - points: sequence or (N, 2) array of (lat, lon) points
+        - method: distance engine name
+        - block_size: rows per block for a single-process build
+        - workers: build with this many processes writing into the cache file
+        - progress: optional callback progress(done_tiles, total_tiles) for parallel builds
+        - candidates: optional (M, 2) candidate sites for a demand x candidate matrix
+
+        Returns:
+        - read-only memory-mapped float32 (N, N) or (N, M) matrix
+        """
+        cached = self.load(points, method, candidates)
+        if cached is not None:
+            return cached
+
+        coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        num_cols = len(coords) if candidates is None else len(candidates)
+        path = self.path(self.key(coords, method, candidates))
+        tmp_path = f"{path[:-len('.npy')]}.{os.getpid()}.tmp.npy"
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                        shape=(len(coords), num_cols))
+        try:
+            if workers is not None and workers > 1:
+                parallel_distance_matrix(coords, method=method, workers=workers,
+                                         out=out, progress=progress, candidates=candidates)
+            else:
+                distance_matrix(coords, method=method, block_size=block_size, out=out,
+                                candidates=candidates)
+            out.flush()
+            del out
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.evict(keep=path)
+        return np.load(path, mmap_mode='r')
+
+    def entries(self):
+        """Cached files as (path, size, last access) tuples, oldest first"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npy') or '.tmp.' in name:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Evicted by another process sharing the cache directory
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def size(self):
+        """Total size of the cached matrices in bytes"""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """
+        Delete least recently used entries until the cache fits in max_bytes
+
+        Parameters:
+        - keep: path that must survive eviction (typically the entry just written)
+
+        Returns:
+        - number of entries removed
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            else:
+                removed += 1
+            total -= size
+        return removed
+
+    def clear(self):
+        """Remove every cached matrix, returns the number of entries removed"""
+        entries = self.entries()
+        for path, _, _ in entries:
+            os.remove(path)
+        return len(entries)
@@ -0,0 +1,120 @@
+# src/candidates.py
+# pandas, shapely and scipy are imported by the functions that need them, so
+# importing the candidate constants (e.g. for argument parsing) stays cheap
+import numpy as np
+
+from src.distance import KM_PER_DEG_LAT, KM_PER_DEG_LON, to_planar_km
+
+# Default spacing of the grid candidates in km
+GRID_SPACING_KM = 0.5
+
+# Lloyd iterations used by cluster_candidates
+CLUSTER_ITERATIONS = 20
+
+CANDIDATE_SOURCES = ('points', 'grid', 'cluster')
+
+
+def grid_candidates(geojson_data, spacing_km=GRID_SPACING_KM):
+    """
+    Candidate hub sites on a regular lat/lon grid, kept only inside the borough geometries
+
+    Parameters:
+    - geojson_data: GeoDataFrame of borough boundaries
+    - spacing_km: distance between neighbouring grid sites in km
+
+    Returns:
+    - (M, 2) array of (lat, lon) candidate sites
+    """
+    import shapely
+
+    min_lon, min_lat, max_lon, max_lat = geojson_data.total_bounds
+    lat_step = spacing_km / KM_PER_DEG_LAT
+    lon_step = spacing_km / (KM_PER_DEG_LON * np.cos(np.radians((min_lat + max_lat) / 2)))
+    lats, lons = np.meshgrid(np.arange(min_lat, max_lat + lat_step, lat_step),
+                             np.arange(min_lon, max_lon + lon_step, lon_step), indexing='ij')
+    lats, lons = lats.ravel(), lons.ravel()
+
+    inside = np.zeros(len(lats), dtype=bool)
+    for geometry in geojson_data.geometry:
+        shapely.prepare(geometry)
+        inside |= shapely.contains_xy(geometry, lons, lats)
+    return np.column_stack([lats[inside], lons[inside]])
+
+
+def load_candidates_csv(file_path):
+    """
+    Read candidate hub sites (rooftops, depots, ...) from a CSV file
+
+    Parameters:
+    - file_path: CSV with 'latitude'/'longitude' (or 'lat'/'lon') columns
+
+    Returns:
+    - (M, 2) array of (lat, lon) candidate sites, duplicates removed
+    """
+    import pandas as pd
+
+    frame = pd.read_csv(file_path)
+    columns = {name.lower(): name for name in frame.columns}
+    for lat_col, lon_col in (('latitude', 'longitude'), ('lat', 'lon')):
+        if lat_col in columns and lon_col in columns:
+            coords = frame[[columns[lat_col], columns[lon_col]]].to_numpy(dtype=np.float64)
+            _, first = np.unique(coords, axis=0, return_index=True)
+            return coords[np.sort(first)]
+    raise ValueError(f"Candidate file {file_path} needs latitude/longitude columns")
+
+
+def cluster_candidates(points, weights=None, num_candidates=300, seed=None,
+                       iterations=CLUSTER_ITERATIONS):
+    """
+    Candidate hub sites as a clustered subset of the demand points.
+
+    Runs a weighted k-means (Lloyd iterations on an equirectangular
+    projection) and snaps every centroid to its closest demand point, so
+    each candidate is a real demand location.
+
+    Parameters:
+    - points: (N, 2) array of (lat, lon) demand points
+    - weights: demand weight per point, defaults to 1
+    - num_candidates: number of clusters
+    - seed: seed for the initial centroid draw
+    - iterations: maximum number of Lloyd iterations
+
+    Returns:
+    - (M, 2) array of (lat, lon) candidate sites, M <= num_candidates
+    """
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    weights = np.ones(len(coords)) if weights is None else np.asarray(weights, dtype=np.float64)
+    num_candidates = min(num_candidates, len(coords))
+    if num_candidates <= 0:
+        return np.empty((0, 2))
+    from scipy.spatial import cKDTree
+
+    planar = to_planar_km(coords, coords[:, 0].mean())
+    rng = np.random.default_rng(seed)
+    # Weighted draw among the points with demand; if there are too few, the
+    # rest of the seeds are spread evenly over the zero-weight points
+    demand = np.flatnonzero(weights > 0)
+    start = np.empty(0, dtype=np.intp)
+    if len(demand):
+        start = rng.choice(demand, size=min(num_candidates, len(demand)), replace=False,
+                           p=weights[demand] / weights[demand].sum())
+    if len(start) < num_candidates:
+        rest = np.setdiff1d(np.arange(len(coords)), start)
+        fill = np.linspace(0, len(rest) - 1, num_candidates - len(start)).round().astype(np.intp)
+        start = np.concatenate([start, rest[fill]])
+    centroids = planar[start]
+    for _ in range(iterations):
+        _, labels = cKDTree(centroids).query(planar)
+        mass = np.bincount(labels, weights=weights, minlength=num_candidates)
+        occupied = mass > 0
+        moved = np.column_stack([
+            np.bincount(labels, weights=weights * planar[:, axis], minlength=num_candidates)
+            for axis in range(2)])
+        updated = centroids.copy()
+        updated[occupied] = moved[occupied] / mass[occupied, None]
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+
+    _, nearest = cKDTree(planar).query(centroids)
+    return coords[np.unique(nearest)]
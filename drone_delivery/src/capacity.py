@@ -0,0 +1,298 @@
+# src/capacity.py
+import logging
+import time
+
+import numpy as np
+
+from src.instrument import TELEMETRY
+
+# Wall-clock budget in seconds for dropping surplus hubs after the capacitated search
+DEFAULT_DROP_BUDGET = 10.0
+
+# Rounds of moving assigned points to closer hubs with spare capacity
+SHIFT_ROUNDS = 10
+
+# Tolerance on capacity comparisons of floating-point weight sums
+CAPACITY_EPS = 1e-9
+
+
+def _first_per_group(groups):
+    """Mask of the first element of every run of equal values in a grouped array"""
+    first = np.ones(len(groups), dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    return first
+
+
+def _accept_within_capacity(hubs, weights, residual):
+    """
+    Which of a batch of (hub, weight) requests fit, taking requests in the given order per hub
+
+    Parameters:
+    - hubs: requested hub position of every request, grouped by hub
+    - weights: demand weight of every request
+    - residual: remaining capacity per hub position
+
+    Returns:
+    - boolean mask of the accepted requests (a prefix of every hub's group)
+    """
+    cumulative = np.cumsum(weights)
+    first = _first_per_group(hubs)
+    group_start = (cumulative - weights)[first][np.cumsum(first) - 1]
+    return cumulative - group_start <= residual[hubs] + CAPACITY_EPS
+
+
+class CapacitatedAssignment:
+    def __init__(self, solver, capacity):
+        """
+        Assignment of demand points to hubs that can each serve a limited
+        demand weight (e.g. a number of drones times their daily deliveries).
+
+        Points are only assigned to hubs within range, using the sparse
+        point-hub pairs of the radius-neighbour index, so work scales with the
+        number of pairs rather than points x hubs. Assignment is a batched
+        greedy-regret: in every round each open point bids for its nearest
+        hub with room left, points with the fewest alternatives (largest gap
+        to their second choice) are served first, and each hub accepts bids
+        up to its residual capacity with one cumulative sum. Rejected points
+        bid again next round. Afterwards, points move to closer hubs that
+        still have room.
+
+        Parameters:
+        - solver: PCenter instance; its point weights are the demand
+        - capacity: maximum demand weight per hub, a scalar or an array with
+          one value per candidate site
+        """
+        self.solver = solver
+        capacity = np.asarray(capacity, dtype=np.float64)
+        if capacity.ndim == 0:
+            capacity = np.full(len(solver.candidates), float(capacity))
+        if capacity.shape != (len(solver.candidates),):
+            raise ValueError(f"Expected a scalar capacity or one per candidate site "
+                             f"({len(solver.candidates)}), got shape {capacity.shape}")
+        self.capacity = capacity
+
+    def _pairs(self, center_indices, drone_range):
+        """Point-hub pairs within range, sorted by point then distance"""
+        solver = self.solver
+        if solver.coverage_index is not None:
+            points, positions, dists = solver.coverage_index.pairs(center_indices, drone_range)
+        elif solver.distance_matrix is not None:
+            points, positions, dists = [], [], []
+            for position, center_idx in enumerate(center_indices):
+                row = np.asarray(solver._distance_row(center_idx), dtype=np.float64)
+                near = np.flatnonzero(row <= drone_range)
+                points.append(near)
+                positions.append(np.full(len(near), position, dtype=np.intp))
+                dists.append(row[near])
+            points, positions, dists = (np.concatenate(points), np.concatenate(positions),
+                                        np.concatenate(dists))
+        else:
+            # Only the hubs are indexed, which is far cheaper than all candidates
+            from src.coverage import CoverageIndex
+            index = CoverageIndex(solver.coords, candidates=solver.candidates[center_indices],
+                                  method=solver.distance_method)
+            points, positions, dists = index.pairs(np.arange(len(center_indices)), drone_range)
+        order = np.lexsort((dists, points))
+        return points[order], positions[order].astype(np.intp), dists[order]
+
+    def assign(self, center_indices, drone_range):
+        """
+        Assign every point to a hub within drone_range without exceeding capacities
+
+        Parameters:
+        - center_indices: candidate indices of the hubs
+        - drone_range: maximum service distance in km
+
+        Returns:
+        - dictionary with 'assignment' (candidate index per point, -1 when
+          unassigned), service 'distances' (inf when unassigned),
+          'unassigned_indices', 'feasible', per-hub 'hub_weights',
+          'hub_loads', 'capacities' and 'utilization', 'max_distance' of the
+          assigned points, and the assignment 'rounds' and 'seconds'
+        """
+        center_indices = np.asarray(center_indices, dtype=np.intp)
+        return self._assign_pairs(center_indices, self._pairs(center_indices, drone_range))
+
+    def _assign_pairs(self, center_indices, pairs):
+        """assign() over precomputed pairs from _pairs()"""
+        start = time.perf_counter()
+        weights = self.solver.weights
+        num_points, num_hubs = len(weights), len(center_indices)
+        capacities = self.capacity[center_indices]
+        residual = capacities.copy()
+        position = np.full(num_points, -1, dtype=np.intp)
+        served = np.full(num_points, np.inf)
+
+        points, hubs, dists = pairs
+        edge_weights = weights[points]
+        rounds = 0
+        while True:
+            live = np.flatnonzero((position[points] < 0)
+                                  & (residual[hubs] + CAPACITY_EPS >= edge_weights))
+            if len(live) == 0:
+                break
+            rounds += 1
+            # Best and second-best open hub of every point (pairs are sorted per point)
+            first = _first_per_group(points[live])
+            starts = np.flatnonzero(first)
+            best = live[starts]
+            regret = np.full(len(starts), np.inf)
+            has_second = starts + 1 < len(live)
+            has_second[has_second] = ~first[starts[has_second] + 1]
+            regret[has_second] = dists[live[starts[has_second] + 1]] - dists[best[has_second]]
+
+            # Per hub, points with the most to lose are served first, then the nearest
+            order = np.lexsort((dists[best], -regret, hubs[best]))
+            bids = best[order]
+            accepted = bids[_accept_within_capacity(hubs[bids], edge_weights[bids], residual)]
+            position[points[accepted]] = hubs[accepted]
+            served[points[accepted]] = dists[accepted]
+            residual -= np.bincount(hubs[accepted], weights=edge_weights[accepted],
+                                    minlength=num_hubs)
+
+        for _ in range(SHIFT_ROUNDS):
+            # Move points to the nearest strictly closer hub that has room
+            closer = np.flatnonzero((dists < served[points]) & (position[points] >= 0)
+                                    & (residual[hubs] + CAPACITY_EPS >= edge_weights))
+            if len(closer) == 0:
+                break
+            moves = closer[_first_per_group(points[closer])]
+            order = np.lexsort((dists[moves] - served[points[moves]], hubs[moves]))
+            moves = moves[order]
+            moves = moves[_accept_within_capacity(hubs[moves], edge_weights[moves], residual)]
+            moved = points[moves]
+            residual += np.bincount(position[moved], weights=weights[moved], minlength=num_hubs)
+            residual -= np.bincount(hubs[moves], weights=weights[moved], minlength=num_hubs)
+            position[moved] = hubs[moves]
+            served[moved] = dists[moves]
+
+        assigned = position >= 0
+        unassigned = np.flatnonzero(~assigned)
+        hub_weights = capacities - residual
+        TELEMETRY.count('capacitated_assignments')
+        return {
+            'assignment': np.where(assigned, center_indices[np.maximum(position, 0)], -1),
+            'distances': served,
+            'unassigned_indices': unassigned,
+            'feasible': len(unassigned) == 0,
+            'hub_weights': hub_weights,
+            'hub_loads': np.bincount(position[assigned], minlength=num_hubs),
+            'capacities': capacities,
+            'utilization': np.divide(hub_weights, capacities, out=np.zeros(num_hubs),
+                                     where=capacities > 0),
+            'max_distance': float(served[assigned].max()) if assigned.any() else 0.0,
+            'rounds': rounds,
+            'seconds': time.perf_counter() - start,
+        }
+
+    def min_hubs(self, center_indices, drone_range, max_centers=None,
+                 time_budget=DEFAULT_DROP_BUDGET):
+        """
+        Fewest hubs that serve every point within range under the capacities
+
+        Starting from a solution (e.g. the uncapacitated greedy), hubs are
+        added until every point is assigned: each round picks as many
+        candidates as the unassigned demand needs at full capacity, greedily
+        by the unassigned demand within their range. Then hubs are dropped,
+        least-loaded first, as long as the rest can still absorb their
+        demand or the time budget runs out; the pairs of the current hubs
+        are computed once and filtered for every trial. Points heavier than
+        the capacity of every candidate in their range (e.g. aggregated
+        cells) can never be assigned; they are reported up front and
+        ignored by both phases.
+
+        Parameters:
+        - center_indices: starting candidate indices
+        - drone_range: maximum service distance in km
+        - max_centers: upper limit on the number of hubs
+        - time_budget: wall-clock limit in seconds of the drop phase
+
+        Returns:
+        - dictionary as returned by assign() for the final hubs, plus
+          'center_indices', 'num_hubs', 'initial_hubs', 'added', 'dropped'
+          and 'unservable_indices', the points no hub in range has the
+          capacity for
+        """
+        start = time.perf_counter()
+        solver = self.solver
+        if solver.coverage_index is None:
+            solver.build_coverage_index()
+        max_centers = min(max_centers or len(solver.candidates), len(solver.candidates))
+        neighbors = solver.coverage_index.radius_neighbors(drone_range)
+        columns = neighbors.tocsc()
+        point_rows = np.repeat(np.arange(neighbors.shape[0]), np.diff(neighbors.indptr))
+        max_capacity = self.capacity.max() if len(self.capacity) else 0.0
+
+        # Largest capacity among the candidates in range of each point
+        reach = np.zeros(neighbors.shape[0])
+        nonempty = np.diff(neighbors.indptr) > 0
+        if nonempty.any():
+            reach[nonempty] = np.maximum.reduceat(self.capacity[neighbors.indices],
+                                                  neighbors.indptr[:-1][nonempty])
+        servable = solver.weights <= reach + CAPACITY_EPS
+        unservable = np.flatnonzero(~servable)
+        if len(unservable):
+            TELEMETRY.event('capacity_unservable', logging.WARNING,
+                            message=f"{len(unservable)} points weigh more than the capacity "
+                                    f"of every hub site in range and cannot be assigned",
+                            points=len(unservable), drone_range=drone_range)
+
+        def servable_unassigned(result):
+            unassigned = result['unassigned_indices']
+            return unassigned[servable[unassigned]]
+
+        hubs = np.asarray(center_indices, dtype=np.intp)
+        result = self.assign(hubs, drone_range)
+        added = 0
+        while len(servable_unassigned(result)) and len(hubs) < max_centers and max_capacity > 0:
+            open_weight = np.zeros(len(solver.weights))
+            unassigned = servable_unassigned(result)
+            open_weight[unassigned] = solver.weights[unassigned]
+            wanted = min(int(np.ceil(open_weight.sum() / max_capacity)), max_centers - len(hubs))
+            picks = []
+            for _ in range(max(wanted, 1)):
+                # Unassigned demand each candidate could take on, up to its capacity
+                gain = np.minimum(np.bincount(neighbors.indices, weights=open_weight[point_rows],
+                                              minlength=len(solver.candidates)), self.capacity)
+                gain[hubs] = 0.0
+                gain[picks] = 0.0
+                candidate = int(np.argmax(gain))
+                if gain[candidate] <= 0:
+                    break
+                picks.append(candidate)
+                open_weight[columns.indices[columns.indptr[candidate]:columns.indptr[candidate + 1]]] = 0.0
+            if not picks:
+                # The remaining points are out of range of every candidate
+                break
+            hubs = np.concatenate([hubs, np.asarray(picks, dtype=np.intp)])
+            added += len(picks)
+            result = self.assign(hubs, drone_range)
+            TELEMETRY.progress('capacitated_search', len(hubs))
+
+        dropped = 0
+        if len(servable_unassigned(result)) == 0:
+            deadline = time.perf_counter() + time_budget
+            points, positions, dists = self._pairs(hubs, drone_range)
+            # Unservable points stay within range of a hub, like without capacities
+            in_range = np.zeros(len(solver.weights), dtype=bool)
+            in_range[points] = True
+            watched = unservable[in_range[unservable]]
+            for hub in hubs[np.argsort(result['hub_weights'], kind='stable')]:
+                if time.perf_counter() > deadline or len(hubs) == 1:
+                    break
+                position = int(np.flatnonzero(hubs == hub)[0])
+                keep = positions != position
+                trial_pairs = (points[keep], positions[keep] - (positions[keep] > position),
+                               dists[keep])
+                if len(watched) and not np.isin(watched, trial_pairs[0]).all():
+                    continue
+                trial = self._assign_pairs(np.delete(hubs, position), trial_pairs)
+                if len(servable_unassigned(trial)) == 0:
+                    hubs, result = np.delete(hubs, position), trial
+                    points, positions, dists = trial_pairs
+                    dropped += 1
+
+        result.update(center_indices=hubs, num_hubs=len(hubs),
+                      initial_hubs=len(center_indices), added=added, dropped=dropped,
+                      unservable_indices=unservable, seconds=time.perf_counter() - start)
+        return result
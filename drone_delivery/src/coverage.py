@@ -0,0 +1,149 @@
+# src/coverage.py
+import numpy as np
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from src.distance import EARTH_RADIUS_KM, get_engine
+
+# The tree works on a sphere; the ellipsoid differs from it by well under
+# 1%, so searches are padded by this factor and then filtered exactly.
+SPHERE_SLACK = 1.01
+
+# Demand points handled per tree query, bounds the temporary pair arrays
+QUERY_CHUNK = 4096
+
+# Nearest tree neighbours re-checked with the exact engine in nearest()
+NEAREST_CHECK = 4
+
+
+def to_unit_sphere(lats, lons):
+    """Convert degrees latitude/longitude to 3-D unit-sphere coordinates"""
+    lat, lon = np.radians(lats), np.radians(lons)
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def chord_length(radius_km):
+    """Straight-line unit-sphere distance equivalent to a surface distance"""
+    return 2 * np.sin(min(radius_km / (2 * EARTH_RADIUS_KM), np.pi / 2))
+
+
+class CoverageIndex:
+    def __init__(self, points, candidates=None, method='geodesic'):
+        """
+        Radius-neighbour index answering "which points lie within range of a hub"
+        without a dense distance matrix.
+
+        Points and candidate sites are placed on the unit sphere and indexed
+        with KD-trees; neighbour lists come back as sparse matrices whose
+        memory scales with the number of neighbours rather than N^2.
+
+        Parameters:
+        - points: sequence or (N, 2) array of (lat, lon) demand points
+        - candidates: (M, 2) candidate hub sites, defaults to the demand points
+        - method: distance engine used for the exact distances
+        """
+        self.engine = get_engine(method)
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if candidates is None:
+            self.candidates = self.points
+        else:
+            self.candidates = np.asarray(candidates, dtype=np.float64).reshape(-1, 2)
+        self._point_xyz = to_unit_sphere(self.points[:, 0], self.points[:, 1])
+        if self.candidates is self.points:
+            self._candidate_xyz = self._point_xyz
+        else:
+            self._candidate_xyz = to_unit_sphere(self.candidates[:, 0], self.candidates[:, 1])
+        self._candidate_tree = cKDTree(self._candidate_xyz)
+        self._cached_radius = None
+        self._cached_neighbors = None
+        self._cached_columns = None
+
+    def radius_neighbors(self, radius):
+        """
+        Sparse neighbour lists within radius
+
+        Parameters:
+        - radius: coverage radius in km
+
+        Returns:
+        - (N, M) CSR matrix; row i lists the candidates within radius of
+          point i, with the exact distance (explicit zeros included) as data
+        """
+        if self._cached_radius == radius:
+            return self._cached_neighbors
+
+        chord = chord_length(radius * SPHERE_SLACK)
+        rows, cols, dists = [], [], []
+        for start in range(0, len(self.points), QUERY_CHUNK):
+            stop = min(start + QUERY_CHUNK, len(self.points))
+            chunk_tree = cKDTree(self._point_xyz[start:stop])
+            pairs = chunk_tree.sparse_distance_matrix(
+                self._candidate_tree, chord, output_type='ndarray')
+            i = pairs['i'] + start
+            j = pairs['j']
+            d = self.engine(self.points[i, 0], self.points[i, 1],
+                            self.candidates[j, 0], self.candidates[j, 1])
+            keep = d <= radius
+            rows.append(i[keep].astype(np.int32))
+            cols.append(j[keep].astype(np.int32))
+            dists.append(d[keep])
+
+        neighbors = sparse.csr_matrix(
+            (np.concatenate(dists), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(len(self.points), len(self.candidates)))
+        self._cached_radius = radius
+        self._cached_neighbors = neighbors
+        self._cached_columns = None
+        return neighbors
+
+    def covered_mask(self, center_indices, radius):
+        """Boolean mask of the points within radius of any of the given candidates"""
+        neighbors = self.radius_neighbors(radius)
+        if self._cached_columns is None:
+            self._cached_columns = neighbors.tocsc()
+        covers = self._cached_columns[:, np.asarray(center_indices)]
+        covered = np.zeros(len(self.points), dtype=bool)
+        covered[covers.indices] = True
+        return covered
+
+    def pairs(self, center_indices, radius):
+        """
+        Point-center pairs within radius
+
+        Parameters:
+        - center_indices: candidate indices of the chosen centers
+        - radius: coverage radius in km
+
+        Returns:
+        - points, positions (in center_indices) and exact distances of every pair
+        """
+        neighbors = self.radius_neighbors(radius)
+        if self._cached_columns is None:
+            self._cached_columns = neighbors.tocsc()
+        covers = self._cached_columns[:, np.asarray(center_indices)]
+        positions = np.repeat(np.arange(covers.shape[1]), np.diff(covers.indptr))
+        return covers.indices.astype(np.intp), positions, covers.data
+
+    def nearest(self, center_indices):
+        """
+        Nearest center for every point
+
+        Parameters:
+        - center_indices: candidate indices of the chosen centers
+
+        Returns:
+        - assignment: position in center_indices of each point's nearest center
+        - distances: exact distance from each point to that center in km
+        """
+        center_indices = np.asarray(center_indices, dtype=np.intp)
+        centers = self.candidates[center_indices]
+        tree = cKDTree(self._candidate_xyz[center_indices])
+        k = min(NEAREST_CHECK, len(center_indices))
+        _, near = tree.query(self._point_xyz, k=k)
+        near = near.reshape(len(self.points), k)
+        dists = self.engine(self.points[:, 0, None], self.points[:, 1, None],
+                            centers[near, 0], centers[near, 1])
+        best = np.argmin(dists, axis=1)
+        rows = np.arange(len(self.points))
+        return near[rows, best], dists[rows, best]
@@ -1,12 +1,38 @@
 # src/data.py
 import geopandas as gpd
-import pandas as pd
 import numpy as np
-from shapely.geometry import Point, Polygon, MultiPolygon
-import os
+import shapely
+from shapely.geometry import MultiPolygon
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src.demand import DemandSet
+from src.geometry import BoroughGeometryStore
+from src.instrument import StageTimer, TELEMETRY, timed
+
+# Upper bound on random draws per requested point before sampling gives up
+MAX_DRAWS_PER_POINT = 10000
+
+# Borough densities are per square mile, population grids per km²
+SQ_KM_PER_SQ_MILE = 2.589988
 
 class NYCDataProcessor:
-    def __init__(self):
+    def __init__(self, seed=None, timer=None, population=None):
+        """
+        Parameters:
+        - seed: seed (or numpy SeedSequence) for the random generator used in
+          sampling, None for a fresh unpredictable stream
+        - timer: StageTimer recording the 'load_geojson' and 'sampling' stages,
+          a private one by default
+        - population: optional PopulationGrid; sampling density and point
+          weights then follow it instead of the borough density model
+        """
+        self.timer = timer or StageTimer()
+        self.population = population
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
         # Borough data from 2020 census
         self.borough_codes = {
             "1": {
@@ -44,11 +70,24 @@ class NYCDataProcessor:
         self.total_population = sum(b["population"] for b in self.borough_codes.values())
         self.max_density = max(b["density"] for b in self.borough_codes.values())
 
-    def load_geojson(self, file_path):
+    @timed('load_geojson')
+    def load_geojson(self, file_path, cache_dir=None, variant='full'):
+        """
+        Load borough boundaries
+        
+        Parameters:
+        - file_path: path of the borough GeoJSON
+        - cache_dir: optional directory of a BoroughGeometryStore; the GeoJSON
+          is then parsed once and later loads read the binary cache
+        - variant: cached variant to load, 'full', 'sampling' or 'display'
+        """
         try:
+            if cache_dir is not None:
+                return BoroughGeometryStore(file_path, cache_dir).load(variant)
             return gpd.read_file(file_path)
         except Exception as e:
-            print(f"Error loading GeoJSON: {e}")
+            TELEMETRY.event('geojson_load_failed', logging.ERROR,
+                            message=f"Error loading GeoJSON: {e}", path=file_path, error=str(e))
             return gpd.GeoDataFrame()
 
     def create_borough_polygon(self, geometry):
@@ -58,75 +97,216 @@ class NYCDataProcessor:
 
     def get_density_weight(self, point, boro_code):
         """Calculate weight based on actual density and distance to centers"""
-        lat, lon = point.y, point.x
+        return float(self.get_density_weights(np.array([point.y]), np.array([point.x]), boro_code)[0])
+
+    def get_density_weights(self, lats, lons, boro_code):
+        """Vectorized get_density_weight over arrays of latitudes and longitudes"""
         borough_data = self.borough_codes[boro_code]
         base_weight = borough_data['density'] / self.max_density
         
-        # Calculate distance to nearest center
-        min_distance = float('inf')
-        for center_lat, center_lon in borough_data['centers']:
-            dist = np.sqrt((lat - center_lat)**2 + (lon - center_lon)**2)
-            min_distance = min(min_distance, dist)
+        # Distance (in degrees) to the nearest center
+        centers = np.asarray(borough_data['centers'])
+        min_distance = np.sqrt((lats[:, None] - centers[:, 0]) ** 2
+                               + (lons[:, None] - centers[:, 1]) ** 2).min(axis=1)
         
         # Adjust weight based on distance
         distance_factor = np.exp(-min_distance * 100)  # Exponential decay
         return base_weight * (1 + distance_factor)
 
-    def calculate_points_per_borough(self, total_points):
-        """Calculate points per borough based on population"""
+    def population_peak(self, geometry):
+        """Largest population grid density over a borough's bounding box, 0 without a grid"""
+        if self.population is None:
+            return 0.0
+        return self.population.max_within(geometry.bounds)
+
+    def calculate_points_per_borough(self, total_points, boroughs=None):
+        """
+        Calculate points per borough based on population
+        
+        Parameters:
+        - total_points: number of points to distribute
+        - boroughs: optional borough codes to restrict the distribution to
+        """
+        codes = [code for code in self.borough_codes if boroughs is None or code in boroughs]
+        population = sum(self.borough_codes[code]["population"] for code in codes)
         points = {}
-        for code, data in self.borough_codes.items():
-            points[code] = int((data["population"] / self.total_population) * total_points)
+        for code in codes:
+            points[code] = int((self.borough_codes[code]["population"] / population) * total_points)
         return points
 
-    def generate_points_in_borough(self, geometry, boro_code, num_points):
+    def generate_points_in_borough(self, geometry, boro_code, num_points, rng=None, batch_size=None):
+        """
+        Sample demand points inside a borough by batched rejection sampling.
+        
+        Candidates are drawn in blocks over the bounding box, tested for
+        containment with shapely's vectorized contains_xy against the prepared
+        polygon, and thinned by the density weight: the population grid
+        density relative to its peak over the borough when a grid covers
+        the borough, the borough density model otherwise. Batches continue
+        until num_points points are accepted.
+        
+        Parameters:
+        - geometry: borough Polygon or MultiPolygon
+        - boro_code: borough code used for the density weights
+        - num_points: number of points to generate
+        - rng: numpy Generator, defaults to the processor's generator
+        - batch_size: candidates per batch, sized from the acceptance rate when None
+        
+        Returns:
+        - (num_points, 2) array of (lat, lon)
+        """
+        rng = self.rng if rng is None else rng
         borough_polygon = self.create_borough_polygon(geometry)
+        shapely.prepare(borough_polygon)
         minx, miny, maxx, maxy = borough_polygon.bounds
+        peak = self.population_peak(borough_polygon)
         
-        points = []
-        attempts = 0
-        max_attempts = num_points * 10
-        
-        while len(points) < num_points and attempts < max_attempts:
-            lon = np.random.uniform(minx, maxx)
-            lat = np.random.uniform(miny, maxy)
-            point = Point(lon, lat)
+        lats, lons = [], []
+        accepted = 0
+        drawn = 0
+        while accepted < num_points:
+            if drawn >= MAX_DRAWS_PER_POINT * num_points:
+                raise ValueError(f"Could only sample {accepted} of {num_points} points "
+                                 f"for borough {boro_code}")
+            remaining = num_points - accepted
+            if batch_size is not None:
+                size = batch_size
+            elif accepted == 0:
+                size = max(1024, 4 * remaining)
+            else:
+                # Aim slightly past the remainder at the observed acceptance rate
+                size = int(1.2 * remaining * drawn / accepted) + 64
             
-            if borough_polygon.contains(point):
-                density_weight = self.get_density_weight(point, boro_code)
-                if np.random.random() < density_weight:
-                    points.append((lat, lon))
+            lon = rng.uniform(minx, maxx, size)
+            lat = rng.uniform(miny, maxy, size)
+            drawn += size
             
-            attempts += 1
+            inside = shapely.contains_xy(borough_polygon, lon, lat)
+            lon, lat = lon[inside], lat[inside]
+            if peak > 0:
+                acceptance = self.population.lookup(lat, lon) / peak
+            else:
+                acceptance = self.get_density_weights(lat, lon, boro_code)
+            keep = rng.random(len(lat)) < acceptance
+            lats.append(lat[keep])
+            lons.append(lon[keep])
+            accepted += int(keep.sum())
         
-        return points
+        if not lats:
+            return np.empty((0, 2))
+        return np.column_stack([np.concatenate(lats)[:num_points],
+                                np.concatenate(lons)[:num_points]])
 
-    def process_all_boroughs(self, geojson_data, total_points=1000):
-        """Process all boroughs with population-based point distribution"""
-        points_per_borough = self.calculate_points_per_borough(total_points)
-        borough_datasets = {}
+    def _make_dataset(self, boro_code, geometry, points):
+        """Borough dataset entry as consumed by PCenter and NYCVisualizer"""
+        dataset = {
+            'borough': self.borough_codes[boro_code]['name'],
+            'geometry': geometry,
+            'points': points,
+            'population': self.borough_codes[boro_code]['population'],
+            'density': self.borough_codes[boro_code]['density'],
+            'hubs': []
+        }
+        if self.population_peak(geometry) > 0:
+            dataset['weights'] = self.population.lookup(points[:, 0], points[:, 1])
+        elif self.population is not None:
+            # Boroughs the grid misses keep their density, in the grid's people per km²
+            dataset['weights'] = np.full(len(points), dataset['density'] / SQ_KM_PER_SQ_MILE)
+        return dataset
+
+    def iter_boroughs(self, geojson_data, total_points=1000, workers=None, boroughs=None):
+        """
+        Generate borough datasets, yielding each one as soon as it is ready
         
-        for boro_code, num_points in points_per_borough.items():
+        Every borough gets its own random stream spawned from the processor's
+        seed, so the points do not depend on the number of workers or on the
+        order in which boroughs finish.
+        
+        Parameters:
+        - geojson_data: GeoDataFrame of borough boundaries
+        - total_points: total number of demand points across boroughs
+        - workers: number of processes, None or 1 to sample in this process
+        - boroughs: optional borough codes to sample, all boroughs by default
+        
+        Yields:
+        - (boro_code, dataset) tuples in completion order
+        """
+        points_per_borough = self.calculate_points_per_borough(total_points, boroughs)
+        seeds = self.seed_sequence.spawn(len(points_per_borough))
+        tasks = []
+        for (boro_code, num_points), seed in zip(points_per_borough.items(), seeds):
             borough_data = geojson_data[geojson_data['boro_code'] == boro_code]
             if not borough_data.empty:
+                tasks.append((boro_code, borough_data.iloc[0].geometry, num_points, seed,
+                               self.population))
+        
+        if workers is None or workers <= 1:
+            for boro_code, geometry, num_points, seed, _ in tasks:
                 try:
-                    geometry = borough_data.iloc[0].geometry
-                    points = self.generate_points_in_borough(geometry, boro_code, num_points)
-                    
-                    borough_datasets[boro_code] = {
-                        'borough': self.borough_codes[boro_code]['name'],
-                        'geometry': geometry,
-                        'points': points,
-                        'population': self.borough_codes[boro_code]['population'],
-                        'density': self.borough_codes[boro_code]['density'],
-                        'hubs': []
-                    }
-                    
-                    print(f"Generated {len(points)} points for {self.borough_codes[boro_code]['name']}")
-                    print(f"Population: {self.borough_codes[boro_code]['population']:,}")
-                    print(f"Density: {self.borough_codes[boro_code]['density']:,}/sq mile\n")
-                    
+                    points = self.generate_points_in_borough(
+                        geometry, boro_code, num_points, rng=np.random.default_rng(seed))
                 except Exception as e:
-                    print(f"Error processing borough {boro_code}: {e}")
+                    TELEMETRY.event('borough_failed', logging.ERROR,
+                                    message=f"Error processing borough {boro_code}: {e}",
+                                    boro_code=boro_code, error=str(e))
+                    continue
+                yield boro_code, self._make_dataset(boro_code, geometry, points)
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_sample_borough, task): task for task in tasks}
+            for future in as_completed(futures):
+                boro_code, geometry = futures[future][:2]
+                try:
+                    points = future.result()
+                except Exception as e:
+                    TELEMETRY.event('borough_failed', logging.ERROR,
+                                    message=f"Error processing borough {boro_code}: {e}",
+                                    boro_code=boro_code, error=str(e))
+                    continue
+                yield boro_code, self._make_dataset(boro_code, geometry, points)
+
+    @timed('sampling')
+    def process_all_boroughs(self, geojson_data, total_points=1000, workers=None, boroughs=None):
+        """
+        Process all boroughs with population-based point distribution
         
-        return borough_datasets
\ No newline at end of file
+        Parameters:
+        - geojson_data: GeoDataFrame of borough boundaries
+        - total_points: total number of demand points across boroughs
+        - workers: number of processes sampling boroughs in parallel
+        - boroughs: optional borough codes to sample, all boroughs by default
+        
+        Returns:
+        - DemandSet of all points, grouped in borough code order; it maps each
+          borough code to a view with the borough's points, weights (the
+          population grid density, or the borough density; per km² when a
+          grid is set) and attributes
+        """
+        borough_datasets = {}
+        
+        for boro_code, dataset in self.iter_boroughs(geojson_data, total_points, workers,
+                                                     boroughs):
+            borough_datasets[boro_code] = dataset
+            TELEMETRY.count('points_sampled', len(dataset['points']))
+            TELEMETRY.event(
+                'borough_sampled',
+                message=(f"Generated {len(dataset['points'])} points for {dataset['borough']}\n"
+                         f"Population: {dataset['population']:,}\n"
+                         f"Density: {dataset['density']:,}/sq mile\n"),
+                boro_code=boro_code, borough=dataset['borough'],
+                points=len(dataset['points']), population=dataset['population'],
+                density=dataset['density'])
+            TELEMETRY.progress('sampling', len(borough_datasets),
+                               len(boroughs or self.borough_codes))
+        
+        # Keep a stable borough order regardless of completion order
+        return DemandSet.from_borough_datasets(
+            {code: borough_datasets[code] for code in self.borough_codes if code in borough_datasets})
+
+
+def _sample_borough(task):
+    """Process-pool entry point sampling a single borough"""
+    boro_code, geometry, num_points, seed, population = task
+    return NYCDataProcessor(population=population).generate_points_in_borough(
+        geometry, boro_code, num_points, rng=np.random.default_rng(seed))
@@ -0,0 +1,223 @@
+# src/demand.py
+# pandas and pyarrow are imported by the I/O methods that need them, so the
+# solver can use DemandSet without loading either
+import json
+from collections.abc import Mapping
+
+import numpy as np
+
+# Columns of the Arrow/Parquet representation
+DEMAND_COLUMNS = ('lat', 'lon', 'weight', 'borough')
+
+# Borough attributes kept alongside the points (geometry is not serialized)
+BOROUGH_FIELDS = ('borough', 'population', 'density')
+
+
+def has_pyarrow():
+    """True when pyarrow is installed (needed for Parquet and Arrow I/O)"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class BoroughView(Mapping):
+    def __init__(self, demand, code, start, stop):
+        """
+        Read-only view of one borough of a DemandSet, laid out like the
+        borough dataset dictionaries: 'points' and 'weights' are slices of
+        the parent arrays (no copies), the other keys come from the borough
+        attributes ('borough', 'population', 'density', 'geometry').
+        """
+        self._demand = demand
+        self.code = code
+        self.start = start
+        self.stop = stop
+
+    def __getitem__(self, key):
+        if key == 'points':
+            return self._demand.coords[self.start:self.stop]
+        if key == 'weights':
+            return self._demand.weights[self.start:self.stop]
+        info = self._demand.borough_info.get(self.code, {})
+        if key in info:
+            return info[key]
+        raise KeyError(key)
+
+    def _keys(self):
+        info = self._demand.borough_info.get(self.code, {})
+        return ['points', 'weights'] + [key for key in info if key not in ('points', 'weights')]
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+
+class DemandSet(Mapping):
+    def __init__(self, coords, weights=None, boroughs=None, borough_info=None):
+        """
+        Columnar container of demand points: float64 latitude and longitude,
+        float32 weight and an int8 borough code, 21 bytes per point.
+
+        Rows are kept grouped by borough, so each borough is a contiguous
+        slice. The set is a read-only mapping from borough code ('1'..'5') to
+        a BoroughView, which lets it stand in for the borough dataset
+        dictionaries of NYCDataProcessor; len() is therefore the number of
+        boroughs and num_points the number of points. PCenter, the
+        aggregator and the visualizer take it directly.
+
+        Parameters:
+        - coords: (N, 2) array of (lat, lon)
+        - weights: (N,) demand weights, 1 per point by default
+        - boroughs: (N,) integer borough codes, 0 for all points by default
+        - borough_info: optional dictionary code -> borough attributes
+          ('borough' name, 'population', 'density', 'geometry')
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        num_points = len(coords)
+        weights = (np.ones(num_points, dtype=np.float32) if weights is None
+                   else np.asarray(weights, dtype=np.float32).reshape(-1))
+        boroughs = (np.zeros(num_points, dtype=np.int8) if boroughs is None
+                    else np.asarray(boroughs, dtype=np.int8).reshape(-1))
+        if len(weights) != num_points or len(boroughs) != num_points:
+            raise ValueError(f"Expected {num_points} weights and borough codes, "
+                             f"got {len(weights)} and {len(boroughs)}")
+
+        # Group rows by borough (stable, a no-op when already grouped)
+        if num_points and np.any(boroughs[1:] < boroughs[:-1]):
+            order = np.argsort(boroughs, kind='stable')
+            coords, weights, boroughs = coords[order], weights[order], boroughs[order]
+        # Latitudes and longitudes are each contiguous; coords is a (N, 2) view of both
+        self._latlon = np.ascontiguousarray(coords.T)
+        self.weights = np.ascontiguousarray(weights)
+        self.boroughs = np.ascontiguousarray(boroughs)
+        self.borough_info = {str(code): dict(info) for code, info in (borough_info or {}).items()}
+
+        codes, starts = np.unique(self.boroughs, return_index=True)
+        stops = np.append(starts[1:], num_points)
+        self._slices = {str(int(code)): (int(start), int(stop))
+                        for code, start, stop in zip(codes, starts, stops)}
+
+    @classmethod
+    def from_borough_datasets(cls, borough_datasets):
+        """
+        Build a DemandSet from borough dataset dictionaries
+
+        Parameters:
+        - borough_datasets: dictionary code -> dataset with 'points' and
+          either per-point 'weights' or a borough 'density'
+        """
+        coords, weights, boroughs, info = [], [], [], {}
+        for code, data in borough_datasets.items():
+            points = np.asarray(data['points'], dtype=np.float64).reshape(-1, 2)
+            coords.append(points)
+            if 'weights' in data:
+                weights.append(np.asarray(data['weights'], dtype=np.float32))
+            else:
+                weights.append(np.full(len(points), data['density'], dtype=np.float32))
+            boroughs.append(np.full(len(points), int(code), dtype=np.int8))
+            info[str(code)] = {key: value for key, value in data.items()
+                               if key not in ('points', 'weights', 'hubs', 'counts')}
+        if not coords:
+            return cls(np.empty((0, 2)))
+        return cls(np.concatenate(coords), np.concatenate(weights), np.concatenate(boroughs), info)
+
+    @property
+    def coords(self):
+        """(N, 2) view of (lat, lon)"""
+        return self._latlon.T
+
+    @property
+    def lat(self):
+        return self._latlon[0]
+
+    @property
+    def lon(self):
+        return self._latlon[1]
+
+    @property
+    def num_points(self):
+        return self._latlon.shape[1]
+
+    @property
+    def nbytes(self):
+        """Bytes held by the point columns"""
+        return self._latlon.nbytes + self.weights.nbytes + self.boroughs.nbytes
+
+    def __getitem__(self, code):
+        start, stop = self._slices[str(code)]
+        return BoroughView(self, str(code), start, stop)
+
+    def __iter__(self):
+        return iter(self._slices)
+
+    def __len__(self):
+        return len(self._slices)
+
+    def subset(self, codes):
+        """DemandSet of the given boroughs (a copy, since they need not be adjacent)"""
+        wanted = {str(code) for code in codes}
+        mask = np.isin(self.boroughs, [int(code) for code in wanted])
+        info = {code: value for code, value in self.borough_info.items() if code in wanted}
+        return DemandSet(self.coords[mask], self.weights[mask], self.boroughs[mask], info)
+
+    def _schema_metadata(self):
+        info = {code: {key: value for key, value in fields.items() if key in BOROUGH_FIELDS}
+                for code, fields in self.borough_info.items()}
+        return {b'drone_delivery.boroughs': json.dumps(info).encode()}
+
+    def to_arrow(self):
+        """pyarrow Table with the DEMAND_COLUMNS and the borough attributes as metadata"""
+        import pyarrow as pa
+
+        table = pa.table({'lat': self.lat, 'lon': self.lon, 'weight': self.weights,
+                          'borough': self.boroughs})
+        return table.replace_schema_metadata(self._schema_metadata())
+
+    @classmethod
+    def from_arrow(cls, table, borough_info=None):
+        """
+        DemandSet from a pyarrow Table with the DEMAND_COLUMNS
+
+        Parameters:
+        - table: pyarrow Table
+        - borough_info: borough attributes, by default those stored in the metadata
+        """
+        columns = {name: table.column(name).to_numpy() for name in DEMAND_COLUMNS}
+        if borough_info is None:
+            metadata = (table.schema.metadata or {}).get(b'drone_delivery.boroughs')
+            borough_info = json.loads(metadata) if metadata else {}
+        return cls(np.column_stack([columns['lat'], columns['lon']]), columns['weight'],
+                   columns['borough'], borough_info)
+
+    def write_parquet(self, path):
+        """Write all points in one Parquet file"""
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path)
+
+    @classmethod
+    def read_parquet(cls, path, borough_info=None):
+        import pyarrow.parquet as pq
+
+        return cls.from_arrow(pq.read_table(path, columns=list(DEMAND_COLUMNS)), borough_info)
+
+    def to_frame(self):
+        """pandas DataFrame with latitude, longitude, weight, borough code and borough name"""
+        import pandas as pd
+
+        names = {int(code): info.get('borough', '') for code, info in self.borough_info.items()}
+        return pd.DataFrame({
+            'latitude': self.lat,
+            'longitude': self.lon,
+            'weight': self.weights,
+            'boro_code': self.boroughs,
+            'borough': pd.Series(self.boroughs).map(names).astype('category'),
+        })
+
+    def write_csv(self, path):
+        """Write all points in one CSV file (when pyarrow is not available)"""
+        self.to_frame().to_csv(path, index=False)
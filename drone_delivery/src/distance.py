@@ -0,0 +1,320 @@
+# src/distance.py
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.instrument import TELEMETRY
+
+# Mean earth radius (IUGG) used by the spherical engine, in km
+EARTH_RADIUS_KM = 6371.0088
+
+# WGS-84 ellipsoid used by the ellipsoidal engine, in km
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# Kilometres per degree of latitude, and of longitude at the equator
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON = 111.320
+
+# Number of point pairs evaluated per block when building a matrix
+BLOCK_PAIRS = 2 ** 19
+
+# Edge length of the square tiles handed to worker processes
+TILE_SIZE = 512
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance on a sphere, broadcast over NumPy arrays
+
+    Parameters:
+    - lat1, lon1: coordinates of the first point(s) in degrees
+    - lat2, lon2: coordinates of the second point(s) in degrees
+
+    Returns:
+    - Distance in km with the broadcast shape of the inputs
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64))
+                              for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    TELEMETRY.count('distance_evaluations', distance.size)
+    return distance
+
+
+def vincenty(lat1, lon1, lat2, lon2, max_iter=200, tol=1e-12):
+    """
+    Ellipsoidal (WGS-84) distance using Vincenty's inverse formula,
+    broadcast over NumPy arrays.
+
+    Vincenty agrees with geopy's Karney geodesic to well below a millimetre.
+    The few nearly antipodal pairs where the iteration does not converge are
+    handed to geopy's geodesic, so every result is Karney-accurate.
+
+    Parameters:
+    - lat1, lon1: coordinates of the first point(s) in degrees
+    - lat2, lon2: coordinates of the second point(s) in degrees
+    - max_iter: maximum number of lambda iterations
+    - tol: convergence tolerance on lambda in radians
+
+    Returns:
+    - Distance in km with the broadcast shape of the inputs
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in (lat1, lon1, lat2, lon2)))
+    # Work on at least 1-d arrays so the fallback below can index scalar pairs
+    shape = lat1.shape
+    lat1, lon1, lat2, lon2 = (np.atleast_1d(v) for v in (lat1, lon1, lat2, lon2))
+    f = WGS84_F
+
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    L = np.radians(lon2 - lon1)
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(lam.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt((cosU2 * sin_lam) ** 2
+                                + (cosU1 * sinU2 - sinU1 * cosU2 * cos_lam) ** 2)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0,
+                                 cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0,
+                                    cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (
+                    cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(lam - lam_prev) < tol
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (
+            cos_2sigma_m + B / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2)
+                * (-3 + 4 * cos_2sigma_m ** 2)))
+        distance = WGS84_B * A * (sigma - delta_sigma)
+
+    if not converged.all():
+        from geopy.distance import geodesic
+        for idx in zip(*np.nonzero(~converged)):
+            distance[idx] = geodesic((lat1[idx], lon1[idx]),
+                                     (lat2[idx], lon2[idx])).kilometers
+
+    TELEMETRY.count('distance_evaluations', distance.size)
+    return distance.reshape(shape)[()]
+
+
+# Distance engines selectable by name
+DISTANCE_ENGINES = {
+    'haversine': haversine,
+    'geodesic': vincenty,
+    'vincenty': vincenty,
+}
+
+
+def get_engine(method):
+    """Look up a distance engine by name"""
+    try:
+        return DISTANCE_ENGINES[method]
+    except KeyError:
+        raise ValueError(f"Unknown distance method '{method}'. "
+                         f"Choose one of: {', '.join(sorted(DISTANCE_ENGINES))}")
+
+
+def to_planar_km(coords, ref_lat):
+    """Equirectangular (km) projection of (lat, lon) rows around ref_lat, accurate at city scale"""
+    scale = np.array([KM_PER_DEG_LAT, KM_PER_DEG_LON * np.cos(np.radians(ref_lat))])
+    return np.asarray(coords, dtype=np.float64).reshape(-1, 2) * scale
+
+
+def point_distance(point1, point2, method='geodesic'):
+    """Distance in km between two (lat, lon) points"""
+    engine = get_engine(method)
+    return float(engine(point1[0], point1[1], point2[0], point2[1]))
+
+
+def distance_matrix(points, method='geodesic', block_size=None, out=None, candidates=None):
+    """
+    Build the symmetric pairwise distance matrix for a set of points, or
+    the rectangular demand x candidate matrix when candidates are given.
+
+    For the symmetric matrix only the upper triangle is evaluated, one block
+    of rows at a time, and mirrored into the lower triangle so the
+    temporaries of the vectorized engine stay bounded regardless of the
+    number of points.
+
+    Parameters:
+    - points: sequence or (N, 2) array of (lat, lon) points in degrees
+    - method: name of the distance engine (see DISTANCE_ENGINES)
+    - block_size: rows per block, derived from BLOCK_PAIRS when None
+    - out: optional preallocated (N, N) or (N, M) array to fill
+    - candidates: optional (M, 2) array of candidate sites (the columns)
+
+    Returns:
+    - (N, N) or (N, M) array of distances in km
+    """
+    engine = get_engine(method)
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    num_points = len(coords)
+    lats, lons = coords[:, 0], coords[:, 1]
+
+    if candidates is not None:
+        sites = np.asarray(candidates, dtype=np.float64).reshape(-1, 2)
+        if out is None:
+            out = np.zeros((num_points, len(sites)))
+        if block_size is None:
+            block_size = max(1, BLOCK_PAIRS // max(len(sites), 1))
+        for start in range(0, num_points, block_size):
+            stop = min(start + block_size, num_points)
+            out[start:stop] = engine(lats[start:stop, None], lons[start:stop, None],
+                                     sites[None, :, 0], sites[None, :, 1])
+            TELEMETRY.progress('distance_matrix', stop, num_points)
+        return out
+
+    if out is None:
+        out = np.zeros((num_points, num_points))
+    if block_size is None:
+        block_size = max(1, BLOCK_PAIRS // max(num_points, 1))
+
+    for start in range(0, num_points, block_size):
+        stop = min(start + block_size, num_points)
+        block = engine(lats[start:stop, None], lons[start:stop, None],
+                       lats[None, start:], lons[None, start:])
+        out[start:stop, start:] = block
+        out[start:, start:stop] = block.T
+        TELEMETRY.progress('distance_matrix', stop, num_points)
+
+    return out
+
+
+# Per-process state of the parallel build, set by _init_tile_worker
+_tile_state = {}
+
+
+def _init_tile_worker(coords, candidates, method, shm_name, memmap_path, shape, dtype):
+    """Attach a worker process to the shared output matrix"""
+    if memmap_path is not None:
+        out = np.load(memmap_path, mmap_mode='r+')
+        shm = None
+    else:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        out = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _tile_state.update(coords=coords, candidates=candidates, engine=get_engine(method),
+                       out=out, shm=shm)
+
+
+def _compute_tile(tile):
+    """Fill one tile of the output, and its mirror image for a symmetric matrix"""
+    (row_start, row_stop), (col_start, col_stop) = tile
+    coords, engine, out = _tile_state['coords'], _tile_state['engine'], _tile_state['out']
+    sites = _tile_state['candidates']
+    symmetric = sites is None
+    if symmetric:
+        sites = coords
+    block = engine(coords[row_start:row_stop, 0, None], coords[row_start:row_stop, 1, None],
+                   sites[None, col_start:col_stop, 0], sites[None, col_start:col_stop, 1])
+    out[row_start:row_stop, col_start:col_stop] = block
+    if symmetric:
+        out[col_start:col_stop, row_start:row_stop] = block.T
+    return (row_stop - row_start) * (col_stop - col_start)
+
+
+def upper_triangle_tiles(num_points, tile_size=TILE_SIZE):
+    """Square tiles (row range, column range) covering the upper triangle"""
+    bounds = [(start, min(start + tile_size, num_points))
+              for start in range(0, num_points, tile_size)]
+    return [(bounds[i], bounds[j])
+            for i in range(len(bounds)) for j in range(i, len(bounds))]
+
+
+def rectangular_tiles(num_rows, num_cols, tile_size=TILE_SIZE):
+    """Tiles (row range, column range) covering a full num_rows x num_cols matrix"""
+    row_bounds = [(start, min(start + tile_size, num_rows))
+                  for start in range(0, num_rows, tile_size)]
+    col_bounds = [(start, min(start + tile_size, num_cols))
+                  for start in range(0, num_cols, tile_size)]
+    return [(rows, cols) for rows in row_bounds for cols in col_bounds]
+
+
+def parallel_distance_matrix(points, method='geodesic', workers=None, tile_size=TILE_SIZE,
+                             out=None, dtype=np.float64, progress=None, candidates=None):
+    """
+    Build the symmetric distance matrix with a pool of worker processes.
+
+    The upper triangle is split into square tiles; each worker evaluates a
+    tile and writes it, together with its mirror image, straight into a
+    shared output buffer so no distances are pickled back to the parent.
+    With candidates the full demand x candidate matrix is tiled instead.
+    When out is a .npy memory map (e.g. from DistanceCache) the workers
+    open the same file, otherwise they share a multiprocessing
+    SharedMemory block that is copied into the result at the end.
+
+    Parameters:
+    - points: sequence or (N, 2) array of (lat, lon) points in degrees
+    - method: name of the distance engine (see DISTANCE_ENGINES)
+    - workers: number of worker processes, defaults to the CPU count
+    - tile_size: edge length of the tiles handed to workers
+    - out: optional preallocated (N, N) or (N, M) array or .npy memmap to fill
+    - dtype: dtype of the matrix when out is not given
+    - progress: optional callback progress(done_tiles, total_tiles)
+    - candidates: optional (M, 2) array of candidate sites (the columns)
+
+    Returns:
+    - (N, N) or (N, M) array of distances in km
+    """
+    get_engine(method)
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    num_points = len(coords)
+    workers = workers or multiprocessing.cpu_count()
+    if candidates is None:
+        num_cols = num_points
+        tiles = upper_triangle_tiles(num_points, tile_size)
+    else:
+        candidates = np.asarray(candidates, dtype=np.float64).reshape(-1, 2)
+        num_cols = len(candidates)
+        tiles = rectangular_tiles(num_points, num_cols, tile_size)
+
+    if out is None:
+        out = np.empty((num_points, num_cols), dtype=dtype)
+    memmap_path = getattr(out, 'filename', None)
+    shm = None
+    if memmap_path is None:
+        shm = shared_memory.SharedMemory(create=True, size=max(out.nbytes, 1))
+    else:
+        out.flush()
+
+    try:
+        init_args = (coords, candidates, method, shm.name if shm else None, memmap_path,
+                     out.shape, out.dtype)
+        with multiprocessing.Pool(workers, initializer=_init_tile_worker,
+                                  initargs=init_args) as pool:
+            for done, pairs in enumerate(pool.imap_unordered(_compute_tile, tiles), 1):
+                # Workers count in their own process; account for their pairs here
+                TELEMETRY.count('distance_evaluations', pairs)
+                TELEMETRY.progress('distance_matrix', done, len(tiles))
+                if progress is not None:
+                    progress(done, len(tiles))
+        if shm is not None:
+            out[...] = np.ndarray(out.shape, dtype=out.dtype, buffer=shm.buf)
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    return out
@@ -0,0 +1,347 @@
+# src/exact.py
+import logging
+import time
+
+import numpy as np
+
+from src.instrument import TELEMETRY
+
+# Default branch-and-bound node budget per feasibility probe
+DEFAULT_NODE_LIMIT = 20000
+
+
+class _NodeLimitReached(Exception):
+    pass
+
+
+def _iter_bits(bits):
+    """Yield the positions of the set bits of a Python int, lowest first"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def _to_bitsets(mask):
+    """Pack each row of a boolean matrix into a Python int bitset"""
+    packed = np.packbits(mask, axis=1, bitorder='little')
+    return [int.from_bytes(row.tobytes(), 'little') for row in packed]
+
+
+class ExactPCenter:
+    def __init__(self, distance_matrix, node_limit=DEFAULT_NODE_LIMIT):
+        """
+        Exact p-center solver over a demand x candidate distance matrix.
+
+        The optimal radius is always one of the matrix entries, so the
+        solver bisects over the sorted unique distances. Each probe asks a
+        set-cover question: can k candidates cover every demand point within
+        the radius? Coverage sets are Python int bitsets, reduced with
+        essential-set and dominance rules, bounded with a greedy cover and a
+        disjoint-point packing, and decided with branch-and-bound.
+
+        Parameters:
+        - distance_matrix: (N, M) array, rows are demand points, columns candidate sites
+        - node_limit: maximum branch-and-bound nodes per probe; probes that hit
+          it are reported as undecided and the answer becomes a bound
+        """
+        self.distance_matrix = distance_matrix
+        self.node_limit = node_limit
+        self._radii = None
+
+    def candidate_radii(self):
+        """Sorted unique distances, the only radii an optimal solution can take"""
+        if self._radii is None:
+            self._radii = np.unique(self.distance_matrix)
+        return self._radii
+
+    def _solution_radius(self, centers):
+        """Largest distance from any demand point to its nearest center"""
+        return float(self.distance_matrix[:, centers].min(axis=1).max())
+
+    def cover(self, radius, num_centers, exact=True):
+        """
+        Decide whether num_centers candidates can cover every point within radius
+
+        Parameters:
+        - radius: coverage radius in km
+        - num_centers: number of centers allowed
+        - exact: run branch-and-bound when the bounds do not settle the probe
+
+        Returns:
+        - dictionary with 'feasible' (True, False or None when undecided),
+          'centers' (index array when feasible), 'lower_bound' on the number
+          of centers needed, 'nodes' explored and wall-clock 'seconds'
+        """
+        start = time.perf_counter()
+        result = {'radius': float(radius), 'num_centers': num_centers,
+                  'feasible': None, 'centers': None, 'lower_bound': 0, 'nodes': 0}
+
+        problem = self._build(radius)
+        if problem is None:
+            result['feasible'] = False
+            result['lower_bound'] = np.inf
+        else:
+            forced, remaining = problem['forced'], num_centers - len(problem['forced'])
+            greedy = self._greedy(problem)
+            lower = len(forced) + self._packing_bound(problem)
+            result['lower_bound'] = lower
+            if len(forced) + len(greedy) <= num_centers:
+                result['feasible'] = True
+                result['centers'] = np.array(forced + greedy, dtype=np.intp)
+            elif lower > num_centers:
+                result['feasible'] = False
+            elif exact:
+                self._nodes = 0
+                try:
+                    chosen = self._branch(problem, problem['uncovered'], remaining,
+                                          problem['alive'])
+                except _NodeLimitReached:
+                    chosen = None
+                else:
+                    result['feasible'] = chosen is not None
+                    if chosen is not None:
+                        result['centers'] = np.array(forced + chosen, dtype=np.intp)
+                    else:
+                        result['lower_bound'] = num_centers + 1
+                result['nodes'] = self._nodes
+
+        result['seconds'] = time.perf_counter() - start
+        TELEMETRY.count('exact_probes')
+        TELEMETRY.count('branch_nodes', result['nodes'])
+        TELEMETRY.event('exact_probe', logging.DEBUG, radius=result['radius'],
+                        num_centers=num_centers, feasible=result['feasible'],
+                        nodes=result['nodes'], seconds=result['seconds'])
+        return result
+
+    def min_radius(self, num_centers, exact=True):
+        """
+        Smallest radius at which num_centers centers cover every point
+
+        Parameters:
+        - num_centers: number of centers to place
+        - exact: use branch-and-bound for probes the bounds cannot settle
+
+        Returns:
+        - dictionary with 'radius' (of the returned centers), 'lower_bound'
+          (proven lower bound on the optimal radius), 'optimal', 'center_indices'
+          and the list of per-probe 'probes'
+        """
+        radii = self.candidate_radii()
+        num_candidates = self.distance_matrix.shape[1]
+        centers = np.arange(min(num_centers, num_candidates), dtype=np.intp)
+        low, high = 0, int(np.searchsorted(radii, self._solution_radius(centers)))
+        proven_low = 0
+        probes = []
+
+        while low < high:
+            mid = (low + high) // 2
+            probe = self.cover(radii[mid], num_centers, exact=exact)
+            probes.append(probe)
+            if probe['feasible']:
+                centers = probe['centers']
+                high = int(np.searchsorted(radii, self._solution_radius(centers)))
+            else:
+                if probe['feasible'] is False:
+                    proven_low = mid + 1
+                low = mid + 1
+
+        return {
+            'radius': float(radii[high]),
+            'lower_bound': float(radii[proven_low]),
+            'optimal': proven_low == high,
+            'center_indices': centers,
+            'probes': probes,
+        }
+
+    def min_centers(self, radius, exact=True):
+        """
+        Fewest centers that cover every point within radius
+
+        Parameters:
+        - radius: coverage radius in km
+        - exact: use branch-and-bound for probes the bounds cannot settle
+
+        Returns:
+        - dictionary with 'num_centers' (of the returned centers), 'lower_bound',
+          'optimal', 'center_indices', the list of per-probe 'probes' and the
+          'uncoverable_indices' of the points no candidate reaches;
+          'num_centers' is None when there are any
+        """
+        first = self.cover(radius, self.distance_matrix.shape[1], exact=False)
+        probes = [first]
+        if not first['feasible']:
+            uncoverable = np.flatnonzero(self.distance_matrix.min(axis=1) > radius)
+            return {'num_centers': None, 'lower_bound': None, 'optimal': True,
+                    'center_indices': None, 'probes': probes,
+                    'uncoverable_indices': uncoverable}
+
+        centers = first['centers']
+        low, high = first['lower_bound'], len(centers)
+        proven_low = low
+        while low < high:
+            mid = (low + high) // 2
+            probe = self.cover(radius, mid, exact=exact)
+            probes.append(probe)
+            if probe['feasible']:
+                centers = probe['centers']
+                high = len(centers)
+            else:
+                if probe['feasible'] is False:
+                    proven_low = mid + 1
+                low = mid + 1
+
+        return {
+            'num_centers': high,
+            'lower_bound': proven_low,
+            'optimal': proven_low == high,
+            'center_indices': centers,
+            'probes': probes,
+            'uncoverable_indices': np.empty(0, dtype=np.intp),
+        }
+
+    def _build(self, radius):
+        """Coverage bitsets at radius, reduced; None if a point cannot be covered"""
+        mask = self.distance_matrix <= radius
+        num_rows, num_cols = mask.shape
+        problem = {
+            'rows': _to_bitsets(mask),                 # point -> candidates covering it
+            'cols': _to_bitsets(np.ascontiguousarray(mask.T)),  # candidate -> points covered
+            'uncovered': (1 << num_rows) - 1,
+            'alive': (1 << num_cols) - 1,
+            'forced': [],
+        }
+        if not self._reduce(problem):
+            return None
+        return problem
+
+    def _reduce(self, problem):
+        """
+        Apply the classic set-cover reduction rules until nothing changes:
+        - a point covered by a single candidate forces that candidate
+        - a candidate whose coverage is contained in another's is dropped
+        - a point whose covering candidates include all of another point's
+          is implied by that point and dropped
+
+        Returns False if some point has no covering candidate.
+        """
+        rows, cols = problem['rows'], problem['cols']
+        changed = True
+        while changed:
+            changed = False
+            uncovered, alive = problem['uncovered'], problem['alive']
+
+            for i in _iter_bits(uncovered):
+                if not (uncovered >> i) & 1:
+                    continue
+                covering = rows[i] & alive
+                if covering == 0:
+                    return False
+                if covering & (covering - 1) == 0:
+                    j = covering.bit_length() - 1
+                    problem['forced'].append(j)
+                    uncovered &= ~cols[j]
+                    alive &= ~(1 << j)
+                    changed = True
+            if changed:
+                problem['uncovered'], problem['alive'] = uncovered, alive
+                continue
+
+            for j in _iter_bits(alive):
+                covered = cols[j] & uncovered
+                if covered == 0:
+                    alive &= ~(1 << j)
+                    changed = True
+                    continue
+                first = (covered & -covered).bit_length() - 1
+                for other in _iter_bits(rows[first] & alive):
+                    if other == j:
+                        continue
+                    other_covered = cols[other] & uncovered
+                    if covered & ~other_covered == 0 and (covered != other_covered or other < j):
+                        alive &= ~(1 << j)
+                        changed = True
+                        break
+
+            for i in _iter_bits(uncovered):
+                if not (uncovered >> i) & 1:
+                    continue
+                covering = rows[i] & alive
+                if covering == 0:
+                    return False
+                first = (covering & -covering).bit_length() - 1
+                for other in _iter_bits(cols[first] & uncovered):
+                    if other == i:
+                        continue
+                    other_covering = rows[other] & alive
+                    if covering & ~other_covering == 0 and (covering != other_covering or i < other):
+                        uncovered &= ~(1 << other)
+                        changed = True
+
+            problem['uncovered'], problem['alive'] = uncovered, alive
+        return True
+
+    def _greedy(self, problem):
+        """Greedy set cover of the reduced problem"""
+        cols, uncovered, alive = problem['cols'], problem['uncovered'], problem['alive']
+        chosen = []
+        while uncovered:
+            best, best_gain = -1, 0
+            for j in _iter_bits(alive):
+                gain = (cols[j] & uncovered).bit_count()
+                if gain > best_gain:
+                    best, best_gain = j, gain
+            chosen.append(best)
+            uncovered &= ~cols[best]
+            alive &= ~(1 << best)
+        return chosen
+
+    def _packing_bound(self, problem):
+        """
+        Lower bound from points that share no covering candidate: each of
+        them needs its own center.
+        """
+        rows, uncovered, alive = problem['rows'], problem['uncovered'], problem['alive']
+        order = sorted(_iter_bits(uncovered), key=lambda i: (rows[i] & alive).bit_count())
+        used = 0
+        packed = 0
+        for i in order:
+            covering = rows[i] & alive
+            if covering & used == 0:
+                used |= covering
+                packed += 1
+        return packed
+
+    def _branch(self, problem, uncovered, remaining, alive):
+        """Branch on the candidates covering the hardest uncovered point"""
+        self._nodes += 1
+        if self._nodes > self.node_limit:
+            raise _NodeLimitReached()
+        if uncovered == 0:
+            return []
+        if remaining == 0:
+            return None
+
+        rows, cols = problem['rows'], problem['cols']
+        best_covering, best_degree = 0, None
+        for i in _iter_bits(uncovered):
+            covering = rows[i] & alive
+            degree = covering.bit_count()
+            if degree == 0:
+                return None
+            if best_degree is None or degree < best_degree:
+                best_covering, best_degree = covering, degree
+                if degree == 1:
+                    break
+
+        gains = {j: (cols[j] & uncovered).bit_count() for j in _iter_bits(alive)}
+        if max(gains.values()) * remaining < uncovered.bit_count():
+            return None
+
+        for j in sorted(_iter_bits(best_covering), key=lambda j: -gains[j]):
+            chosen = self._branch(problem, uncovered & ~cols[j], remaining - 1, alive)
+            if chosen is not None:
+                return [j] + chosen
+            # Any cover using j would have been found in this branch
+            alive &= ~(1 << j)
+        return None
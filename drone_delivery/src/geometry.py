@@ -0,0 +1,153 @@
+# src/geometry.py
+import hashlib
+import json
+import os
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from src.demand import has_pyarrow
+
+# Simplification tolerances in degrees (~10 m for sampling, ~100 m for maps)
+SAMPLING_TOLERANCE = 0.0001
+DISPLAY_TOLERANCE = 0.001
+
+# Bumped whenever the cached layout changes
+GEOMETRY_CACHE_VERSION = 1
+
+VARIANTS = ('full', 'sampling', 'display')
+
+
+def _file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BoroughGeometryStore:
+    def __init__(self, source_path, cache_dir, sampling_tolerance=SAMPLING_TOLERANCE,
+                 display_tolerance=DISPLAY_TOLERANCE):
+        """
+        Binary cache of the borough boundaries.
+
+        The GeoJSON is parsed once and written as GeoParquet (or WKB when
+        pyarrow is unavailable) in three variants: the full-resolution
+        boundaries, a lightly simplified copy for point sampling and a coarser
+        copy for map display. The cache is rebuilt when the source file's
+        content hash or the tolerances change; the hash is only recomputed
+        when the file's mtime or size moved.
+
+        Parameters:
+        - source_path: path of the borough GeoJSON
+        - cache_dir: directory for the cached variants
+        - sampling_tolerance: simplification tolerance (degrees) of the sampling variant
+        - display_tolerance: simplification tolerance (degrees) of the display variant
+        """
+        self.source_path = os.path.abspath(source_path)
+        self.cache_dir = cache_dir
+        self.tolerances = {'full': 0.0, 'sampling': sampling_tolerance,
+                           'display': display_tolerance}
+        self.format = 'parquet' if has_pyarrow() else 'wkb'
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.cache_dir, 'geometry_meta.json')
+
+    def _variant_path(self, variant):
+        extension = 'parquet' if self.format == 'parquet' else 'wkb.pkl'
+        return os.path.join(self.cache_dir, f'boroughs_{variant}.{extension}')
+
+    def _read_meta(self):
+        try:
+            with open(self._meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta):
+        tmp_path = f"{self._meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, self._meta_path)
+
+    def is_fresh(self):
+        """Check the cached variants against the source file, refreshing the stored mtime if only it changed"""
+        meta = self._read_meta()
+        stat = os.stat(self.source_path)
+        if (meta is None or meta.get('version') != GEOMETRY_CACHE_VERSION
+                or meta.get('source') != self.source_path
+                or meta.get('format') != self.format
+                or meta.get('tolerances') != self.tolerances
+                or not all(os.path.exists(self._variant_path(v)) for v in VARIANTS)):
+            return False
+        if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+            return True
+        if meta['sha256'] != _file_sha256(self.source_path):
+            return False
+        meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        self._write_meta(meta)
+        return True
+
+    def build(self):
+        """Parse the GeoJSON and write every variant to the cache"""
+        stat = os.stat(self.source_path)
+        sha256 = _file_sha256(self.source_path)
+        source = gpd.read_file(self.source_path)
+        for variant in VARIANTS:
+            frame = source.copy()
+            tolerance = self.tolerances[variant]
+            if tolerance > 0:
+                frame['geometry'] = frame.geometry.simplify(tolerance, preserve_topology=True)
+            self._write_variant(frame, variant)
+        self._write_meta({
+            'version': GEOMETRY_CACHE_VERSION,
+            'source': self.source_path,
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha256': sha256,
+            'format': self.format,
+            'tolerances': self.tolerances,
+            'crs': source.crs.to_string() if source.crs is not None else None,
+        })
+
+    def _write_variant(self, frame, variant):
+        path = self._variant_path(variant)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if self.format == 'parquet':
+            frame.to_parquet(tmp_path)
+        else:
+            table = pd.DataFrame(frame.drop(columns='geometry'))
+            table['wkb'] = shapely.to_wkb(frame.geometry.values)
+            table.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+
+    def load(self, variant='full'):
+        """
+        Load one variant, building the cache first if it is missing or stale
+
+        Parameters:
+        - variant: 'full', 'sampling' or 'display'
+
+        Returns:
+        - GeoDataFrame whose geometries are already shapely-prepared
+        """
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown geometry variant '{variant}'. "
+                             f"Choose one of: {', '.join(VARIANTS)}")
+        if not self.is_fresh():
+            self.build()
+
+        path = self._variant_path(variant)
+        if self.format == 'parquet':
+            frame = gpd.read_parquet(path)
+        else:
+            table = pd.read_pickle(path)
+            frame = gpd.GeoDataFrame(table.drop(columns='wkb'),
+                                     geometry=shapely.from_wkb(table['wkb'].values),
+                                     crs=self._read_meta()['crs'])
+        shapely.prepare(frame.geometry.values)
+        return frame
@@ -0,0 +1,210 @@
+# src/instrument.py
+import functools
+import json
+import logging
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# Root logger of the package; events are emitted on it or on children
+LOGGER_NAME = 'drone_delivery'
+
+# Default minimum interval in seconds between two progress callbacks
+PROGRESS_INTERVAL = 1.0
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class Telemetry:
+    def __init__(self):
+        """
+        Counters, structured events and throttled progress callbacks.
+
+        Counters (probes, distance evaluations, feasibility checks, ...) are
+        plain integer adds. Events go through the 'drone_delivery' logger with
+        the event name and its fields attached to the log record, so a
+        handler with JsonFormatter turns them into a machine-readable stream;
+        nothing is formatted unless the logger is enabled for the level.
+        Progress callbacks are rate limited so hot loops can report freely.
+        With enabled=False (quiet mode) counters, progress and events below
+        WARNING return immediately; warnings and errors are still logged.
+        """
+        self.enabled = True
+        self.counters = Counter()
+        self._callbacks = []
+
+    def count(self, name, amount=1):
+        """Add amount to counter name"""
+        if self.enabled:
+            self.counters[name] += amount
+
+    def event(self, name, level=logging.INFO, message=None, **fields):
+        """
+        Emit a structured event
+
+        Parameters:
+        - name: event name, e.g. 'borough_sampled'
+        - level: logging level
+        - message: human-readable text, defaults to the name and fields
+        - fields: event payload (JSON serializable values)
+        """
+        if (not self.enabled and level < logging.WARNING) or not logger.isEnabledFor(level):
+            return
+        if message is None:
+            message = ' '.join([name] + [f"{key}={value}" for key, value in fields.items()])
+        logger.log(level, message, extra={'event': name, 'fields': fields})
+
+    def add_progress_callback(self, callback, interval=PROGRESS_INTERVAL):
+        """
+        Register callback(stage, done, total, counters), called at most once per
+        interval seconds per stage, and always when a stage completes
+        """
+        self._callbacks.append({'callback': callback, 'interval': interval, 'last': {}})
+
+    def remove_progress_callback(self, callback):
+        self._callbacks = [entry for entry in self._callbacks if entry['callback'] is not callback]
+
+    def progress(self, stage, done, total=None):
+        """Report progress of a stage to the registered callbacks"""
+        if not self.enabled or not self._callbacks:
+            return
+        now = time.monotonic()
+        finished = total is not None and done >= total
+        for entry in self._callbacks:
+            last = entry['last'].get(stage)
+            if finished or last is None or now - last >= entry['interval']:
+                entry['last'][stage] = now
+                entry['callback'](stage, done, total, dict(self.counters))
+
+    def snapshot(self):
+        """Current counter values"""
+        return dict(self.counters)
+
+    def reset(self):
+        self.counters.clear()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per log record, with the event name and fields of telemetry events"""
+
+    def format(self, record):
+        payload = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'event': getattr(record, 'event', None),
+            'message': record.getMessage(),
+        }
+        payload.update(getattr(record, 'fields', {}))
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(quiet=False, json_path=None):
+    """
+    Console output for the command line, plus an optional JSON-lines event file
+
+    Parameters:
+    - quiet: only warnings and errors reach the console, and counters and
+      progress callbacks are switched off unless a JSON file is written
+    - json_path: write every event, debug events included, as a JSON line to this file
+    """
+    logger.setLevel(logging.DEBUG if json_path is not None else logging.INFO)
+    logger.handlers.clear()
+    logger.propagate = False
+    console = logging.StreamHandler()
+    console.setLevel(logging.WARNING if quiet else logging.INFO)
+    console.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(console)
+    if json_path is not None:
+        file_handler = logging.FileHandler(json_path, mode='w')
+        file_handler.setFormatter(JsonFormatter())
+        logger.addHandler(file_handler)
+    elif quiet:
+        logger.setLevel(logging.WARNING)
+    TELEMETRY.enabled = not quiet or json_path is not None
+
+
+# Process-wide telemetry used by the solver and data modules
+TELEMETRY = Telemetry()
+
+
+class StageTimer:
+    def __init__(self, track_memory=False):
+        """
+        Per-stage wall-clock timing, and optionally peak memory, of the pipeline.
+
+        NYCDataProcessor, PCenter and NYCVisualizer each own a timer (or share
+        one passed in) and wrap their main steps in stage(), so where the time
+        goes is available programmatically from records and summary().
+        Stages may nest; a stage's time and memory include its sub-stages.
+
+        Parameters:
+        - track_memory: also record the peak Python/NumPy allocation of every
+          stage with tracemalloc (slows allocation-heavy code down somewhat)
+        """
+        self.track_memory = track_memory
+        self.records = []
+        self._peaks = []
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one call of stage name"""
+        tracking = self.track_memory and tracemalloc.is_tracing()
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            tracking = True
+        if tracking:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                # Remember the enclosing stage's peak before resetting it
+                self._peaks[-1][1] = max(self._peaks[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._peaks.append([current, current])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = None
+            if tracking:
+                base, child_peak = self._peaks.pop()
+                peak = max(tracemalloc.get_traced_memory()[1], child_peak)
+                peak_bytes = peak - base
+                if self._peaks:
+                    self._peaks[-1][1] = max(self._peaks[-1][1], peak)
+            self.records.append({'stage': name, 'seconds': seconds, 'peak_bytes': peak_bytes})
+            TELEMETRY.event('stage_finished', logging.DEBUG, stage=name, seconds=seconds,
+                            peak_bytes=peak_bytes)
+
+    def summary(self):
+        """
+        Totals per stage, in first-seen order
+
+        Returns:
+        - dictionary stage -> {'seconds', 'calls', 'peak_mb'} where peak_mb is
+          the largest per-call peak (None without memory tracking)
+        """
+        totals = {}
+        for record in self.records:
+            entry = totals.setdefault(record['stage'], {'seconds': 0.0, 'calls': 0, 'peak_mb': None})
+            entry['seconds'] += record['seconds']
+            entry['calls'] += 1
+            if record['peak_bytes'] is not None:
+                peak_mb = record['peak_bytes'] / 1024 ** 2
+                entry['peak_mb'] = max(entry['peak_mb'] or 0.0, peak_mb)
+        return totals
+
+    def reset(self):
+        self.records = []
+
+
+def timed(stage_name):
+    """Method decorator timing every call as stage_name on the instance's timer"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.timer.stage(stage_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,247 @@
+# src/local_search.py
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.instrument import TELEMETRY
+
+# Default wall-clock budget of a local-search run in seconds
+DEFAULT_TIME_BUDGET = 10.0
+
+# Default number of random restarts (shakes) after the first local optimum
+DEFAULT_RESTARTS = 5
+
+# Memory for candidate distance columns kept between moves when the solver
+# has no distance matrix and columns are computed on the fly
+COLUMN_CACHE_BYTES = 256 * 1024 ** 2
+
+
+class VertexSubstitution:
+    def __init__(self, solver, time_budget=DEFAULT_TIME_BUDGET, restarts=DEFAULT_RESTARTS,
+                 seed=None):
+        """
+        Swap-based local search for the p-center objective (largest distance
+        from any demand point to its nearest hub), after Mladenovic, Labbe and
+        Hansen's vertex substitution.
+
+        Every point keeps its nearest and second-nearest hub. A move inserts a
+        candidate closer to the critical (farthest) point and removes the hub
+        whose loss hurts least; with the two arrays the radius after every
+        possible removal is found in one O(N) pass per inserted candidate.
+        Local optima are escaped by replacing a growing number of random hubs
+        (restarts) until the restart count or the time budget runs out.
+        Without a distance matrix, recently used candidate columns are kept
+        in a small LRU cache since the same sites are tried move after move.
+
+        Parameters:
+        - solver: PCenter instance providing the distances
+        - time_budget: wall-clock limit in seconds shared by all restarts
+        - restarts: number of random restarts after the first local optimum
+        - seed: seed for the restart perturbations
+        """
+        self.solver = solver
+        self.time_budget = time_budget
+        self.restarts = restarts
+        self.rng = np.random.default_rng(seed)
+        self._deadline = None
+        self._columns = OrderedDict()
+        self._max_columns = max(1, COLUMN_CACHE_BYTES // (8 * max(len(solver.points), 1)))
+
+    def _column(self, candidate):
+        """Distances from a candidate site to every point"""
+        if self.solver.distance_matrix is not None:
+            return np.asarray(self.solver._distance_row(candidate), dtype=np.float64)
+        column = self._columns.get(candidate)
+        if column is None:
+            column = np.asarray(self.solver._distance_row(candidate), dtype=np.float64)
+            self._columns[candidate] = column
+            if len(self._columns) > self._max_columns:
+                self._columns.popitem(last=False)
+        else:
+            self._columns.move_to_end(candidate)
+        return column
+
+    def _out_of_time(self):
+        return self._deadline is not None and time.perf_counter() > self._deadline
+
+    def _assign(self, hubs, idx=None):
+        """Nearest and second-nearest hub positions and distances of the given points"""
+        if idx is None:
+            idx = np.arange(len(self.solver.points))
+        dist = self.solver._point_candidate_distances(idx, hubs)
+        rows = np.arange(len(idx))
+        if len(hubs) == 1:
+            return (np.zeros(len(idx), dtype=np.intp), dist[:, 0],
+                    np.zeros(len(idx), dtype=np.intp), np.full(len(idx), np.inf))
+        best2 = np.argpartition(dist, 1, axis=1)[:, :2]
+        order = np.argsort(dist[rows[:, None], best2], axis=1)
+        best2 = best2[rows[:, None], order]
+        return (best2[:, 0], dist[rows, best2[:, 0]], best2[:, 1], dist[rows, best2[:, 1]])
+
+    def _best_removal(self, c1, d1, d2, added, num_hubs):
+        """
+        Radius after inserting a hub with distances 'added' (None for no
+        insertion) and removing each current hub in turn
+
+        Returns:
+        - array of the resulting radius per removed hub position
+        """
+        if added is None:
+            captured = np.zeros(len(d1), dtype=bool)
+            captured_max = 0.0
+        else:
+            captured = added < d1
+            captured_max = float(added[captured].max()) if captured.any() else 0.0
+        kept = ~captured
+        # Largest distance among points served by each hub, and what they fall back to
+        own = np.zeros(num_hubs)
+        np.maximum.at(own, c1[kept], d1[kept])
+        fallback_dist = d2[kept] if added is None else np.minimum(d2[kept], added[kept])
+        fallback = np.zeros(num_hubs)
+        np.maximum.at(fallback, c1[kept], fallback_dist)
+
+        # Largest 'own' value over the other hubs via the top two
+        top = np.argsort(own)[::-1][:2]
+        others = np.full(num_hubs, own[top[0]])
+        if num_hubs > 1:
+            others[top[0]] = own[top[1]]
+        else:
+            others[top[0]] = 0.0
+        return np.maximum(np.maximum(others, fallback), captured_max)
+
+    def _local_search(self, hubs):
+        """Best-improvement vertex substitution until no swap lowers the radius"""
+        hubs = np.array(hubs, dtype=np.intp)
+        c1, d1, c2, d2 = self._assign(hubs)
+        radius = float(d1.max())
+        moves = 0
+        while not self._out_of_time():
+            critical = int(np.argmax(d1))
+            to_critical = np.asarray(self.solver._candidate_distances(critical), dtype=np.float64)
+            closer = np.flatnonzero(to_critical < d1[critical])
+            closer = closer[~np.isin(closer, hubs)]
+            # Try the candidates nearest the critical point first
+            closer = closer[np.argsort(to_critical[closer], kind='stable')]
+
+            best = (radius, None, None)
+            for candidate in closer:
+                if self._out_of_time():
+                    break
+                added = self._column(int(candidate))
+                after = self._best_removal(c1, d1, d2, added, len(hubs))
+                removed = int(np.argmin(after))
+                if after[removed] < best[0] - 1e-12:
+                    best = (float(after[removed]), int(candidate), removed)
+            if best[1] is None:
+                break
+
+            radius, candidate, removed = best
+            hubs[removed] = candidate
+            # Only points that used the replaced hub, or that the new hub serves better, change
+            added = self._column(candidate)
+            affected = np.flatnonzero((c1 == removed) | (c2 == removed)
+                                      | (added < d2))
+            c1[affected], d1[affected], c2[affected], d2[affected] = self._assign(hubs, affected)
+            radius = float(d1.max())
+            moves += 1
+            TELEMETRY.count('swap_moves')
+            TELEMETRY.progress('local_search', moves)
+        return hubs, radius, moves
+
+    def _shake(self, hubs, strength):
+        """Replace strength random hubs with random unused candidates"""
+        hubs = hubs.copy()
+        num_candidates = len(self.solver.candidates)
+        unused = np.setdiff1d(np.arange(num_candidates), hubs)
+        # Each unused candidate fills at most one position, so no hub is duplicated
+        size = min(strength, len(hubs), len(unused))
+        if size == 0:
+            return hubs
+        positions = self.rng.choice(len(hubs), size=size, replace=False)
+        hubs[positions] = self.rng.choice(unused, size=size, replace=False)
+        return hubs
+
+    def improve(self, center_indices):
+        """
+        Lower the radius of a fixed number of hubs
+
+        Parameters:
+        - center_indices: starting candidate indices (e.g. the greedy solution)
+
+        Returns:
+        - dictionary with 'center_indices', 'radius', 'initial_radius',
+          'moves', 'restarts' run and 'seconds'
+        """
+        start = time.perf_counter()
+        if self._deadline is None:
+            self._deadline = start + self.time_budget
+            owns_deadline = True
+        else:
+            owns_deadline = False
+
+        hubs = np.asarray(center_indices, dtype=np.intp)
+        initial_radius = float(self._assign(hubs)[1].max()) if len(hubs) else np.inf
+        best_hubs, best_radius, moves = self._local_search(hubs)
+        restarts = 0
+        strength = 1
+        while restarts < self.restarts and not self._out_of_time() and len(hubs) > 1:
+            restarts += 1
+            hubs, radius, extra = self._local_search(self._shake(best_hubs, strength))
+            moves += extra
+            if radius < best_radius - 1e-12:
+                best_hubs, best_radius, strength = hubs, radius, 1
+            else:
+                # Variable neighbourhood: perturb more hubs after a failed restart
+                strength = min(strength + 1, len(hubs))
+
+        if owns_deadline:
+            self._deadline = None
+        return {
+            'center_indices': best_hubs,
+            'radius': best_radius,
+            'initial_radius': initial_radius,
+            'moves': moves,
+            'restarts': restarts,
+            'seconds': time.perf_counter() - start,
+        }
+
+    def reduce_hubs(self, center_indices, drone_range):
+        """
+        Drop hubs while local search keeps every point within drone_range
+
+        The hub whose removal raises the radius least is dropped, then the
+        remaining hubs are improved; this repeats until the radius can no
+        longer be brought back within range or the time budget runs out.
+
+        Parameters:
+        - center_indices: feasible starting candidate indices
+        - drone_range: maximum coverage radius in km
+
+        Returns:
+        - dictionary as returned by improve() for the smallest feasible hub
+          set, plus 'initial_hubs' and 'num_hubs'
+        """
+        start = time.perf_counter()
+        self._deadline = start + self.time_budget
+        try:
+            best = self.improve(center_indices)
+            initial_radius = best['initial_radius']
+            moves, restarts = best['moves'], best['restarts']
+            while len(best['center_indices']) > 1 and not self._out_of_time():
+                hubs = best['center_indices']
+                c1, d1, _, d2 = self._assign(hubs)
+                dropped = int(np.argmin(self._best_removal(c1, d1, d2, None, len(hubs))))
+                trial = self.improve(np.delete(hubs, dropped))
+                moves += trial['moves']
+                restarts += trial['restarts']
+                if trial['radius'] > drone_range:
+                    break
+                best = trial
+        finally:
+            self._deadline = None
+
+        best.update(initial_radius=initial_radius, initial_hubs=len(center_indices),
+                    num_hubs=len(best['center_indices']), moves=moves, restarts=restarts,
+                    seconds=time.perf_counter() - start)
+        return best
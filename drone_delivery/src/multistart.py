@@ -0,0 +1,183 @@
+# src/multistart.py
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.instrument import TELEMETRY
+from src.local_search import VertexSubstitution, DEFAULT_TIME_BUDGET, DEFAULT_RESTARTS
+
+# Default number of independent runs
+DEFAULT_RUNS = 16
+
+# Per-process state of the multi-start workers, set by _init_multistart_worker
+_worker_state = {}
+
+
+def _init_multistart_worker(coords, weights, candidates, method, matrix_path, shm_name,
+                            shape, dtype):
+    """Build a solver in a worker process on top of the shared, read-only distance matrix"""
+    # Imported here: src.pCenter imports this module
+    from src.pCenter import PCenter
+
+    solver = PCenter.from_arrays(coords, weights, candidates=candidates, distance_method=method)
+    shm = None
+    if matrix_path is not None:
+        solver.distance_matrix = np.load(matrix_path, mmap_mode='r')
+    elif shm_name is not None:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        matrix = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        matrix.flags.writeable = False
+        solver.distance_matrix = matrix
+    _worker_state.update(solver=solver, shm=shm)
+
+
+def _multistart_run(task):
+    """One randomized greedy + local-search run"""
+    run_id, seed, num_centers, drone_range, time_budget, restarts = task
+    solver = _worker_state['solver']
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    greedy = solver.solve_greedy_indices(num_centers, rng=rng)
+    search = VertexSubstitution(solver, time_budget=time_budget, restarts=restarts, seed=rng)
+    if drone_range is None:
+        result = search.improve(greedy)
+    else:
+        result = search.reduce_hubs(greedy, drone_range)
+    return {
+        'run': run_id,
+        'center_indices': result['center_indices'],
+        'radius': result['radius'],
+        'num_hubs': len(result['center_indices']),
+        'greedy_radius': result['initial_radius'],
+        'seconds': time.perf_counter() - start,
+        'pid': os.getpid(),
+    }
+
+
+def _summary(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {'min': float(values.min()), 'median': float(np.median(values)),
+            'max': float(values.max()), 'std': float(values.std())}
+
+
+class MultiStart:
+    def __init__(self, solver, runs=DEFAULT_RUNS, workers=None, time_budget=DEFAULT_TIME_BUDGET,
+                 restarts=DEFAULT_RESTARTS, seed=None):
+        """
+        Multi-start solving: many randomized greedy + local-search runs in a
+        process pool, keeping the best.
+
+        Workers get the coordinates once through the pool initializer and
+        attach to the distance matrix read-only: a cached .npy matrix is
+        opened as a memory map by every worker, an in-memory matrix is
+        copied once into a SharedMemory block. Without a matrix the workers
+        compute distances on the fly. Run seeds are spawned from one seed,
+        so results do not depend on the number of workers.
+
+        Parameters:
+        - solver: PCenter instance
+        - runs: number of independent runs
+        - workers: worker processes, defaults to the CPU count; 1 runs in this process
+        - time_budget: local-search budget of each run in seconds
+        - restarts: local-search restarts of each run
+        - seed: seed (or numpy SeedSequence) the per-run seeds are spawned from
+        """
+        self.solver = solver
+        self.runs = runs
+        self.workers = workers or multiprocessing.cpu_count()
+        self.time_budget = time_budget
+        self.restarts = restarts
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+
+    def _tasks(self, num_centers, drone_range):
+        seeds = self.seed_sequence.spawn(self.runs)
+        return [(run_id, seed, num_centers, drone_range, self.time_budget, self.restarts)
+                for run_id, seed in enumerate(seeds)]
+
+    def _run_pool(self, tasks, progress):
+        solver = self.solver
+        matrix = solver.distance_matrix
+        matrix_path = getattr(matrix, 'filename', None) if matrix is not None else None
+        shm = None
+        if matrix is not None and matrix_path is None:
+            shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+            np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=shm.buf)[...] = matrix
+
+        try:
+            init_args = (solver.coords, solver.weights,
+                         solver.candidates if solver.has_candidates else None,
+                         solver.distance_method, matrix_path, shm.name if shm else None,
+                         None if matrix is None else matrix.shape,
+                         None if matrix is None else matrix.dtype)
+            results = []
+            with multiprocessing.Pool(min(self.workers, len(tasks)),
+                                      initializer=_init_multistart_worker,
+                                      initargs=init_args) as pool:
+                for result in pool.imap_unordered(_multistart_run, tasks):
+                    results.append(result)
+                    TELEMETRY.count('multistart_runs')
+                    TELEMETRY.progress('multistart', len(results), len(tasks))
+                    if progress is not None:
+                        progress(len(results), len(tasks))
+            return results
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+    def run(self, num_centers, drone_range=None, progress=None):
+        """
+        Run every start and keep the best
+
+        Parameters:
+        - num_centers: number of hubs each run starts from
+        - drone_range: when given, runs also drop hubs while every point stays
+          within range; the fewest feasible hubs win, then the smallest radius
+        - progress: optional callback progress(done_runs, total_runs)
+
+        Returns:
+        - dictionary with the best run's 'center_indices', 'radius', 'num_hubs'
+          and 'run', every run in 'runs' (by run id) with its timing, the
+          'spread' (min/median/max/std) of radius, hubs and seconds across
+          runs, and the total wall-clock 'seconds'
+        """
+        start = time.perf_counter()
+        tasks = self._tasks(num_centers, drone_range)
+        if self.workers <= 1 or len(tasks) <= 1:
+            _worker_state.update(solver=self.solver, shm=None)
+            results = []
+            for task in tasks:
+                results.append(_multistart_run(task))
+                TELEMETRY.count('multistart_runs')
+                TELEMETRY.progress('multistart', len(results), len(tasks))
+                if progress is not None:
+                    progress(len(results), len(tasks))
+            _worker_state.clear()
+        else:
+            results = self._run_pool(tasks, progress)
+        results.sort(key=lambda result: result['run'])
+
+        if drone_range is None:
+            best = min(results, key=lambda r: (r['radius'], r['num_hubs']))
+        else:
+            best = min(results, key=lambda r: (r['radius'] > drone_range, r['num_hubs'], r['radius']))
+        return {
+            'center_indices': best['center_indices'],
+            'radius': best['radius'],
+            'num_hubs': best['num_hubs'],
+            'run': best['run'],
+            'runs': results,
+            'spread': {
+                'radius': _summary([r['radius'] for r in results]),
+                'num_hubs': _summary([r['num_hubs'] for r in results]),
+                'seconds': _summary([r['seconds'] for r in results]),
+            },
+            'workers': 1 if self.workers <= 1 else min(self.workers, len(tasks)),
+            'seconds': time.perf_counter() - start,
+        }
@@ -1,55 +1,205 @@
-from geopy.distance import geodesic
+import logging
+
 import numpy as np
+from src.capacity import CapacitatedAssignment, DEFAULT_DROP_BUDGET
+from src.distance import distance_matrix, parallel_distance_matrix, point_distance, get_engine
+from src.demand import DemandSet
+from src.exact import ExactPCenter, DEFAULT_NODE_LIMIT
+from src.local_search import VertexSubstitution, DEFAULT_TIME_BUDGET, DEFAULT_RESTARTS
+from src.multistart import MultiStart, DEFAULT_RUNS
+from src.partition import PartitionedSolver, DEFAULT_TILE_POINTS
+from src.session import WhatIfSession
+from src.instrument import StageTimer, TELEMETRY, timed
 
 class PCenter:
-    def __init__(self, borough_datasets):
+    def __init__(self, borough_datasets, distance_method='geodesic', candidates=None, timer=None):
         """
         Initialize P-Center solver with borough datasets
         
         Parameters:
-        - borough_datasets: dictionary containing borough data with population-weighted points
+        - borough_datasets: DemandSet (used without copying the coordinates),
+          or dictionary containing borough data with population-weighted
+          points; an optional per-point 'weights' entry overrides the borough density
+        - distance_method: distance engine name, 'geodesic' (WGS-84) or 'haversine'
+        - candidates: optional (M, 2) array of candidate hub sites (see
+          src.candidates); by default hubs may only be placed on demand points
+        - timer: StageTimer recording the solver stages ('distance_matrix',
+          'coverage_index', 'binary_search', 'solve_exact', 'local_search',
+          'multistart', 'capacitated', 'evaluate'), a private one by default
         """
+        self.timer = timer or StageTimer()
+        get_engine(distance_method)
         self.borough_datasets = borough_datasets
-        # Combine all points from all boroughs
-        self.points = []
-        self.point_weights = []
+        self.distance_method = distance_method
         self.distance_matrix = None
-        for boro_code, data in borough_datasets.items():
-            borough_points = data['points']
-            # Get borough population density for weighting
-            density = data['density']
-            self.points.extend(borough_points)
-            # Add weights based on borough density
-            self.point_weights.extend([density] * len(borough_points))
-    
-    def precalculate_distances(self):
+        self.coverage_index = None
+        if not isinstance(borough_datasets, DemandSet):
+            # Combine all points from all boroughs
+            borough_datasets = DemandSet.from_borough_datasets(borough_datasets)
+        # Columnar demand; its borough codes drive the partitioned solve
+        self.demand = borough_datasets
+        self.coords = borough_datasets.coords
+        # Weights are summed and multiplied a lot; keep them in float64
+        self.weights = borough_datasets.weights.astype(np.float64)
+        # Kept for callers that used the point list; an (N, 2) array view
+        self.points = self.coords
+        # Candidate hub sites; center indices always refer to this array
+        if candidates is None:
+            self.candidates = self.coords
+        else:
+            self.candidates = np.asarray(candidates, dtype=np.float64).reshape(-1, 2)
+        # Coordinate -> index lookup for the coordinate-based facade
+        self._candidate_index = {}
+        for idx, site in enumerate(map(tuple, self.candidates.tolist())):
+            self._candidate_index.setdefault(site, idx)
+
+    @classmethod
+    def from_arrays(cls, points, weights=None, candidates=None, distance_method='geodesic',
+                    timer=None):
         """
-        Precompute pairwise distances between all points for faster access.
-        Stores distances in a dictionary with point indices as keys.
+        Build a solver from plain arrays instead of borough datasets
+        
+        Parameters:
+        - points: (N, 2) array of (lat, lon) demand points
+        - weights: optional (N,) demand weights, 1 per point by default
+        - candidates: optional (M, 2) array of candidate hub sites
+        - distance_method: distance engine name
+        - timer: StageTimer, a private one by default
         """
-        num_points = len(self.points)
-        self.distance_matrix = np.zeros((num_points, num_points))
+        return cls(DemandSet(points, weights), distance_method=distance_method,
+                   candidates=candidates, timer=timer)
+
+    @property
+    def has_candidates(self):
+        """True when hubs are restricted to separate candidate sites instead of demand points"""
+        return self.candidates is not self.coords
+    
+    @timed('distance_matrix')
+    def precalculate_distances(self, block_size=None, cache=None, workers=None, progress=None):
+        """
+        Precompute distances between demand points and candidate sites for
+        faster access. Stores distances in an N x M matrix (N x N when the
+        demand points are the candidates) indexed by position, built in row
+        blocks with the vectorized distance engine.
         
-        for i in range(num_points):
-            for j in range(i + 1, num_points):
-                dist = self._calculate_distance(self.points[i], self.points[j])
-                self.distance_matrix[i][j] = dist
-                self.distance_matrix[j][i] = dist
+        Parameters:
+        - block_size: rows evaluated per block (chosen automatically when None)
+        - cache: optional DistanceCache; the matrix is then a read-only float32
+          memory map loaded from (or first written to) the cache directory
+        - workers: build the matrix with this many processes (tiled upper triangle)
+        - progress: optional callback progress(done_tiles, total_tiles) for parallel builds
+        """
+        candidates = self.candidates if self.has_candidates else None
+        if cache is not None:
+            self.distance_matrix = cache.get_or_build(
+                self.coords, self.distance_method, block_size=block_size,
+                workers=workers, progress=progress, candidates=candidates)
+        elif workers is not None and workers > 1:
+            self.distance_matrix = parallel_distance_matrix(
+                self.coords, method=self.distance_method, workers=workers,
+                progress=progress, candidates=candidates)
+        else:
+            self.distance_matrix = distance_matrix(
+                self.coords, method=self.distance_method, block_size=block_size,
+                candidates=candidates)
+
+    @timed('coverage_index')
+    def build_coverage_index(self):
+        """
+        Build the sparse radius-neighbour index between points and candidate sites.
+        Once built, coverage questions (feasibility, uncovered points) are
+        answered from it, so the dense matrix is only needed by the exact solver.
+        """
+        # Imported here so solving on plain arrays does not load scipy
+        from src.coverage import CoverageIndex
+        self.coverage_index = CoverageIndex(
+            self.coords, candidates=self.candidates if self.has_candidates else None,
+            method=self.distance_method)
+        return self.coverage_index
 
     def _get_distance(self, point_idx1, point_idx2):
         """
-        Retrieve the precalculated distance between two points.
+        Retrieve the precalculated distance between a point and a candidate site.
         
         Parameters:
-        - point_idx1: Index of the first point
-        - point_idx2: Index of the second point
+        - point_idx1: Index of the demand point
+        - point_idx2: Index of the candidate site
         
         Returns:
-        - Distance between the two points
+        - Distance between the two
         """
         return self.distance_matrix[point_idx1][point_idx2]
 
 
+    def _as_indices(self, centers):
+        """
+        Convert centers to an integer candidate index array.
+        Accepts either an index array or a list of (lat, lon) coordinates.
+        """
+        arr = np.asarray(centers)
+        if arr.ndim == 1 and np.issubdtype(arr.dtype, np.integer):
+            return arr.astype(np.intp, copy=False)
+        return np.array([self._candidate_index[tuple(center)] for center in centers],
+                        dtype=np.intp)
+
+    def _to_points(self, center_indices):
+        """Convert a candidate index array back to a list of (lat, lon) coordinates"""
+        return [tuple(site) for site in self.candidates[center_indices].tolist()]
+
+    def _distance_row(self, candidate_idx):
+        """Distances from one candidate site to every point, computed on the fly without a matrix"""
+        if self.distance_matrix is not None:
+            if not self.has_candidates:
+                # Symmetric matrix: the row is the column, and contiguous
+                return self.distance_matrix[candidate_idx]
+            return self.distance_matrix[:, candidate_idx]
+        engine = get_engine(self.distance_method)
+        lat, lon = self.candidates[candidate_idx]
+        return engine(lat, lon, self.coords[:, 0], self.coords[:, 1])
+
+    def _candidate_distances(self, point_idx):
+        """Distances from one point to every candidate site"""
+        if self.distance_matrix is not None:
+            return self.distance_matrix[point_idx]
+        engine = get_engine(self.distance_method)
+        lat, lon = self.coords[point_idx]
+        return engine(lat, lon, self.candidates[:, 0], self.candidates[:, 1])
+
+    def _point_candidate_distances(self, point_indices, candidate_indices):
+        """(len(point_indices), len(candidate_indices)) block of point-to-candidate distances"""
+        point_indices = np.asarray(point_indices, dtype=np.intp)
+        candidate_indices = np.asarray(candidate_indices, dtype=np.intp)
+        if self.distance_matrix is not None:
+            return np.asarray(self.distance_matrix[np.ix_(point_indices, candidate_indices)],
+                              dtype=np.float64)
+        engine = get_engine(self.distance_method)
+        points, sites = self.coords[point_indices], self.candidates[candidate_indices]
+        return engine(points[:, 0, None], points[:, 1, None], sites[None, :, 0], sites[None, :, 1])
+
+    def _nearest_centers(self, center_indices):
+        """
+        Nearest center of every point
+        
+        Returns:
+        - assignment: position in center_indices of each point's nearest center
+        - distances: distance from each point to that center
+        """
+        center_indices = np.asarray(center_indices, dtype=np.intp)
+        if self.distance_matrix is None and self.coverage_index is not None:
+            return self.coverage_index.nearest(center_indices)
+        assignment = np.zeros(len(self.points), dtype=np.intp)
+        nearest = np.full(len(self.points), np.inf)
+        for position, center_idx in enumerate(center_indices):
+            distances = self._distance_row(center_idx)
+            closer = distances < nearest
+            assignment[closer] = position
+            nearest[closer] = distances[closer]
+        return assignment, nearest
+
+    def _nearest_center_distances(self, center_indices):
+        """Distance from every point to its nearest center"""
+        return self._nearest_centers(center_indices)[1]
+
     def binary_search_min_centers(self, drone_range=3.0, max_centers=20):
         """
         Find minimum number of centers needed for coverage using binary search
@@ -62,16 +212,39 @@ class PCenter:
         - min_required: minimum number of centers needed
         - best_centers: locations of centers for the minimum solution
         """
-        left = 1
+        min_required, center_indices = self.binary_search_min_center_indices(
+            drone_range=drone_range, max_centers=max_centers)
+        return min_required, self._to_points(center_indices)
+
+    @timed('binary_search')
+    def binary_search_min_center_indices(self, drone_range=3.0, max_centers=20, min_centers=1):
+        """
+        Index-based version of binary_search_min_centers
+        
+        Parameters:
+        - min_centers: fewest centers tried, when fewer are known to be infeasible
+        
+        Returns:
+        - min_required: minimum number of centers needed
+        - best_centers: index array of the centers for the minimum solution
+        """
+        max_centers = min(max_centers, len(self.candidates))
+        left = max(1, min(min_centers, max_centers))
         right = max_centers
         min_required = max_centers
         best_centers = None
         
+        probes = 0
         while left <= right:
             mid = (left + right) // 2
-            centers = self.solve_greedy(mid)
+            centers = self.solve_greedy_indices(mid)
+            feasible = self.test_feasibility(centers, drone_range)
+            probes += 1
+            TELEMETRY.count('greedy_probes')
+            TELEMETRY.event('greedy_probe', logging.DEBUG, num_centers=mid, feasible=feasible)
+            TELEMETRY.progress('binary_search', probes)
             
-            if self.test_feasibility(centers, drone_range):
+            if feasible:
                 # This many centers works, try fewer
                 min_required = mid
                 best_centers = centers
@@ -81,20 +254,77 @@ class PCenter:
                 left = mid + 1
         
         if best_centers is None:
-            print("No solution found for the given parameters.")
+            TELEMETRY.event('no_solution', logging.WARNING,
+                            message="No solution found for the given parameters.",
+                            drone_range=drone_range, max_centers=max_centers)
             # Return the centers from the last iteration
-            return max_centers, self.solve_greedy(max_centers)
+            return max_centers, self.solve_greedy_indices(max_centers)
         
         return min_required, best_centers
 
+    @timed('solve_exact')
+    def solve_exact(self, num_centers, exact=True, node_limit=DEFAULT_NODE_LIMIT):
+        """
+        Minimum coverage radius for num_centers hubs, by bisection over the
+        sorted point-to-candidate distances with a set-cover feasibility check.
+        
+        Parameters:
+        - num_centers: number of centers to place
+        - exact: prove probes with branch-and-bound when bounds are not enough
+        - node_limit: branch-and-bound node budget per probe
+        
+        Returns:
+        - dictionary with 'radius', proven 'lower_bound', 'optimal', 'centers'
+          (coordinates), 'center_indices' and per-probe timings in 'probes'
+        """
+        if self.distance_matrix is None:
+            self.precalculate_distances()
+        result = ExactPCenter(self.distance_matrix, node_limit=node_limit).min_radius(
+            num_centers, exact=exact)
+        result['centers'] = self._to_points(result['center_indices'])
+        return result
+
+    @timed('solve_exact')
+    def min_centers_exact(self, drone_range=3.0, exact=True, node_limit=DEFAULT_NODE_LIMIT):
+        """
+        Fewest hubs covering every point within drone_range, with a proven
+        lower bound.
+        
+        Parameters:
+        - drone_range: maximum coverage radius in km
+        - exact: prove probes with branch-and-bound when bounds are not enough
+        - node_limit: branch-and-bound node budget per probe
+        
+        Returns:
+        - dictionary with 'num_centers', 'lower_bound', 'optimal', 'centers'
+          (coordinates), 'center_indices', per-probe timings in 'probes' and
+          'uncoverable_indices', the points no candidate covers; 'num_centers'
+          and 'centers' are None when there are any
+        """
+        if self.distance_matrix is None:
+            self.precalculate_distances()
+        result = ExactPCenter(self.distance_matrix, node_limit=node_limit).min_centers(
+            drone_range, exact=exact)
+        indices = result['center_indices']
+        result['centers'] = None if indices is None else self._to_points(indices)
+        return result
+
     def test_feasibility(self, centers, drone_range):
-        """Test if given centers can cover all points within drone_range"""
-        for point_idx, point in enumerate(self.points):
-            min_distance = min(self._get_distance(point_idx, self.points.index(center)) 
-                             for center in centers)
-            if min_distance > drone_range:
-                return False
-        return True
+        """Test if given centers (indices or coordinates) can cover all points within drone_range"""
+        center_indices = self._as_indices(centers)
+        TELEMETRY.count('feasibility_checks')
+        if self.coverage_index is not None:
+            return bool(self.coverage_index.covered_mask(center_indices, drone_range).all())
+        return bool(np.all(self._nearest_center_distances(center_indices) <= drone_range))
+
+    def uncovered_indices(self, centers, drone_range):
+        """Indices of the points farther than drone_range from every center"""
+        center_indices = self._as_indices(centers)
+        if self.coverage_index is not None:
+            covered = self.coverage_index.covered_mask(center_indices, drone_range)
+        else:
+            covered = self._nearest_center_distances(center_indices) <= drone_range
+        return np.flatnonzero(~covered)
 
     def solve_greedy(self, num_centers):
         """
@@ -102,88 +332,280 @@ class PCenter:
         
         Parameters:
         - num_centers: number of centers to place
+        
+        Returns:
+        - list of (lat, lon) center locations (candidate sites)
+        """
+        return self._to_points(self.solve_greedy_indices(num_centers))
+
+    def solve_greedy_indices(self, num_centers, rng=None, rcl_size=3):
         """
-        centers = []
-        remaining_points = self.points.copy()
-        remaining_weights = self.point_weights.copy()
-        
-        # Choose first center as point in highest density area
-        max_weight_idx = np.argmax(remaining_weights)
-        centers.append(remaining_points[max_weight_idx])
-        remaining_points.pop(max_weight_idx)
-        remaining_weights.pop(max_weight_idx)
-        
-        while len(centers) < num_centers:
-            next_center = self.find_farthest_point(centers, remaining_points, remaining_weights)
-            if next_center is None:
-                break
-            centers.append(next_center)
-            idx = remaining_points.index(next_center)
-            remaining_points.pop(idx)
-            remaining_weights.pop(idx)
+        Weighted farthest-first greedy working on candidate indices.
+        
+        Keeps the distance from every point to its nearest chosen center,
+        so adding a center costs a single O(N) np.minimum update. The
+        weighted-farthest point gets the closest unused candidate site, which
+        is the point itself when hubs are placed on demand points.
+        
+        With an rng the greedy is randomized for multi-start runs: the first
+        point is drawn in proportion to its weight and every later point
+        uniformly among the rcl_size weighted-farthest ones.
+        
+        Parameters:
+        - num_centers: number of centers to place
+        - rng: optional numpy Generator for the randomized variant
+        - rcl_size: size of the restricted candidate list of the randomized variant
+        
+        Returns:
+        - candidate index array of the chosen centers
+        """
+        num_centers = min(num_centers, len(self.candidates))
+        if num_centers <= 0:
+            return np.empty(0, dtype=np.intp)
+
+        centers = np.empty(num_centers, dtype=np.intp)
+        available = np.ones(len(self.candidates), dtype=bool)
+        nearest = np.full(len(self.points), np.inf)
+        
+        for k in range(num_centers):
+            if rng is not None:
+                target = self._random_target(nearest, rng, rcl_size)
+            elif k == 0:
+                # Choose first center in the highest density area
+                target = int(np.argmax(self.weights))
+            else:
+                target = self.find_farthest_index(nearest)
+            next_center = self.find_closest_candidate(target, available)
+            centers[k] = next_center
+            available[next_center] = False
+            np.minimum(nearest, self._distance_row(next_center), out=nearest)
         
         return centers
     
-    def find_farthest_point(self, centers, candidates, weights):
-        """Find the farthest point considering population density weights"""
-        max_weighted_distance = -1
-        furthest_point = None
-        
-        for candidate_idx, point in enumerate(candidates):
-            min_distance = min(self._get_distance(candidate_idx, self.points.index(center)) 
-                             for center in centers)
-            # Weight the distance by population density
-            weighted_distance = min_distance * (0.2)*(weights[candidate_idx])
-            
-            if weighted_distance > max_weighted_distance:
-                max_weighted_distance = weighted_distance
-                furthest_point = point
+    def find_farthest_index(self, nearest, available=None):
+        """
+        Find the farthest point considering population density weights
+        
+        Parameters:
+        - nearest: distance from every point to its nearest chosen center
+        - available: optional boolean mask of the points to consider
+        
+        Returns:
+        - global index of the point with the largest weighted distance
+        """
+        weighted_distance = nearest * self.weights
+        if available is not None:
+            weighted_distance = np.where(available, weighted_distance, -np.inf)
+        return int(np.argmax(weighted_distance))
+
+    def _random_target(self, nearest, rng, rcl_size):
+        """Weight-proportional first point, then one of the rcl_size weighted-farthest points"""
+        if np.isinf(nearest).all():
+            return int(rng.choice(len(self.points), p=self.weights / self.weights.sum()))
+        weighted_distance = nearest * self.weights
+        size = min(rcl_size, len(weighted_distance))
+        shortlist = np.argpartition(weighted_distance, -size)[-size:]
+        return int(rng.choice(shortlist))
+
+    def find_closest_candidate(self, point_idx, available):
+        """
+        Closest unused candidate site to a demand point
+        
+        Parameters:
+        - point_idx: index of the demand point
+        - available: boolean mask of candidates that may still become centers
+        
+        Returns:
+        - candidate index
+        """
+        if not self.has_candidates and available[point_idx]:
+            return point_idx
+        distances = np.where(available, self._candidate_distances(point_idx), np.inf)
+        return int(np.argmin(distances))
+    
+    @timed('local_search')
+    def improve_solution(self, centers, drone_range=None, time_budget=DEFAULT_TIME_BUDGET,
+                         restarts=DEFAULT_RESTARTS, seed=None):
+        """
+        Refine a solution (e.g. from binary_search_min_centers) with
+        vertex-substitution local search
+        
+        Parameters:
+        - centers: center indices or list of center locations
+        - drone_range: when given, also drop hubs as long as every point stays
+          within this range; otherwise only the radius is lowered
+        - time_budget: wall-clock limit in seconds
+        - restarts: number of random restarts
+        - seed: seed for the restart perturbations
+        
+        Returns:
+        - dictionary with the improved 'centers' (coordinates), 'center_indices',
+          'radius' and 'initial_radius', 'num_hubs' and 'initial_hubs', and
+          'moves', 'restarts' and 'seconds' spent
+        """
+        center_indices = self._as_indices(centers)
+        search = VertexSubstitution(self, time_budget=time_budget, restarts=restarts, seed=seed)
+        if drone_range is None:
+            result = search.improve(center_indices)
+            result.update(initial_hubs=len(center_indices), num_hubs=len(center_indices))
+        else:
+            result = search.reduce_hubs(center_indices, drone_range)
+        result['centers'] = self._to_points(result['center_indices'])
+        return result
+    
+    @timed('multistart')
+    def solve_multistart(self, num_centers, drone_range=None, runs=DEFAULT_RUNS, workers=None,
+                         time_budget=DEFAULT_TIME_BUDGET, restarts=DEFAULT_RESTARTS, seed=None,
+                         progress=None):
+        """
+        Best of many randomized greedy + local-search runs across a process pool
+        
+        Parameters:
+        - num_centers: number of hubs each run starts from
+        - drone_range: when given, runs also drop hubs while every point stays
+          within range and the fewest feasible hubs win; otherwise the
+          smallest radius wins
+        - runs: number of independent runs
+        - workers: worker processes, defaults to the CPU count
+        - time_budget: local-search budget of each run in seconds
+        - restarts: local-search restarts of each run
+        - seed: seed from which the per-run seeds are spawned
+        - progress: optional callback progress(done_runs, total_runs)
         
-        return furthest_point
+        Returns:
+        - dictionary with the best run's 'centers', 'center_indices', 'radius'
+          and 'num_hubs', the per-run results in 'runs' and their 'spread'
+        """
+        result = MultiStart(self, runs=runs, workers=workers, time_budget=time_budget,
+                            restarts=restarts, seed=seed).run(
+            num_centers, drone_range=drone_range, progress=progress)
+        result['centers'] = self._to_points(result['center_indices'])
+        return result
+    
+    @timed('partitioned')
+    def solve_partitioned(self, drone_range=3.0, partition='borough', max_points=DEFAULT_TILE_POINTS,
+                          max_centers=50, workers=None, progress=None):
+        """
+        Solve boroughs or k-d tiles independently in a process pool, then
+        repair coverage and merge hubs along the part boundaries
+        
+        Parameters:
+        - drone_range: maximum coverage radius in km
+        - partition: 'borough' or 'tiles'
+        - max_points: largest tile for 'tiles'
+        - max_centers: most hubs the greedy binary search tries in one part
+        - workers: worker processes, defaults to the CPU count
+        - progress: optional callback progress(done_parts, total_parts)
+        
+        Returns:
+        - PartitionedSolver.solve dictionary with the hub 'centers' added
+        """
+        result = PartitionedSolver(self, partition=partition, max_points=max_points,
+                                   workers=workers).solve(drone_range, max_centers, progress)
+        result['centers'] = self._to_points(result['center_indices'])
+        return result
+    
+    def assign_capacitated(self, centers, capacity, drone_range=3.0):
+        """
+        Assign points to hubs within drone_range without exceeding hub capacities
+        
+        Parameters:
+        - centers: center indices or list of center locations
+        - capacity: maximum demand weight per hub (scalar or one per candidate site)
+        - drone_range: maximum service distance in km
+        
+        Returns:
+        - CapacitatedAssignment.assign dictionary; 'assignment' holds candidate
+          indices, -1 for points no hub could take
+        """
+        return CapacitatedAssignment(self, capacity).assign(self._as_indices(centers), drone_range)
+    
+    @timed('capacitated')
+    def min_centers_capacitated(self, capacity, drone_range=3.0, centers=None, max_centers=None,
+                                time_budget=DEFAULT_DROP_BUDGET):
+        """
+        Fewest hubs serving every point within drone_range under hub capacities
+        
+        Parameters:
+        - capacity: maximum demand weight per hub (scalar or one per candidate site)
+        - drone_range: maximum service distance in km
+        - centers: starting solution, defaults to the uncapacitated greedy search
+        - max_centers: upper limit on the number of hubs
+        - time_budget: wall-clock limit in seconds for dropping surplus hubs
+        
+        Returns:
+        - CapacitatedAssignment.min_hubs dictionary with the hub 'centers'
+          (coordinates) added
+        """
+        if centers is None:
+            _, center_indices = self.binary_search_min_center_indices(
+                drone_range, max_centers or len(self.candidates))
+        else:
+            center_indices = self._as_indices(centers)
+        result = CapacitatedAssignment(self, capacity).min_hubs(
+            center_indices, drone_range, max_centers=max_centers, time_budget=time_budget)
+        result['centers'] = self._to_points(result['center_indices'])
+        return result
+    
+    def what_if_session(self, centers, drone_range=3.0):
+        """
+        Start an incremental what-if session from a solution
+        
+        Parameters:
+        - centers: center indices or list of center locations
+        - drone_range: coverage radius in km
+        
+        Returns:
+        - WhatIfSession over this solver's points and weights with the centers
+          as hubs; repair opens hubs only at this solver's candidate sites
+        """
+        hubs = [tuple(site) for site in self.candidates[self._as_indices(centers)]]
+        return WhatIfSession(self.coords, self.weights, hubs=hubs, drone_range=drone_range,
+                             distance_method=self.distance_method, candidates=self.candidates)
     
     def _calculate_distance(self, point1, point2):
-        """Calculate distance between two points using Haversine formula"""
-        return geodesic(point1, point2).kilometers
+        """Calculate distance between two points with the configured distance engine"""
+        return point_distance(point1, point2, method=self.distance_method)
     
-    def evaluate_solution(self, centers, drone_range=3.0):
+    @timed('evaluate')
+    def evaluate_solution(self, centers, drone_range=3.0, percentiles=(50, 90, 95, 99)):
         """
-        Evaluate the solution quality
+        Evaluate the solution quality in a single vectorized pass
         
         Parameters:
-        - centers: list of center locations
+        - centers: center indices or list of center locations
         - drone_range: maximum coverage radius in km
+        - percentiles: service-distance percentiles to report
+        
+        Returns:
+        - dictionary with service distances (max, average, demand-weighted
+          average, percentiles), point and demand-weighted coverage, the
+          nearest-hub assignment with per-hub load, and the uncovered points
         """
-        max_distance = -1
-        total_distance = 0
-        covered_points = 0
-        uncovered_points = []
-        
-        for center_idx, center in enumerate(centers):
-            center_idx = self.points.index(center)
-            for point_idx, point in enumerate(self.points):
-                min_distance = self._get_distance(point_idx, center_idx)
-                max_distance = max(max_distance, min_distance)
-                total_distance += min_distance
-                
-                if min_distance <= drone_range:
-                    covered_points += 1
-                else:
-                    uncovered_points.append(point)
-        
-        coverage_percentage = (covered_points / len(self.points)) * 100
-        avg_distance = total_distance / len(self.points)
-        
-        print(f"Covered points: {covered_points} out of {len(self.points)} ({coverage_percentage:.2f}%)")
-        if len(uncovered_points) > 0:
-            print(f"Uncovered points: {len(uncovered_points)}")
-            for point in uncovered_points:
-                print(f"Uncovered point: ({point[0]:.4f}, {point[1]:.4f})")
+        center_indices = self._as_indices(centers)
+        TELEMETRY.count('evaluations')
+        assignment, distances = self._nearest_centers(center_indices)
+        covered = distances <= drone_range
+        uncovered_indices = np.flatnonzero(~covered)
+        num_points = len(self.points)
+        total_weight = float(self.weights.sum())
         
         return {
-            'max_distance': max_distance,
-            'avg_distance': avg_distance,
-            'coverage_percentage': coverage_percentage,
-            'covered_points': covered_points,
-            'uncovered_points': uncovered_points,
-            'total_points': len(self.points)
-        }
\ No newline at end of file
+            'max_distance': float(distances.max()) if num_points else 0.0,
+            'avg_distance': float(distances.mean()) if num_points else 0.0,
+            'weighted_avg_distance': (float(np.dot(distances, self.weights)) / total_weight
+                                      if total_weight else 0.0),
+            'distance_percentiles': (dict(zip(percentiles, np.percentile(distances, percentiles).tolist()))
+                                     if num_points else {}),
+            'coverage_percentage': 100.0 * covered.sum() / num_points if num_points else 100.0,
+            'weighted_coverage_percentage': (100.0 * float(self.weights[covered].sum()) / total_weight
+                                             if total_weight else 100.0),
+            'covered_points': int(covered.sum()),
+            'total_points': num_points,
+            'assignment': center_indices[assignment],
+            'hub_loads': np.bincount(assignment, minlength=len(center_indices)),
+            'hub_weights': np.bincount(assignment, weights=self.weights,
+                                       minlength=len(center_indices)),
+            'uncovered_indices': uncovered_indices,
+            'uncovered_points': [tuple(point) for point in self.coords[uncovered_indices].tolist()],
+        }
@@ -0,0 +1,399 @@
+# src/partition.py
+# scipy is imported by the repair pass, so importing the solver stays light
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from src.distance import KM_PER_DEG_LAT, KM_PER_DEG_LON, get_engine
+from src.instrument import TELEMETRY
+
+PARTITION_MODES = ('borough', 'tiles')
+
+# Default largest number of demand points in one k-d tile
+DEFAULT_TILE_POINTS = 50000
+
+# First hub count tried in a part; it doubles until the greedy covers the part
+GALLOP_START = 8
+
+# Candidate sites within this factor of the drone range around a partition
+# are offered to it, covering the equirectangular error of the bounding box
+BUFFER_MARGIN = 1.02
+
+# Fine cells per coarse cell side scanned by the packing lower bound
+PACKING_SUBDIVISIONS = 4
+
+# Candidate sites tried when merging two boundary hubs into one
+MERGE_SITES = 256
+
+
+def kd_tiles(coords, max_points=DEFAULT_TILE_POINTS):
+    """
+    Split points into k-d tiles of at most max_points points
+
+    Tiles are halved at the median of their longer side (in km) until they
+    are small enough, so all tiles hold about the same number of points.
+
+    Returns:
+    - (N,) tile label of every point, numbered 0..tiles-1
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    xy = np.column_stack([coords[:, 0] * KM_PER_DEG_LAT,
+                          coords[:, 1] * KM_PER_DEG_LON * np.cos(np.radians(coords[:, 0]))])
+    labels = np.zeros(len(coords), dtype=np.intp)
+    stack = [np.arange(len(coords))]
+    tile = 0
+    while stack:
+        idx = stack.pop()
+        if len(idx) <= max(max_points, 1):
+            labels[idx] = tile
+            tile += 1
+            continue
+        axis = int(np.argmax(np.ptp(xy[idx], axis=0)))
+        half = len(idx) // 2
+        order = np.argpartition(xy[idx, axis], half)
+        stack.extend([idx[order[half:]], idx[order[:half]]])
+    return labels
+
+
+def packing_lower_bound(coords, drone_range, method='geodesic'):
+    """
+    Lower bound on the hubs any solution within drone_range needs
+
+    Points more than 2 * drone_range apart cannot share a hub, so the size
+    of any such set of points bounds every solution from below, including
+    the global optimum. The set is built greedily, scanning one point per
+    fine grid cell in row order and keeping those far enough from the
+    points kept so far.
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if len(coords) == 0:
+        return 0
+    engine = get_engine(method)
+    separation = 2 * drone_range
+    xy = np.column_stack([coords[:, 0] * KM_PER_DEG_LAT,
+                          coords[:, 1] * KM_PER_DEG_LON * np.cos(np.radians(coords[:, 0]))])
+    # Kept points are bucketed by coarse cells, so only the 3 x 3 around a
+    # point can hold points within the separation
+    coarse_size = separation * BUFFER_MARGIN
+    fine = np.floor(xy / (coarse_size / PACKING_SUBDIVISIONS)).astype(np.int64)
+    fine -= fine.min(axis=0)
+    _, first = np.unique(fine[:, 0] * (fine[:, 1].max() + 1) + fine[:, 1], return_index=True)
+    coarse = np.floor(xy[first] / coarse_size).astype(np.int64)
+
+    kept = {}
+    count = 0
+    for idx, (row, col) in zip(first.tolist(), coarse.tolist()):
+        near = [other for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                for other in kept.get((row + di, col + dj), ())]
+        if near:
+            planar = np.hypot(*(xy[near] - xy[idx]).T)
+            if planar.min() * BUFFER_MARGIN <= separation:
+                continue
+            # Only pairs the projection cannot separate need the exact engine
+            borderline = [other for other, gap in zip(near, planar) if gap <= coarse_size]
+            if borderline:
+                others = coords[borderline]
+                if engine(coords[idx, 0], coords[idx, 1],
+                          others[:, 0], others[:, 1]).min() <= separation:
+                    continue
+        kept.setdefault((row, col), []).append(idx)
+        count += 1
+    return count
+
+
+def _solve_partition(task):
+    """Greedy binary search over one partition's points and buffered candidate sites"""
+    # Imported here: src.pCenter imports this module
+    from src.pCenter import PCenter
+
+    part, coords, weights, candidates, method, drone_range, max_centers = task
+    start = time.perf_counter()
+    solver = PCenter.from_arrays(coords, weights, candidates=candidates, distance_method=method)
+    solver.build_coverage_index()
+    # A part needs far fewer hubs than the global limit, so bound the binary
+    # search by doubling instead of starting it halfway to max_centers
+    lower, upper = 1, min(GALLOP_START, max_centers)
+    while (upper < max_centers
+           and not solver.test_feasibility(solver.solve_greedy_indices(upper), drone_range)):
+        lower, upper = upper + 1, min(2 * upper, max_centers)
+    _, center_indices = solver.binary_search_min_center_indices(drone_range, upper, lower)
+    return {
+        'part': part,
+        'center_indices': np.asarray(center_indices, dtype=np.intp),
+        'feasible': bool(solver.test_feasibility(center_indices, drone_range)),
+        'seconds': time.perf_counter() - start,
+        'pid': os.getpid(),
+    }
+
+
+class PartitionedSolver:
+    def __init__(self, solver, partition='borough', max_points=DEFAULT_TILE_POINTS, workers=None):
+        """
+        Spatially decomposed hub search for regions too large for one solve.
+
+        Demand points are split by borough or into k-d tiles, and every part
+        is solved independently in a process pool on its own points. Each
+        part is offered the candidate sites within drone_range of its
+        bounding box, so a part's subproblem is feasible whenever the global
+        one is. A boundary-repair pass then works on the union of the hubs:
+        it covers points the parts left uncovered, drops boundary hubs whose
+        points are all covered by other hubs, and merges pairs of hubs from
+        different parts into one site where a site within range of both
+        hubs' exclusive points exists.
+
+        The result reports a lower bound on the hubs of the global optimum
+        (a 2 * drone_range packing of the points), bounding how far the
+        decomposed solution can be from the global solve.
+
+        Parameters:
+        - solver: PCenter instance holding all points and candidate sites
+        - partition: 'borough' (borough codes of the solver's DemandSet) or 'tiles'
+        - max_points: largest tile for 'tiles'
+        - workers: worker processes, defaults to the CPU count; 1 solves in this process
+        """
+        if partition not in PARTITION_MODES:
+            raise ValueError(f"Unknown partition mode '{partition}'. "
+                             f"Choose one of: {', '.join(PARTITION_MODES)}")
+        self.solver = solver
+        self.partition = partition
+        self.max_points = max_points
+        self.workers = workers or multiprocessing.cpu_count()
+        self.engine = get_engine(solver.distance_method)
+
+    def labels(self):
+        """Partition of every demand point"""
+        if self.partition == 'borough':
+            return self.solver.demand.boroughs.astype(np.intp)
+        return kd_tiles(self.solver.coords, self.max_points)
+
+    def _buffered_candidates(self, points, drone_range, order, sorted_lats):
+        """Candidate indices within drone_range of the bounding box of points"""
+        sites = self.solver.candidates
+        pad = drone_range * BUFFER_MARGIN
+        lat_pad = pad / KM_PER_DEG_LAT
+        min_lat, max_lat = points[:, 0].min() - lat_pad, points[:, 0].max() + lat_pad
+        # Longitude degrees are shortest on the edge farthest from the equator
+        widest = min(np.radians(max(abs(min_lat), abs(max_lat))), np.radians(89.0))
+        lon_pad = pad / (KM_PER_DEG_LON * np.cos(widest))
+        lo = int(np.searchsorted(sorted_lats, min_lat, side='left'))
+        hi = int(np.searchsorted(sorted_lats, max_lat, side='right'))
+        idx = order[lo:hi]
+        lons = sites[idx, 1]
+        keep = (lons >= points[:, 1].min() - lon_pad) & (lons <= points[:, 1].max() + lon_pad)
+        return np.sort(idx[keep])
+
+    def _tasks(self, labels, drone_range, max_centers):
+        solver = self.solver
+        order = np.argsort(solver.candidates[:, 0], kind='stable')
+        sorted_lats = solver.candidates[order, 0]
+        tasks, sites = [], {}
+        for part in np.unique(labels):
+            members = np.flatnonzero(labels == part)
+            points = solver.coords[members]
+            site_idx = self._buffered_candidates(points, drone_range, order, sorted_lats)
+            sites[int(part)] = site_idx
+            tasks.append((int(part), points, solver.weights[members], solver.candidates[site_idx],
+                          solver.distance_method, drone_range, min(max_centers, len(site_idx))))
+        # Largest parts first, so the pool does not wait on one big straggler
+        tasks.sort(key=lambda task: -len(task[1]))
+        return tasks, sites
+
+    def _run(self, tasks, progress):
+        results = []
+
+        def record(result):
+            results.append(result)
+            TELEMETRY.count('partitions_solved')
+            TELEMETRY.progress('partitions', len(results), len(tasks))
+            if progress is not None:
+                progress(len(results), len(tasks))
+
+        if self.workers <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                record(_solve_partition(task))
+        else:
+            with multiprocessing.Pool(min(self.workers, len(tasks))) as pool:
+                for result in pool.imap_unordered(_solve_partition, tasks):
+                    record(result)
+        return results
+
+    def solve(self, drone_range=3.0, max_centers=50, progress=None):
+        """
+        Solve every part, then repair the boundaries
+
+        Parameters:
+        - drone_range: maximum coverage radius in km
+        - max_centers: most hubs the greedy binary search tries in one part
+        - progress: optional callback progress(done_parts, total_parts)
+
+        Returns:
+        - dictionary with the repaired 'center_indices' and 'num_hubs', the
+          per-part results in 'parts', the 'repair' counts (hubs 'added',
+          'dropped', 'merged' and points still 'uncovered'), the
+          'hub_lower_bound' on the global optimum and 'optimality_ratio'
+          (num_hubs over that bound, at least the ratio to the global
+          optimum), plus 'workers' and the wall-clock 'seconds'
+        """
+        start = time.perf_counter()
+        labels = self.labels()
+        tasks, sites = self._tasks(labels, drone_range, max_centers)
+        results = self._run(tasks, progress)
+
+        parts, hubs, hub_parts = [], [], []
+        for result in sorted(results, key=lambda r: r['part']):
+            part_hubs = sites[result['part']][result['center_indices']]
+            hubs.append(part_hubs)
+            hub_parts.append(np.full(len(part_hubs), result['part'], dtype=np.intp))
+            parts.append({
+                'part': result['part'],
+                'points': int(np.count_nonzero(labels == result['part'])),
+                'candidates': len(sites[result['part']]),
+                'num_hubs': len(part_hubs),
+                'feasible': result['feasible'],
+                'seconds': result['seconds'],
+            })
+        hubs = np.concatenate(hubs) if hubs else np.empty(0, dtype=np.intp)
+        hub_parts = np.concatenate(hub_parts) if hub_parts else np.empty(0, dtype=np.intp)
+
+        center_indices, repair = self._repair(hubs, hub_parts, labels, drone_range)
+        lower_bound = packing_lower_bound(self.solver.coords, drone_range,
+                                          self.solver.distance_method)
+        TELEMETRY.count('boundary_hubs_merged', repair['merged'])
+        return {
+            'center_indices': center_indices,
+            'num_hubs': len(center_indices),
+            'parts': parts,
+            'repair': repair,
+            'hub_lower_bound': lower_bound,
+            'optimality_ratio': len(center_indices) / lower_bound if lower_bound else 1.0,
+            'workers': 1 if self.workers <= 1 else min(self.workers, len(tasks)),
+            'seconds': time.perf_counter() - start,
+        }
+
+    def _repair(self, hubs, hub_parts, labels, drone_range):
+        """Cover left-over points, then drop and merge redundant hubs near part boundaries"""
+        from scipy.spatial import cKDTree
+        from src.coverage import SPHERE_SLACK, chord_length, to_unit_sphere
+
+        solver = self.solver
+        coords, sites = solver.coords, solver.candidates
+        chord = chord_length(drone_range * SPHERE_SLACK)
+        point_xyz = to_unit_sphere(coords[:, 0], coords[:, 1])
+        point_tree = cKDTree(point_xyz)
+        if solver.has_candidates:
+            site_xyz = to_unit_sphere(sites[:, 0], sites[:, 1])
+            site_tree = cKDTree(site_xyz)
+        else:
+            site_xyz, site_tree = point_xyz, point_tree
+
+        def covered_by(site):
+            near = np.asarray(point_tree.query_ball_point(site_xyz[site], chord), dtype=np.intp)
+            dists = self.engine(sites[site, 0], sites[site, 1], coords[near, 0], coords[near, 1])
+            return near[dists <= drone_range]
+
+        # A site chosen by two overlapping parts belongs to neither (owner -1)
+        coverage, owner = {}, {}
+        for site, part in zip(hubs.tolist(), hub_parts.tolist()):
+            if site in coverage:
+                owner[site] = -1
+                continue
+            coverage[site] = covered_by(site)
+            owner[site] = part
+        counts = np.zeros(len(coords), dtype=np.int32)
+        for points in coverage.values():
+            counts[points] += 1
+
+        def add(site):
+            # Repair hubs belong to no part, so later passes treat them as boundary hubs
+            coverage[site] = covered_by(site)
+            owner[site] = -1
+            counts[coverage[site]] += 1
+
+        def remove(site):
+            counts[coverage.pop(site)] -= 1
+            owner.pop(site)
+
+        # Cover what the parts missed, heaviest points first
+        added = 0
+        uncovered = np.flatnonzero(counts == 0)
+        for point in uncovered[np.argsort(-solver.weights[uncovered], kind='stable')]:
+            if counts[point] > 0:
+                continue
+            dist, site = site_tree.query(point_xyz[point])
+            if dist > chord:
+                continue
+            # Prefer the site nearest the centroid of the uncovered points around this one
+            near = np.asarray(point_tree.query_ball_point(point_xyz[point], chord), dtype=np.intp)
+            near = near[counts[near] == 0]
+            _, centered = site_tree.query(point_xyz[near].mean(axis=0))
+            if self.engine(coords[point, 0], coords[point, 1],
+                           sites[centered, 0], sites[centered, 1]) <= drone_range:
+                site = centered
+            elif self.engine(coords[point, 0], coords[point, 1],
+                             sites[site, 0], sites[site, 1]) > drone_range:
+                continue
+            if int(site) in coverage:
+                continue
+            add(int(site))
+            added += 1
+
+        def is_boundary(site):
+            return owner[site] < 0 or np.any(labels[coverage[site]] != owner[site])
+
+        def drop_redundant():
+            dropped = 0
+            boundary = [site for site in coverage if is_boundary(site)]
+            boundary.sort(key=lambda site: solver.weights[coverage[site]].sum())
+            for site in boundary:
+                points = coverage[site]
+                if len(points) == 0 or counts[points].min() >= 2:
+                    remove(site)
+                    dropped += 1
+            return dropped
+
+        dropped = drop_redundant()
+
+        # Merge pairs of boundary hubs from different parts into one site
+        merged = 0
+        boundary = np.array([site for site in coverage if is_boundary(site)], dtype=np.intp)
+        if len(boundary) > 1:
+            pairs = cKDTree(site_xyz[boundary]).query_pairs(
+                chord_length(2 * drone_range * SPHERE_SLACK), output_type='ndarray')
+            a, b = boundary[pairs[:, 0]], boundary[pairs[:, 1]]
+            gaps = self.engine(sites[a, 0], sites[a, 1], sites[b, 0], sites[b, 1])
+            for first, second in zip(a[np.argsort(gaps)].tolist(), b[np.argsort(gaps)].tolist()):
+                if first not in coverage or second not in coverage or owner[first] == owner[second]:
+                    continue
+                points = np.union1d(coverage[first], coverage[second])
+                left = (counts[points] - np.isin(points, coverage[first])
+                        - np.isin(points, coverage[second]))
+                exclusive = points[left == 0]
+                if len(exclusive) == 0:
+                    continue
+                near = np.asarray(site_tree.query_ball_point(point_xyz[exclusive[0]], chord),
+                                  dtype=np.intp)
+                if len(near) > MERGE_SITES:
+                    _, closest = site_tree.query(point_xyz[exclusive].mean(axis=0), k=MERGE_SITES)
+                    near = np.asarray(closest, dtype=np.intp)
+                dists = self.engine(sites[near, 0, None], sites[near, 1, None],
+                                    coords[exclusive, 0], coords[exclusive, 1])
+                worst = dists.max(axis=1)
+                best = int(np.argmin(worst))
+                if worst[best] > drone_range:
+                    continue
+                remove(first)
+                remove(second)
+                if int(near[best]) not in coverage:
+                    add(int(near[best]))
+                merged += 1
+            dropped += drop_redundant()
+
+        center_indices = np.array(sorted(coverage), dtype=np.intp)
+        return center_indices, {
+            'added': added,
+            'dropped': dropped,
+            'merged': merged,
+            'uncovered': int(np.count_nonzero(counts == 0)),
+        }
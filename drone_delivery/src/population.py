@@ -0,0 +1,261 @@
+# src/population.py
+# geopandas and rasterio are only imported when a source layer is rasterized;
+# loading the cached grid and looking up weights needs nothing but numpy
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+from src.instrument import TELEMETRY
+
+# Cell size in km of the grid a census-tract layer is rasterized onto
+DEFAULT_CELL_KM = 0.1
+
+# Bumped whenever the cached layout changes
+POPULATION_CACHE_VERSION = 1
+
+# Raster formats read directly; anything else is treated as a tract layer
+RASTER_FORMATS = ('.asc', '.tif', '.tiff')
+
+# Cell centers tested against the tracts per STRtree query
+RASTERIZE_CHUNK = 1_000_000
+
+KM_PER_DEGREE = 111.32
+
+
+def _read_ascii_grid(path):
+    """ESRI ASCII grid: header lines, then rows of values from north to south"""
+    header = {}
+    with open(path) as f:
+        while True:
+            position = f.tell()
+            parts = f.readline().split()
+            if len(parts) != 2 or not parts[0][0].isalpha():
+                f.seek(position)
+                break
+            header[parts[0].lower()] = float(parts[1])
+        values = np.loadtxt(f, dtype=np.float32, ndmin=2)
+    cell = header['cellsize']
+    lon0 = header['xllcorner'] if 'xllcorner' in header else header['xllcenter'] - cell / 2
+    lat0 = header['yllcorner'] if 'yllcorner' in header else header['yllcenter'] - cell / 2
+    if values.shape != (int(header['nrows']), int(header['ncols'])):
+        raise ValueError(f"{path}: expected {int(header['nrows'])} x {int(header['ncols'])} "
+                         f"values, found {values.shape[0]} x {values.shape[1]}")
+    if 'nodata_value' in header:
+        values[values == header['nodata_value']] = 0
+    return values[::-1], lat0, lon0, cell, cell
+
+
+def _read_geotiff(path):
+    """First band of a north-up GeoTIFF in geographic coordinates"""
+    try:
+        import rasterio
+    except ImportError:
+        raise ImportError("GeoTIFF population rasters need rasterio (pip install rasterio); "
+                          "ESRI ASCII grids (.asc) are read without it")
+    with rasterio.open(path) as src:
+        if src.crs is not None and not src.crs.is_geographic:
+            raise ValueError(f"{path}: expected a raster in longitude/latitude, got {src.crs}")
+        transform = src.transform
+        if transform.b != 0 or transform.d != 0 or transform.e >= 0:
+            raise ValueError(f"{path}: only north-up rasters without rotation are supported")
+        values = src.read(1, masked=True).filled(0).astype(np.float32)
+    dlon, dlat = transform.a, -transform.e
+    lat0 = transform.f - dlat * values.shape[0]
+    return values[::-1], lat0, transform.c, dlat, dlon
+
+
+def _rasterize_tracts(path, column, cell_km):
+    """Population density (people per km²) of the tract containing each cell center"""
+    import geopandas as gpd
+    import shapely
+
+    tracts = gpd.read_file(path)
+    if column not in tracts.columns:
+        raise ValueError(f"{path}: no population column '{column}'. "
+                         f"Available: {', '.join(map(str, tracts.columns))}")
+    if tracts.crs is not None:
+        tracts = tracts.to_crs(epsg=4326)
+    area_km2 = tracts.to_crs(tracts.estimate_utm_crs()).area.to_numpy() / 1e6
+    density = np.divide(tracts[column].to_numpy(dtype=np.float64), area_km2,
+                        out=np.zeros(len(tracts)), where=area_km2 > 0)
+
+    min_lon, min_lat, max_lon, max_lat = tracts.total_bounds
+    dlat = cell_km / KM_PER_DEGREE
+    dlon = cell_km / (KM_PER_DEGREE * np.cos(np.radians((min_lat + max_lat) / 2)))
+    num_rows = max(1, int(np.ceil((max_lat - min_lat) / dlat)))
+    num_cols = max(1, int(np.ceil((max_lon - min_lon) / dlon)))
+
+    values = np.zeros(num_rows * num_cols, dtype=np.float32)
+    tree = shapely.STRtree(tracts.geometry.values)
+    for start in range(0, len(values), RASTERIZE_CHUNK):
+        cells = np.arange(start, min(start + RASTERIZE_CHUNK, len(values)))
+        lats = min_lat + (cells // num_cols + 0.5) * dlat
+        lons = min_lon + (cells % num_cols + 0.5) * dlon
+        point_idx, tract_idx = tree.query(shapely.points(lons, lats), predicate='within')
+        values[cells[point_idx]] = density[tract_idx]
+    return values.reshape(num_rows, num_cols), min_lat, min_lon, dlat, dlon
+
+
+class PopulationGrid:
+    def __init__(self, values, lat0, lon0, dlat, dlon, path=None):
+        """
+        Population density on a regular latitude/longitude grid.
+
+        Each weight lookup is two floor divisions and an array index, so
+        weighting sampled points costs O(1) per point and no geometry
+        queries. Cells outside the grid and nodata cells weigh 0. Grids are
+        built once from a raster or tract layer (see from_file) and cached
+        as a .npy file that later runs memory-map.
+
+        Parameters:
+        - values: (rows, cols) array, row 0 at the southern edge
+        - lat0, lon0: latitude and longitude of the grid's south-west corner
+        - dlat, dlon: cell size in degrees
+        - path: .npy file backing values, if memory-mapped
+        """
+        self.values = values
+        self.lat0 = float(lat0)
+        self.lon0 = float(lon0)
+        self.dlat = float(dlat)
+        self.dlon = float(dlon)
+        self.path = path
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def bounds(self):
+        """(min_lon, min_lat, max_lon, max_lat), as shapely orders them"""
+        num_rows, num_cols = self.values.shape
+        return (self.lon0, self.lat0, self.lon0 + num_cols * self.dlon,
+                self.lat0 + num_rows * self.dlat)
+
+    def _cells(self, lats, lons):
+        rows = np.floor((np.asarray(lats) - self.lat0) / self.dlat).astype(np.intp)
+        cols = np.floor((np.asarray(lons) - self.lon0) / self.dlon).astype(np.intp)
+        inside = ((rows >= 0) & (rows < self.values.shape[0])
+                  & (cols >= 0) & (cols < self.values.shape[1]))
+        return rows, cols, inside
+
+    def lookup(self, lats, lons):
+        """Density of the cell holding each (lat, lon), 0 outside the grid"""
+        rows, cols, inside = self._cells(lats, lons)
+        weights = np.zeros(len(rows), dtype=np.float64)
+        weights[inside] = self.values[rows[inside], cols[inside]]
+        return weights
+
+    def max_within(self, bounds):
+        """
+        Largest density of the cells overlapping a bounding box
+
+        Parameters:
+        - bounds: (min_lon, min_lat, max_lon, max_lat)
+        """
+        min_lon, min_lat, max_lon, max_lat = bounds
+        num_rows, num_cols = self.values.shape
+        row_start = max(int(np.floor((min_lat - self.lat0) / self.dlat)), 0)
+        row_stop = min(int(np.floor((max_lat - self.lat0) / self.dlat)) + 1, num_rows)
+        col_start = max(int(np.floor((min_lon - self.lon0) / self.dlon)), 0)
+        col_stop = min(int(np.floor((max_lon - self.lon0) / self.dlon)) + 1, num_cols)
+        if row_start >= row_stop or col_start >= col_stop:
+            return 0.0
+        return float(self.values[row_start:row_stop, col_start:col_stop].max())
+
+    def save(self, directory, name='population'):
+        """Write the grid as <name>.npy plus a <name>.json header; returns the .npy path"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{name}.npy')
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, np.ascontiguousarray(self.values, dtype=np.float32))
+        os.replace(tmp_path, path)
+        header = {'lat0': self.lat0, 'lon0': self.lon0, 'dlat': self.dlat, 'dlon': self.dlon}
+        tmp_path = f"{path[:-4]}.json.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(header, f)
+        os.replace(tmp_path, f"{path[:-4]}.json")
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Read a grid written by save
+
+        Parameters:
+        - path: the .npy file
+        - mmap: memory-map the values instead of reading them into memory
+        """
+        with open(f"{path[:-4]}.json") as f:
+            header = json.load(f)
+        values = np.load(path, mmap_mode='r' if mmap else None)
+        return cls(values, header['lat0'], header['lon0'], header['dlat'], header['dlon'],
+                   path=path if mmap else None)
+
+    @classmethod
+    def from_file(cls, source_path, cache_dir=None, column='population', cell_km=DEFAULT_CELL_KM):
+        """
+        Build a grid from a population raster or census-tract layer
+
+        Rasters (.asc ESRI ASCII grids, or GeoTIFF with rasterio installed)
+        must be in longitude/latitude; their cell values are used as given
+        and should be people per km², the unit the borough density fallback
+        is converted to. Any other file is read with geopandas as a tract
+        layer and rasterized at cell_km: each cell takes the density (people
+        per km²) of the tract holding its center.
+
+        Parameters:
+        - source_path: raster or tract layer
+        - cache_dir: directory of the precomputed grid, reused while the
+          source file and parameters are unchanged; None to build in memory
+        - column: population count column of a tract layer
+        - cell_km: grid cell size in km for tract layers
+
+        Returns:
+        - PopulationGrid, memory-mapped from the cache when cache_dir is set
+        """
+        source_path = os.path.abspath(source_path)
+        extension = os.path.splitext(source_path)[1].lower()
+        params = {'version': POPULATION_CACHE_VERSION, 'source': source_path}
+        if extension not in RASTER_FORMATS:
+            params.update(column=column, cell_km=cell_km)
+        path = None
+        if cache_dir is not None:
+            stat = os.stat(source_path)
+            params.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+            path = os.path.join(cache_dir, f'population_{key}.npy')
+            if os.path.exists(path) and os.path.exists(f"{path[:-4]}.json"):
+                TELEMETRY.count('population_cache_hits')
+                return cls.load(path)
+
+        if extension == '.asc':
+            values, lat0, lon0, dlat, dlon = _read_ascii_grid(source_path)
+        elif extension in ('.tif', '.tiff'):
+            values, lat0, lon0, dlat, dlon = _read_geotiff(source_path)
+        else:
+            values, lat0, lon0, dlat, dlon = _rasterize_tracts(source_path, column, cell_km)
+        # Nodata markers and negative fill values carry no demand
+        values = np.where(np.isfinite(values) & (values > 0), values, 0).astype(np.float32)
+        grid = cls(np.ascontiguousarray(values), lat0, lon0, dlat, dlon)
+        TELEMETRY.event('population_grid_built', logging.DEBUG,
+                        message=f"Built {values.shape[0]} x {values.shape[1]} population grid "
+                                f"from {source_path}",
+                        source=source_path, rows=values.shape[0], cols=values.shape[1])
+        if path is None:
+            return grid
+        return cls.load(grid.save(cache_dir, name=os.path.basename(path)[:-4]))
+
+    def __getstate__(self):
+        # Memory-mapped grids travel to worker processes as their path
+        state = self.__dict__.copy()
+        if self.path is not None:
+            state['values'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.values is None:
+            self.values = np.load(self.path, mmap_mode='r')
@@ -0,0 +1,317 @@
+# src/session.py
+import numpy as np
+
+from src.distance import get_engine
+
+# Initial number of point/hub slots; arrays double when full
+INITIAL_CAPACITY = 1024
+
+
+class WhatIfSession:
+    def __init__(self, points, weights=None, hubs=(), drone_range=3.0,
+                 distance_method='geodesic', candidates=None):
+        """
+        Incremental solver session for what-if edits.
+
+        Demand points and hubs can be added or removed in place. Every point
+        keeps its nearest and second-nearest hub, so an edit only computes the
+        distances it introduces (new points x hubs, or points x new hub) and
+        only re-scans the points whose nearest or second-nearest hub went
+        away. Coverage totals are updated from the points an edit touched; the
+        maximum service distance is updated the same way and only recomputed
+        when an edit could lower it.
+
+        Parameters:
+        - points: sequence or (N, 2) array of (lat, lon) demand points
+        - weights: demand weight per point, defaults to 1
+        - hubs: initial (lat, lon) hub locations
+        - drone_range: coverage radius in km
+        - distance_method: distance engine name
+        - candidates: (M, 2) array of allowed hub sites for repair; None
+          lets repair open hubs at the demand points themselves
+        """
+        self.drone_range = drone_range
+        self.engine = get_engine(distance_method)
+        self.candidates = (None if candidates is None
+                           else np.asarray(candidates, dtype=np.float64).reshape(-1, 2))
+
+        self._num_points = 0
+        self._coords = np.empty((INITIAL_CAPACITY, 2))
+        self._weights = np.empty(INITIAL_CAPACITY)
+        self._active = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._h1 = np.full(INITIAL_CAPACITY, -1, dtype=np.intp)
+        self._d1 = np.full(INITIAL_CAPACITY, np.inf)
+        self._h2 = np.full(INITIAL_CAPACITY, -1, dtype=np.intp)
+        self._d2 = np.full(INITIAL_CAPACITY, np.inf)
+
+        self._hub_coords = []
+        self._hub_active = []
+        self.pinned = set()
+        self.forbidden = set()
+
+        self._covered_count = 0
+        self._covered_weight = 0.0
+        self._total_weight = 0.0
+        self._max_distance = 0.0
+        self._max_dirty = False
+
+        for lat, lon in hubs:
+            self.add_hub(lat, lon)
+        self.add_points(points, weights)
+
+    def _ensure_capacity(self, size):
+        capacity = len(self._active)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name, fill in (('_coords', 0.0), ('_weights', 0.0), ('_active', False),
+                           ('_h1', -1), ('_d1', np.inf), ('_h2', -1), ('_d2', np.inf)):
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _active_hubs(self):
+        hub_ids = np.flatnonzero(self._hub_active) if self._hub_active else np.empty(0, np.intp)
+        return hub_ids, np.asarray(self._hub_coords, dtype=np.float64).reshape(-1, 2)[hub_ids]
+
+    def _covered(self, idx):
+        return self._d1[idx] <= self.drone_range
+
+    def _coverage_delta(self, idx, sign):
+        covered = self._covered(idx)
+        self._covered_count += sign * int(covered.sum())
+        self._covered_weight += sign * float(self._weights[idx][covered].sum())
+
+    def _rescan(self, idx):
+        """Recompute nearest and second-nearest hub of the given points from scratch"""
+        hub_ids, hub_coords = self._active_hubs()
+        if len(idx) == 0:
+            return
+        if len(hub_ids) == 0:
+            self._h1[idx], self._d1[idx] = -1, np.inf
+            self._h2[idx], self._d2[idx] = -1, np.inf
+            return
+        dist = self.engine(self._coords[idx, 0, None], self._coords[idx, 1, None],
+                           hub_coords[None, :, 0], hub_coords[None, :, 1])
+        rows = np.arange(len(idx))
+        if len(hub_ids) == 1:
+            self._h1[idx], self._d1[idx] = hub_ids[0], dist[:, 0]
+            self._h2[idx], self._d2[idx] = -1, np.inf
+            return
+        best2 = np.argpartition(dist, 1, axis=1)[:, :2]
+        order = np.argsort(dist[rows[:, None], best2], axis=1)
+        best2 = best2[rows[:, None], order]
+        self._h1[idx], self._d1[idx] = hub_ids[best2[:, 0]], dist[rows, best2[:, 0]]
+        self._h2[idx], self._d2[idx] = hub_ids[best2[:, 1]], dist[rows, best2[:, 1]]
+
+    def _raise_max(self, idx):
+        if not self._max_dirty and len(idx):
+            self._max_distance = max(self._max_distance, float(self._d1[idx].max()))
+
+    def add_points(self, points, weights=None):
+        """
+        Add demand points, computing only their distances to the current hubs
+
+        Returns:
+        - array of ids of the new points
+        """
+        coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if weights is None:
+            weights = np.ones(len(coords))
+        ids = np.arange(self._num_points, self._num_points + len(coords))
+        self._ensure_capacity(self._num_points + len(coords))
+        self._coords[ids] = coords
+        self._weights[ids] = weights
+        self._active[ids] = True
+        self._num_points += len(coords)
+
+        self._rescan(ids)
+        self._coverage_delta(ids, +1)
+        self._total_weight += float(np.sum(weights))
+        self._raise_max(ids)
+        return ids
+
+    def remove_points(self, point_ids):
+        """Remove demand points by id"""
+        ids = np.asarray(point_ids, dtype=np.intp)
+        ids = ids[self._active[ids]]
+        self._coverage_delta(ids, -1)
+        self._total_weight -= float(self._weights[ids].sum())
+        self._active[ids] = False
+        if len(ids) and self._d1[ids].max() >= self._max_distance:
+            self._max_dirty = True
+
+    def add_hub(self, lat, lon, pinned=False):
+        """
+        Open a hub, computing one distance per active point
+
+        Returns:
+        - id of the new hub
+        """
+        if (lat, lon) in self.forbidden:
+            raise ValueError(f"Hub site ({lat:.4f}, {lon:.4f}) is forbidden")
+        hub_id = len(self._hub_coords)
+        self._hub_coords.append((lat, lon))
+        self._hub_active.append(True)
+        if pinned:
+            self.pinned.add(hub_id)
+
+        idx = np.flatnonzero(self._active[:self._num_points])
+        if len(idx) == 0:
+            return hub_id
+        dist = self.engine(lat, lon, self._coords[idx, 0], self._coords[idx, 1])
+        nearer = dist < self._d1[idx]
+        second = ~nearer & (dist < self._d2[idx])
+
+        changed = idx[nearer]
+        self._coverage_delta(changed, -1)
+        self._h2[changed], self._d2[changed] = self._h1[changed], self._d1[changed]
+        self._h1[changed], self._d1[changed] = hub_id, dist[nearer]
+        self._coverage_delta(changed, +1)
+        self._h2[idx[second]], self._d2[idx[second]] = hub_id, dist[second]
+        if len(changed):
+            self._max_dirty = True
+        return hub_id
+
+    def remove_hub(self, hub_id):
+        """Close a hub; only points that used it as nearest or second-nearest are re-scanned"""
+        if hub_id in self.pinned:
+            raise ValueError(f"Hub {hub_id} is pinned")
+        if not self._hub_active[hub_id]:
+            return
+        self._hub_active[hub_id] = False
+        n = self._num_points
+        affected = np.flatnonzero(self._active[:n]
+                                  & ((self._h1[:n] == hub_id) | (self._h2[:n] == hub_id)))
+        self._coverage_delta(affected, -1)
+        self._rescan(affected)
+        self._coverage_delta(affected, +1)
+        self._raise_max(affected)
+
+    def pin_hub(self, hub_id):
+        """Keep a hub fixed: it can no longer be removed or pruned"""
+        if not self._hub_active[hub_id]:
+            raise ValueError(f"Hub {hub_id} is not open")
+        self.pinned.add(hub_id)
+
+    def unpin_hub(self, hub_id):
+        self.pinned.discard(hub_id)
+
+    def forbid_site(self, lat, lon):
+        """Forbid a hub site; an open hub there is closed"""
+        self.forbidden.add((lat, lon))
+        for hub_id, site in enumerate(self._hub_coords):
+            if self._hub_active[hub_id] and site == (lat, lon):
+                self.pinned.discard(hub_id)
+                self.remove_hub(hub_id)
+
+    def forbid_hub(self, hub_id):
+        """Close a hub and forbid its site"""
+        self.forbid_site(*self._hub_coords[hub_id])
+
+    def _repair_site(self, idx, uncovered):
+        """
+        Allowed hub site for uncovered point idx, or None if there is none
+
+        Without candidate sites this is the point itself. Otherwise it is the
+        candidate in range of the point that covers the most uncovered demand.
+        """
+        if self.candidates is None:
+            site = tuple(self._coords[idx].tolist())
+            return None if site in self.forbidden else site
+        dist = self.engine(self._coords[idx, 0], self._coords[idx, 1],
+                           self.candidates[:, 0], self.candidates[:, 1])
+        in_range = [c for c in np.flatnonzero(dist <= self.drone_range)
+                    if tuple(self.candidates[c].tolist()) not in self.forbidden]
+        if not in_range:
+            return None
+        sites = self.candidates[in_range]
+        reach = self.engine(sites[:, 0, None], sites[:, 1, None],
+                            self._coords[None, uncovered, 0], self._coords[None, uncovered, 1])
+        gain = (reach <= self.drone_range) @ self._weights[uncovered]
+        return tuple(sites[int(np.argmax(gain))].tolist())
+
+    def repair(self, max_new_hubs=None):
+        """
+        Restore coverage by opening a hub for the farthest (density weighted)
+        uncovered demand point: at the point itself, or, when the session
+        has candidate sites, at the allowed candidate in range of it that
+        covers the most uncovered demand. Forbidden sites are skipped, as are
+        points no allowed site can cover.
+
+        Returns:
+        - list of ids of the hubs opened
+        """
+        opened = []
+        unreachable = set()
+        while max_new_hubs is None or len(opened) < max_new_hubs:
+            n = self._num_points
+            uncovered = self._active[:n] & (self._d1[:n] > self.drone_range)
+            score = np.where(uncovered, self._d1[:n] * self._weights[:n], -np.inf)
+            uncovered = np.flatnonzero(uncovered)
+            for idx in np.argsort(score)[::-1]:
+                if score[idx] == -np.inf:
+                    return opened
+                if idx in unreachable:
+                    continue
+                site = self._repair_site(idx, uncovered)
+                if site is not None:
+                    opened.append(self.add_hub(*site))
+                    break
+                unreachable.add(idx)
+            else:
+                return opened
+        return opened
+
+    def prune(self):
+        """
+        Close unpinned hubs whose points all stay covered by their second-nearest hub
+
+        Returns:
+        - list of ids of the hubs closed
+        """
+        n = self._num_points
+        active = self._active[:n]
+        hub_ids, _ = self._active_hubs()
+        loads = np.bincount(self._h1[:n][active & (self._h1[:n] >= 0)],
+                            minlength=len(self._hub_coords))
+        closed = []
+        for hub_id in sorted(hub_ids, key=lambda h: loads[h]):
+            if hub_id in self.pinned:
+                continue
+            assigned = active & (self._h1[:n] == hub_id)
+            if np.all(self._d2[:n][assigned] <= self.drone_range):
+                self.remove_hub(hub_id)
+                closed.append(int(hub_id))
+        return closed
+
+
+    @property
+    def hubs(self):
+        """Open hubs as a dictionary hub id -> (lat, lon)"""
+        return {hub_id: site for hub_id, site in enumerate(self._hub_coords)
+                if self._hub_active[hub_id]}
+
+    def uncovered_ids(self):
+        n = self._num_points
+        return np.flatnonzero(self._active[:n] & (self._d1[:n] > self.drone_range))
+
+    def metrics(self):
+        """Current coverage and service-distance metrics"""
+        n = self._num_points
+        if self._max_dirty:
+            active = self._active[:n]
+            self._max_distance = float(self._d1[:n][active].max()) if active.any() else 0.0
+            self._max_dirty = False
+        num_points = int(self._active[:n].sum())
+        return {
+            'num_hubs': len(self.hubs),
+            'total_points': num_points,
+            'covered_points': self._covered_count,
+            'coverage_percentage': 100.0 * self._covered_count / num_points if num_points else 100.0,
+            'weighted_coverage_percentage': (100.0 * self._covered_weight / self._total_weight
+                                             if self._total_weight else 100.0),
+            'max_distance': self._max_distance,
+        }
@@ -0,0 +1,166 @@
+# src/sweep.py
+import csv
+import time
+
+import numpy as np
+from scipy import sparse
+
+from src.instrument import TELEMETRY
+
+SWEEP_COLUMNS = ['radius_km', 'num_hubs', 'lower_bound', 'max_distance_km', 'seconds', 'hubs']
+
+
+def parse_radii(spec):
+    """Parse 'start:stop:step' (stop inclusive) or a comma separated list of radii in km"""
+    if ':' in spec:
+        start, stop, step = (float(part) for part in spec.split(':'))
+        return np.round(np.arange(start, stop + step / 2, step), 6)
+    return np.array(sorted(float(part) for part in spec.split(',')))
+
+
+def _greedy_cover(by_candidate, by_point):
+    """Greedy set cover; returns the chosen candidates or None if a point cannot be covered"""
+    num_points = by_point.shape[0]
+    covered = np.zeros(num_points, dtype=bool)
+    gains = np.diff(by_candidate.indptr).astype(np.int64)
+    chosen = []
+    remaining = num_points
+    while remaining:
+        j = int(np.argmax(gains))
+        if gains[j] == 0:
+            return None
+        points = by_candidate.indices[by_candidate.indptr[j]:by_candidate.indptr[j + 1]]
+        new = points[~covered[points]]
+        covered[new] = True
+        remaining -= len(new)
+        chosen.append(j)
+        gains -= np.bincount(by_point[new].indices, minlength=len(gains))
+    return chosen
+
+
+def _prune(chosen, by_candidate, num_points):
+    """Drop chosen candidates whose points are all covered by another chosen candidate"""
+    chosen = np.asarray(chosen, dtype=np.intp)
+    counts = np.bincount(by_candidate[:, chosen].indices, minlength=num_points)
+    degree = np.diff(by_candidate.indptr)[chosen]
+    kept = []
+    for j in chosen[np.argsort(degree, kind='stable')]:
+        points = by_candidate.indices[by_candidate.indptr[j]:by_candidate.indptr[j + 1]]
+        if np.all(counts[points] >= 2):
+            counts[points] -= 1
+        else:
+            kept.append(int(j))
+    return kept
+
+
+def _packing_bound(by_point):
+    """Points sharing no covering candidate each need their own hub"""
+    used = np.zeros(by_point.shape[1], dtype=bool)
+    bound = 0
+    for i in np.argsort(np.diff(by_point.indptr), kind='stable'):
+        candidates = by_point.indices[by_point.indptr[i]:by_point.indptr[i + 1]]
+        if not used[candidates].any():
+            used[candidates] = True
+            bound += 1
+    return bound
+
+
+class RadiusSweep:
+    def __init__(self, solver):
+        """
+        Hubs-needed versus drone-range trade-off curve.
+
+        The point-candidate pairs within the largest radius are fetched from
+        the solver's coverage index once; each radius keeps the pairs within
+        it, so no distances are recomputed between radii.
+        A solution found at one radius stays feasible at every larger one,
+        so it warm-starts the next radius (after dropping hubs that became
+        redundant) and competes with a fresh greedy cover.
+
+        Parameters:
+        - solver: PCenter instance; its coverage index is built if missing
+        """
+        self.solver = solver
+        if solver.coverage_index is None:
+            solver.build_coverage_index()
+
+    def run(self, radii, lower_bounds=True, progress=None):
+        """
+        Solve the minimum-hub problem for every radius
+
+        Parameters:
+        - radii: coverage radii in km
+        - lower_bounds: also compute a packing lower bound per radius
+        - progress: optional callback progress(row) called after each radius
+
+        Returns:
+        - list of rows (dictionaries with SWEEP_COLUMNS keys), by increasing radius
+        """
+        radii = np.sort(np.asarray(radii, dtype=np.float64).ravel())
+        if len(radii) == 0:
+            raise ValueError("Radius sweep needs at least one radius")
+        if radii[0] <= 0:
+            raise ValueError(f"Radii must be positive, got {radii[0]:g} km")
+        index = self.solver.coverage_index
+        neighbors = index.radius_neighbors(float(radii[-1]))
+        num_points, num_candidates = neighbors.shape
+
+        # Rows of the largest-radius matrix, so every smaller radius is a mask of it
+        rows = np.repeat(np.arange(num_points), np.diff(neighbors.indptr))
+
+        results = []
+        previous = None
+        for radius in radii:
+            start = time.perf_counter()
+            within = neighbors.data <= radius
+            indptr = np.zeros(num_points + 1, dtype=neighbors.indptr.dtype)
+            np.cumsum(np.bincount(rows[within], minlength=num_points), out=indptr[1:])
+            by_point = sparse.csr_matrix(
+                (np.ones(indptr[-1], dtype=np.int8), neighbors.indices[within], indptr),
+                shape=(num_points, num_candidates))
+            by_candidate = by_point.tocsc()
+
+            hubs = _greedy_cover(by_candidate, by_point)
+            if hubs is not None:
+                hubs = _prune(hubs, by_candidate, num_points)
+                if previous is not None:
+                    warm = _prune(previous, by_candidate, num_points)
+                    if len(warm) <= len(hubs):
+                        hubs = warm
+                previous = hubs
+
+            row = {
+                'radius_km': float(radius),
+                'num_hubs': len(hubs) if hubs is not None else None,
+                'lower_bound': _packing_bound(by_point) if lower_bounds else None,
+                'max_distance_km': (float(index.nearest(hubs)[1].max())
+                                    if hubs is not None else None),
+                'seconds': time.perf_counter() - start,
+                'hubs': hubs,
+            }
+            results.append(row)
+            TELEMETRY.progress('sweep', len(results), len(radii))
+            if progress is not None:
+                progress(row)
+
+        # Fewer hubs never suffice at a smaller radius, so bounds carry downwards
+        if lower_bounds:
+            for smaller, larger in zip(results[-2::-1], results[::-1]):
+                smaller['lower_bound'] = max(smaller['lower_bound'], larger['lower_bound'])
+        return results
+
+
+def write_sweep(rows, path):
+    """
+    Write sweep rows to CSV, or to Parquet when path ends with .parquet.
+    Hubs are written as space separated candidate indices.
+    """
+    records = [dict(row, hubs=' '.join(map(str, row['hubs'] or []))) for row in rows]
+    if path.endswith('.parquet'):
+        import pandas as pd
+        pd.DataFrame(records, columns=SWEEP_COLUMNS).to_parquet(path, index=False)
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SWEEP_COLUMNS)
+        writer.writeheader()
+        writer.writerows(records)
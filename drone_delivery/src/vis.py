@@ -1,8 +1,32 @@
 import folium
+import numpy as np
 from folium import plugins
 
+from src.demand import DemandSet
+from src.instrument import StageTimer, timed
+
+# Above this many demand points 'auto' switches from markers to a heatmap
+MARKER_LIMIT = 2000
+
+# Upper bound on heatmap cells, which keeps the HTML size flat in the point count
+MAX_HEATMAP_CELLS = 20000
+
+# Smallest heatmap cell edge in degrees (~250 m)
+HEATMAP_CELL = 0.0025
+
+# Boundary simplification (degrees) applied in the high-volume modes
+BOUNDARY_TOLERANCE = 0.001
+
+POINT_MODES = ('auto', 'markers', 'geojson', 'cluster', 'heatmap')
+
 class NYCVisualizer:
-    def __init__(self):
+    def __init__(self, timer=None):
+        """
+        Parameters:
+        - timer: StageTimer recording the 'map_build' and 'map_write' stages,
+          a private one by default
+        """
+        self.timer = timer or StageTimer()
         self.center = [40.7128, -74.0060]  # NYC center
         self.borough_colors = {
             "Manhattan": "red",
@@ -20,8 +44,39 @@ class NYCVisualizer:
             "Staten Island": [[40.477399, -74.259090], [40.651800, -74.052140]]
         }
 
-    def create_map(self, geojson_data, borough_datasets, hub_locations=None, drone_range=5.0):
-        """Create interactive map with borough boundaries, points and hubs"""
+    @timed('map_build')
+    def create_map(self, geojson_data, borough_datasets, hub_locations=None, drone_range=5.0,
+                   point_mode='auto', boundary_tolerance=None):
+        """
+        Create interactive map with borough boundaries, points and hubs
+        
+        Parameters:
+        - geojson_data: borough boundaries (GeoDataFrame)
+        - borough_datasets: borough datasets with demand points
+        - hub_locations: list of (lat, lon) hubs
+        - drone_range: service radius in km shown in popups and the legend
+        - point_mode: how demand points are drawn:
+            'markers' one CircleMarker with popup per point (small sets only),
+            'geojson' one GeoJSON point layer per borough,
+            'cluster' FastMarkerCluster,
+            'heatmap' heatmap of points binned into at most MAX_HEATMAP_CELLS cells,
+            'auto'    markers up to MARKER_LIMIT points, heatmap above
+        - boundary_tolerance: simplification tolerance (degrees) for the boundary
+          layer; defaults to BOUNDARY_TOLERANCE in the high-volume modes
+        """
+        if point_mode not in POINT_MODES:
+            raise ValueError(f"Unknown point mode '{point_mode}'. "
+                             f"Choose one of: {', '.join(POINT_MODES)}")
+        if point_mode == 'auto':
+            total_points = sum(len(data['points']) for data in borough_datasets.values())
+            point_mode = 'markers' if total_points <= MARKER_LIMIT else 'heatmap'
+        if boundary_tolerance is None and point_mode != 'markers':
+            boundary_tolerance = BOUNDARY_TOLERANCE
+        if boundary_tolerance:
+            geojson_data = geojson_data.copy()
+            geojson_data['geometry'] = geojson_data.geometry.simplify(
+                boundary_tolerance, preserve_topology=True)
+        
         m = folium.Map(location=self.center, zoom_start=11)
         
         # Add borough boundaries
@@ -37,19 +92,14 @@ class NYCVisualizer:
         ).add_to(m)
         
         # Add demand points
-        for boro_code, data in borough_datasets.items():
-            borough_name = data['borough']
-            color = self.borough_colors.get(borough_name, 'blue')
-            
-            for lat, lon in data['points']:
-                folium.CircleMarker(
-                    location=[lat, lon],
-                    radius=2,
-                    color=color,
-                    fill=True,
-                    fillOpacity=0.6,
-                    popup=f"{borough_name} Point: ({lat:.4f}, {lon:.4f})"
-                ).add_to(m)
+        if point_mode == 'markers':
+            self._add_point_markers(m, borough_datasets)
+        elif point_mode == 'geojson':
+            self._add_point_geojson(m, borough_datasets)
+        elif point_mode == 'cluster':
+            self._add_point_cluster(m, borough_datasets)
+        else:
+            self._add_point_heatmap(m, borough_datasets)
 
         # Add hub locations and coverage
         if hub_locations:
@@ -94,4 +144,75 @@ class NYCVisualizer:
         '''
         m.get_root().html.add_child(folium.Element(legend_html))
         
-        return m
\ No newline at end of file
+        return m
+
+    @timed('map_write')
+    def save_map(self, map_obj, path):
+        """Write a map created by create_map to an HTML file"""
+        map_obj.save(path)
+
+    def _add_point_markers(self, m, borough_datasets):
+        """One CircleMarker with a popup per demand point"""
+        for boro_code, data in borough_datasets.items():
+            borough_name = data['borough']
+            color = self.borough_colors.get(borough_name, 'blue')
+            
+            for lat, lon in data['points']:
+                folium.CircleMarker(
+                    location=[lat, lon],
+                    radius=2,
+                    color=color,
+                    fill=True,
+                    fillOpacity=0.6,
+                    popup=f"{borough_name} Point: ({lat:.4f}, {lon:.4f})"
+                ).add_to(m)
+
+    def _add_point_geojson(self, m, borough_datasets):
+        """A single MultiPoint GeoJSON layer per borough"""
+        for boro_code, data in borough_datasets.items():
+            borough_name = data['borough']
+            color = self.borough_colors.get(borough_name, 'blue')
+            coords = np.round(np.asarray(data['points'], dtype=np.float64).reshape(-1, 2), 5)
+            feature = {
+                'type': 'Feature',
+                'properties': {'borough': borough_name},
+                'geometry': {'type': 'MultiPoint', 'coordinates': coords[:, ::-1].tolist()},
+            }
+            folium.GeoJson(
+                feature,
+                name=f"{borough_name} demand",
+                marker=folium.CircleMarker(radius=2, fill=True),
+                style_function=lambda _, color=color: {
+                    'color': color, 'fillColor': color, 'fillOpacity': 0.6, 'weight': 1},
+            ).add_to(m)
+
+    def _add_point_cluster(self, m, borough_datasets):
+        """Client-side clustering of all demand points"""
+        coords = self._all_points(borough_datasets)
+        plugins.FastMarkerCluster(np.round(coords, 5).tolist(), name="Demand points").add_to(m)
+
+    def _add_point_heatmap(self, m, borough_datasets):
+        """Heatmap of demand counts binned into a bounded number of grid cells"""
+        coords = self._all_points(borough_datasets)
+        if len(coords) == 0:
+            return
+        cell = HEATMAP_CELL
+        while True:
+            cells = np.floor(coords / cell).astype(np.int64)
+            keys, counts = np.unique(cells, axis=0, return_counts=True)
+            if len(keys) <= MAX_HEATMAP_CELLS:
+                break
+            cell *= 2
+        centers = np.round((keys + 0.5) * cell, 5)
+        heat = np.column_stack([centers, counts / counts.max()])
+        plugins.HeatMap(heat.tolist(), name="Demand density", radius=12).add_to(m)
+
+    def _all_points(self, borough_datasets):
+        """All demand points of every borough as an (N, 2) array"""
+        if isinstance(borough_datasets, DemandSet):
+            return borough_datasets.coords
+        arrays = [np.asarray(data['points'], dtype=np.float64).reshape(-1, 2)
+                  for data in borough_datasets.values()]
+        if not arrays:
+            return np.empty((0, 2))
+        return np.concatenate(arrays)
\ No newline at end of file